@@ -35,6 +35,24 @@ config.set_main_option("sqlalchemy.url", db_url)
 
 target_metadata = SQLModel.metadata
 
+# search objects made with raw SQL in 8d41e0b7c2a5, not part of the models
+RAW_SQL_INDEXES = {"ix_apartments_search_vector"} | {
+    f"ix_apartments_{col}_trgm" for col in ("title", "address", "city", "country")
+}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # sqlite FTS5 table and its shadow tables (apartments_fts_data, ...)
+    if type_ == "table" and name.startswith("apartments_fts"):
+        return False
+    # postgres generated tsvector column and the GIN indexes
+    if type_ == "column" and name == "search_vector":
+        return False
+    if type_ == "index" and name in RAW_SQL_INDEXES:
+        return False
+    return True
+
+
 connectable = engine_from_config(
     config.get_section(config.config_ini_section, {}),
     prefix="sqlalchemy.",
@@ -46,6 +64,7 @@ with connectable.connect() as connection:
         connection=connection,
         target_metadata=target_metadata,
         compare_type=True,
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -0,0 +1,110 @@
+"""reservation overlap constraint
+
+The constraint can't be added while pending/confirmed reservations of one
+apartment overlap. Pending ones that overlap a confirmed (or an older
+pending) reservation are cancelled first, overlapping confirmed ones have to
+be resolved by hand: the upgrade fails listing their ids.
+
+Revision ID: 0c4e9b2d7f61
+Revises: f61a0d2b8e45
+Create Date: 2026-10-16 16:12:40.318207
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0c4e9b2d7f61"
+down_revision: Union[str, Sequence[str], None] = "f61a0d2b8e45"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _cancel_overlapping_pending(bind) -> None:
+    reservations = sa.table(
+        "reservations",
+        sa.column("id", sa.Integer),
+        sa.column("apartment_id", sa.Integer),
+        sa.column("check_in", sa.Date),
+        sa.column("check_out", sa.Date),
+        sa.column("status", sa.String),
+    )
+    rows = bind.execute(
+        sa.select(
+            reservations.c.id,
+            reservations.c.apartment_id,
+            reservations.c.check_in,
+            reservations.c.check_out,
+            reservations.c.status,
+        )
+        .where(reservations.c.status.in_(("pending", "confirmed")))
+        # confirmed ones are kept first, then the older pending ones
+        .order_by(
+            reservations.c.apartment_id,
+            (reservations.c.status == "pending").asc(),
+            reservations.c.id,
+        )
+    )
+
+    kept: dict[int, list] = {}
+    cancel: list[int] = []
+    conflicts: list[tuple[int, int]] = []
+    for rid, apartment_id, check_in, check_out, status in rows:
+        stays = kept.setdefault(apartment_id, [])
+        overlapping = [
+            other
+            for other, other_in, other_out in stays
+            if other_in < check_out and other_out > check_in
+        ]
+        if not overlapping:
+            stays.append((rid, check_in, check_out))
+        elif status == "pending":
+            cancel.append(rid)
+        else:
+            conflicts.extend((other, rid) for other in overlapping)
+
+    if conflicts:
+        raise RuntimeError(
+            "Overlapping confirmed reservations, resolve them before upgrading: "
+            + ", ".join(f"{a} and {b}" for a, b in conflicts)
+        )
+    if cancel:
+        bind.execute(
+            reservations.update()
+            .where(reservations.c.id.in_(cancel))
+            .values(status="cancelled")
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # other databases are covered by locking in app.services.reservations
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    _cancel_overlapping_pending(op.get_bind())
+
+    # btree_gist lets the plain integer column take part in a gist index
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.execute("""
+        ALTER TABLE reservations ADD CONSTRAINT ex_reservations_apartment_dates
+        EXCLUDE USING gist (
+            apartment_id WITH =,
+            daterange(check_in, check_out, '[)') WITH &&
+        )
+        WHERE (status IN ('pending', 'confirmed'))
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    op.execute(
+        "ALTER TABLE reservations "
+        "DROP CONSTRAINT IF EXISTS ex_reservations_apartment_dates"
+    )
@@ -0,0 +1,40 @@
+"""apartment keyset indexes
+
+Revision ID: 3f9c2a71d4b8
+Revises: 1218844866fe
+Create Date: 2026-10-16 09:12:41.503217
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f9c2a71d4b8"
+down_revision: Union[str, Sequence[str], None] = "1218844866fe"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_apartments_created_at_id",
+        "apartments",
+        ["created_at", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_apartments_price_per_night_id",
+        "apartments",
+        ["price_per_night", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_apartments_price_per_night_id", table_name="apartments")
+    op.drop_index("ix_apartments_created_at_id", table_name="apartments")
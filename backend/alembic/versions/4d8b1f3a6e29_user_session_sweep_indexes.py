@@ -0,0 +1,47 @@
+"""user session sweep indexes
+
+Revision ID: 4d8b1f3a6e29
+Revises: 9a3f6c1e2d70
+Create Date: 2026-10-16 18:05:33.927415
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4d8b1f3a6e29"
+down_revision: Union[str, Sequence[str], None] = "9a3f6c1e2d70"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_user_sessions_expires_at", "user_sessions", ["expires_at"], unique=False
+    )
+    op.create_index(
+        "ix_user_sessions_revoked_at",
+        "user_sessions",
+        ["revoked_at"],
+        unique=False,
+        postgresql_where=sa.text("revoked_at IS NOT NULL"),
+        sqlite_where=sa.text("revoked_at IS NOT NULL"),
+    )
+    op.create_index(
+        "ix_user_sessions_user_id_created_at",
+        "user_sessions",
+        ["user_id", "created_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_user_sessions_user_id_created_at", table_name="user_sessions")
+    op.drop_index("ix_user_sessions_revoked_at", table_name="user_sessions")
+    op.drop_index("ix_user_sessions_expires_at", table_name="user_sessions")
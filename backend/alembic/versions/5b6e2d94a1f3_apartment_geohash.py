@@ -0,0 +1,104 @@
+"""apartment geohash
+
+Revision ID: 5b6e2d94a1f3
+Revises: c7a13e5f9b20
+Create Date: 2026-10-16 11:37:55.290414
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = "5b6e2d94a1f3"
+down_revision: Union[str, Sequence[str], None] = "c7a13e5f9b20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# copy of app.services.geohash.encode as of this revision, so the backfill
+# doesn't change when the app's encoder does
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9
+
+
+def encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # geohash starts with a longitude bit
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                bits = (bits << 1) | 1
+                lon_lo = mid
+            else:
+                bits <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "apartments",
+        sa.Column("geohash", sqlmodel.sql.sqltypes.AutoString(length=12), nullable=True),
+    )
+    # serves the bbox prefix ranges: their bounds are geohash characters only
+    # (see geohash.prefix_end), which order the same under the database's
+    # collation as bytewise, so no COLLATE "C" / text_pattern_ops is needed
+    op.create_index(
+        op.f("ix_apartments_geohash"), "apartments", ["geohash"], unique=False
+    )
+
+    # backfill rows that were already geocoded
+    apartments = sa.table(
+        "apartments",
+        sa.column("id", sa.Integer),
+        sa.column("latitude", sa.Numeric(10, 6)),
+        sa.column("longitude", sa.Numeric(10, 6)),
+        sa.column("geohash", sa.String),
+    )
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.select(apartments.c.id, apartments.c.latitude, apartments.c.longitude)
+        .where(apartments.c.latitude.is_not(None))
+        .where(apartments.c.longitude.is_not(None))
+    ).all()
+
+    for row in rows:
+        conn.execute(
+            apartments.update()
+            .where(apartments.c.id == row.id)
+            .values(geohash=encode(float(row.latitude), float(row.longitude)))
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_apartments_geohash"), table_name="apartments")
+    op.drop_column("apartments", "geohash")
@@ -0,0 +1,81 @@
+"""apartment booked days
+
+Revision ID: 7e2d5a9c4b18
+Revises: 0c4e9b2d7f61
+Create Date: 2026-10-16 16:58:09.472310
+
+"""
+
+from datetime import timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "7e2d5a9c4b18"
+down_revision: Union[str, Sequence[str], None] = "0c4e9b2d7f61"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    booked_days = op.create_table(
+        "apartment_booked_days",
+        sa.Column("apartment_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("reservation_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["apartment_id"], ["apartments.id"]),
+        sa.ForeignKeyConstraint(["reservation_id"], ["reservations.id"]),
+        sa.PrimaryKeyConstraint("apartment_id", "day"),
+    )
+    op.create_index(
+        op.f("ix_apartment_booked_days_reservation_id"),
+        "apartment_booked_days",
+        ["reservation_id"],
+        unique=False,
+    )
+
+    # days of the confirmed reservations that already exist
+    reservations = sa.table(
+        "reservations",
+        sa.column("id", sa.Integer),
+        sa.column("apartment_id", sa.Integer),
+        sa.column("check_in", sa.Date),
+        sa.column("check_out", sa.Date),
+        sa.column("status", sa.String),
+    )
+    confirmed = op.get_bind().execute(
+        sa.select(
+            reservations.c.id,
+            reservations.c.apartment_id,
+            reservations.c.check_in,
+            reservations.c.check_out,
+        ).where(reservations.c.status == "confirmed")
+    )
+
+    rows = {}
+    for reservation_id, apartment_id, check_in, check_out in confirmed:
+        day = check_in
+        while day < check_out:
+            rows.setdefault((apartment_id, day), reservation_id)
+            day += timedelta(days=1)
+
+    if rows:
+        op.bulk_insert(
+            booked_days,
+            [
+                {"apartment_id": apartment_id, "day": day, "reservation_id": rid}
+                for (apartment_id, day), rid in rows.items()
+            ],
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f("ix_apartment_booked_days_reservation_id"),
+        table_name="apartment_booked_days",
+    )
+    op.drop_table("apartment_booked_days")
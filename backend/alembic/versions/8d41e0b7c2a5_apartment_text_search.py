@@ -0,0 +1,62 @@
+"""apartment text search
+
+Revision ID: 8d41e0b7c2a5
+Revises: 3f9c2a71d4b8
+Create Date: 2026-10-16 10:04:18.771902
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# the schema is defined once, startup creates it for databases made without
+# migrations (ensure_text_search_schema)
+from app.services.apartment_search import (
+    PG_TEXT_SEARCH_SCHEMA,
+    SQLITE_TEXT_SEARCH_SCHEMA,
+    TRGM_COLUMNS,
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8d41e0b7c2a5"
+down_revision: Union[str, Sequence[str], None] = "3f9c2a71d4b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _upgrade_postgresql() -> None:
+    for statement in PG_TEXT_SEARCH_SCHEMA:
+        op.execute(statement)
+
+
+def _upgrade_sqlite() -> None:
+    for statement in SQLITE_TEXT_SEARCH_SCHEMA:
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        _upgrade_postgresql()
+    elif dialect == "sqlite":
+        _upgrade_sqlite()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        for col in reversed(TRGM_COLUMNS):
+            op.execute(f"DROP INDEX IF EXISTS ix_apartments_{col}_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_apartments_search_vector")
+        op.execute("ALTER TABLE apartments DROP COLUMN IF EXISTS search_vector")
+    elif dialect == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS apartments_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS apartments_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS apartments_fts_ai")
+        op.execute("DROP TABLE IF EXISTS apartments_fts")
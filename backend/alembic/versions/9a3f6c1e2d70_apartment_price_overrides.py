@@ -0,0 +1,41 @@
+"""apartment price overrides
+
+Revision ID: 9a3f6c1e2d70
+Revises: 7e2d5a9c4b18
+Create Date: 2026-10-16 17:31:52.806144
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9a3f6c1e2d70"
+down_revision: Union[str, Sequence[str], None] = "7e2d5a9c4b18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "apartment_price_overrides",
+        sa.Column("apartment_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("price_per_night", sa.Numeric(10, 2), nullable=False),
+        sa.ForeignKeyConstraint(["apartment_id"], ["apartments.id"]),
+        sa.PrimaryKeyConstraint("apartment_id", "day"),
+    )
+    op.add_column(
+        "apartments",
+        sa.Column("price_version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("apartments", "price_version")
+    op.drop_table("apartment_price_overrides")
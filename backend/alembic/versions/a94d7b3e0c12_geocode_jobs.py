@@ -0,0 +1,56 @@
+"""geocode jobs
+
+Revision ID: a94d7b3e0c12
+Revises: e2f8a4c61d37
+Create Date: 2026-10-16 14:02:47.318550
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a94d7b3e0c12"
+down_revision: Union[str, Sequence[str], None] = "e2f8a4c61d37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "geocode_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("apartment_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "status", sqlmodel.sql.sqltypes.AutoString(length=20), nullable=False
+        ),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column(
+            "last_error", sqlmodel.sql.sqltypes.AutoString(length=500), nullable=True
+        ),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["apartment_id"],
+            ["apartments.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("apartment_id"),
+    )
+    op.create_index(
+        "ix_geocode_jobs_status_next_attempt_at",
+        "geocode_jobs",
+        ["status", "next_attempt_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_geocode_jobs_status_next_attempt_at", table_name="geocode_jobs")
+    op.drop_table("geocode_jobs")
@@ -0,0 +1,29 @@
+"""apartment photo variants
+
+Revision ID: b3c58e1f7a96
+Revises: a94d7b3e0c12
+Create Date: 2026-10-16 15:10:33.902471
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b3c58e1f7a96"
+down_revision: Union[str, Sequence[str], None] = "a94d7b3e0c12"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("apartment_photos", sa.Column("variants", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("apartment_photos", "variants")
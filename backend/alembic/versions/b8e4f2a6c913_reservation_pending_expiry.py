@@ -0,0 +1,52 @@
+"""reservation pending expiry
+
+Revision ID: b8e4f2a6c913
+Revises: e5c9a2f71b03
+Create Date: 2026-10-17 09:12:40.318207
+
+"""
+
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b8e4f2a6c913"
+down_revision: Union[str, Sequence[str], None] = "e5c9a2f71b03"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# confirm window given to reservations already pending (the default of
+# RESERVATION_PENDING_TTL_HOURS), fixed so the migration doesn't read app code
+PENDING_TTL_HOURS = 24
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("reservations", sa.Column("expires_at", sa.DateTime(), nullable=True))
+    op.create_index(
+        "ix_reservations_status_expires_at",
+        "reservations",
+        ["status", "expires_at"],
+        unique=False,
+    )
+
+    # reservations already pending get a full confirm window from now on
+    reservations = sa.table(
+        "reservations",
+        sa.column("status", sa.String),
+        sa.column("expires_at", sa.DateTime),
+    )
+    op.execute(
+        reservations.update()
+        .where(reservations.c.status == "pending")
+        .values(expires_at=datetime.utcnow() + timedelta(hours=PENDING_TTL_HOURS))
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_reservations_status_expires_at", table_name="reservations")
+    op.drop_column("reservations", "expires_at")
@@ -0,0 +1,33 @@
+"""reservation overlap index
+
+Revision ID: c7a13e5f9b20
+Revises: 8d41e0b7c2a5
+Create Date: 2026-10-16 10:48:02.115834
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c7a13e5f9b20"
+down_revision: Union[str, Sequence[str], None] = "8d41e0b7c2a5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_reservations_apartment_status_dates",
+        "reservations",
+        ["apartment_id", "status", "check_in", "check_out"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_reservations_apartment_status_dates", table_name="reservations")
@@ -0,0 +1,48 @@
+"""geocode cache
+
+Revision ID: e2f8a4c61d37
+Revises: 5b6e2d94a1f3
+Create Date: 2026-10-16 13:21:09.640187
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e2f8a4c61d37"
+down_revision: Union[str, Sequence[str], None] = "5b6e2d94a1f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "geocode_cache",
+        sa.Column(
+            "query_hash", sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False
+        ),
+        sa.Column("query", sa.Text(), nullable=False),
+        sa.Column("latitude", sa.Numeric(precision=10, scale=6), nullable=True),
+        sa.Column("longitude", sa.Numeric(precision=10, scale=6), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_used_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("query_hash"),
+    )
+    op.create_index(
+        op.f("ix_geocode_cache_last_used_at"),
+        "geocode_cache",
+        ["last_used_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_geocode_cache_last_used_at"), table_name="geocode_cache")
+    op.drop_table("geocode_cache")
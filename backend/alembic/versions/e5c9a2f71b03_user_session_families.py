@@ -0,0 +1,48 @@
+"""user session families
+
+Revision ID: e5c9a2f71b03
+Revises: 4d8b1f3a6e29
+Create Date: 2026-10-16 18:44:16.530981
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5c9a2f71b03"
+down_revision: Union[str, Sequence[str], None] = "4d8b1f3a6e29"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "user_sessions",
+        sa.Column(
+            "family_id", sqlmodel.sql.sqltypes.AutoString(length=40), nullable=True
+        ),
+    )
+    op.add_column("user_sessions", sa.Column("rotated_at", sa.DateTime(), nullable=True))
+    op.add_column(
+        "user_sessions", sa.Column("grace_used_at", sa.DateTime(), nullable=True)
+    )
+    op.create_index(
+        op.f("ix_user_sessions_family_id"), "user_sessions", ["family_id"], unique=False
+    )
+
+    # every existing session is a family of its own
+    op.execute("UPDATE user_sessions SET family_id = 'legacy-' || id")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_user_sessions_family_id"), table_name="user_sessions")
+    op.drop_column("user_sessions", "grace_used_at")
+    op.drop_column("user_sessions", "rotated_at")
+    op.drop_column("user_sessions", "family_id")
@@ -1,36 +1,81 @@
 from __future__ import annotations
 
 from decimal import Decimal
-from typing import Annotated, Optional, List
+from typing import Annotated, Literal, Optional, List, Tuple, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from pydantic import BaseModel, Field
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy import func
+from sqlalchemy import delete as sqldelete, func
 from sqlalchemy.orm import selectinload
 
 from app.db import db
+from app.json_encoding import FastJSONResponse
 from app.models.apartment import Apartment
+from app.models.apartment_photo import ApartmentPhoto
+from app.models.apartment_price import ApartmentPriceOverride
+from app.models.apartment_tag import ApartmentTag
+from app.models.booked_day import BookedDay
+from app.models.geocode_job import GeocodeJob
+from app.models.reservation import Reservation
 from app.models.tag import Tag
-from app.models.user import User
 from app.auth.authorization import Policy
-from app.auth.current_user import get_current_user
+from app.auth.current_user import Principal, get_current_principal
 from app.enums.role_enum import Role
+from app.apartment_photo.apartment_photo_endpoints import ApartmentPhotoVariantDto
 from app.base_pagination_request import BasePaginationRequest
 from app.base_response import BasePagedResponse
-from app.services.geocoding import geocode_osm_nominatim
+from app.cursor_pagination import SortKey, apply_keyset, decode_cursor, encode_cursor
+from app.services.apartment_search import apply_text_search
+from app.services.geo_search import apply_bbox, apply_radius, parse_bbox, parse_point
+from app.services.geocode_worker import enqueue_geocode, geocode_worker
+from app.services.occupancy import (
+    days_to_runs,
+    get_booked_apartments,
+    get_booked_days,
+    runs_to_bitmap,
+)
+from app.services.photo_storage import (
+    collect_blobs,
+    photo_storage,
+    release_blobs,
+    variant_keys,
+)
+from app.services.pricing import price_quoter, set_price_overrides
+from app.services.reservations import reservation_service
+from app.services.response_cache import response_cache
+from app.services.total_counter import clear_total_cache, count_total
+from app.tag.tag_catalogue import tag_catalogue
 
 from datetime import datetime, date, UTC, timedelta
-from app.models.reservation import Reservation
 
 
 router = APIRouter(prefix="/apartments", tags=["apartments"])
 SessionDep = Annotated[AsyncSession, Depends(db.get_session)]
+ReadSessionDep = Annotated[AsyncSession, Depends(db.get_read_session)]
+
+
+# Sorting, every sort is stable (ties broken by id) so it can be paged by cursor
+APARTMENT_SORTS: dict[str, SortKey] = {
+    "id": SortKey(Apartment.id, parse=int),
+    "newest": SortKey(
+        Apartment.created_at, descending=True, parse=datetime.fromisoformat
+    ),
+    "price_asc": SortKey(Apartment.price_per_night, parse=Decimal),
+    "price_desc": SortKey(Apartment.price_per_night, descending=True, parse=Decimal),
+}
+# "relevance" only exists together with a free text search (q),
+# "distance" only together with near
+ApartmentSort = Literal[
+    "id", "newest", "price_asc", "price_desc", "relevance", "distance"
+]
 
 
 # Filters
 class ApartmentFilter(BasePaginationRequest):
+    # free text search over title, description, city and country
+    q: Optional[str] = Field(default=None, max_length=255)
     name: Optional[str] = Field(default=None, max_length=255)
     address: Optional[str] = Field(default=None, max_length=255)
     city: Optional[str] = Field(default=None, max_length=100)
@@ -43,12 +88,29 @@ class ApartmentFilter(BasePaginationRequest):
     rating_average_min: Optional[int] = Field(default=None, ge=0, le=5)
     rating_average_max: Optional[int] = Field(default=None, ge=0, le=5)
 
+    # only apartments free for the whole stay (check_out is exclusive)
+    check_in: Optional[date] = None
+    check_out: Optional[date] = None
+
+    # geo search: "lat,lon" (+ optional radius) and "min_lat,min_lon,max_lat,max_lon"
+    near: Optional[str] = Field(default=None, max_length=64)
+    radius_km: Optional[float] = Field(default=None, gt=0, le=500)
+    bbox: Optional[str] = Field(default=None, max_length=128)
+
+    # defaults to "relevance" when q is given, "distance" when near is given,
+    # "id" otherwise
+    sort: Optional[ApartmentSort] = None
+
+    # "card": only what a listing card shows (ApartmentCardDto)
+    view: Literal["full", "card"] = "full"
+
 
 # DTOs
 class ApartmentPhotoDto(BaseModel):
     id: int
     image_url: str
     is_main: bool
+    variants: List[ApartmentPhotoVariantDto] = []
 
 
 class ApartmentDto(BaseModel):
@@ -69,10 +131,26 @@ class ApartmentDto(BaseModel):
     photos: List[ApartmentPhotoDto]
 
 
+class ApartmentCardDto(BaseModel):
+    id: int
+    title: str
+    description: str  # first CARD_DESCRIPTION_LENGTH characters
+    city: str
+    country: str
+    price_per_night: Decimal
+    max_guests: int
+    latitude: Optional[Decimal]
+    longitude: Optional[Decimal]
+    rating_average: Optional[Decimal]
+    reviews_count: int
+    main_photo: Optional[ApartmentPhotoDto]
+
+
 class TagDto(BaseModel):
     id: int
     name: str
-    svg_icon: Optional[str]
+    icon_key: str
+    svg_icon: Optional[str] = None  # left out with include_svg=false
 
 
 class ApartmentByIdDto(BaseModel):
@@ -95,78 +173,96 @@ class ApartmentByIdDto(BaseModel):
 
 
 # Mappers
-def map_apartment_to_list_dto(apartment: Apartment) -> ApartmentDto:
-    return ApartmentDto(
-        id=apartment.id,
-        user_id=apartment.user_id,
-        title=apartment.title,
-        description=apartment.description,
-        address=apartment.address,
-        city=apartment.city,
-        country=apartment.country,
-        price_per_night=apartment.price_per_night,
-        max_guests=apartment.max_guests,
-        status=apartment.status,
-        latitude=apartment.latitude,
-        longitude=apartment.longitude,
-        rating_average=apartment.rating_average,
-        reviews_count=apartment.reviews_count,
-        photos=[
-            ApartmentPhotoDto(
-                id=photo.id,
-                image_url=photo.image_url,
-                is_main=photo.is_main,
-            )
-            for photo in apartment.photos
-        ],
-    )
+# plain dicts shaped like the DTOs above, encoded straight to JSON bytes
+# (app.json_encoding) instead of building and re-validating pydantic models
+VARIANT_FIELDS = ("name", "format", "width", "height", "url")
 
 
-def map_apartment_to_detail_dto(apartment: Apartment) -> ApartmentByIdDto:
-    return ApartmentByIdDto(
-        id=apartment.id,
-        user_id=apartment.user_id,
-        title=apartment.title,
-        description=apartment.description,
-        address=apartment.address,
-        city=apartment.city,
-        country=apartment.country,
-        price_per_night=apartment.price_per_night,
-        max_guests=apartment.max_guests,
-        status=apartment.status,
-        latitude=apartment.latitude,
-        longitude=apartment.longitude,
-        rating_average=apartment.rating_average,
-        reviews_count=apartment.reviews_count,
-        photos=[
-            ApartmentPhotoDto(
-                id=photo.id,
-                image_url=photo.image_url,
-                is_main=photo.is_main,
-            )
-            for photo in apartment.photos
-        ],
-        tags=[
-            TagDto(
-                id=tag.id,
-                name=tag.name,
-                svg_icon=tag.svg_icon,
-            )
-            for tag in apartment.tags
+def map_photo_to_dict(photo) -> dict:  # ApartmentPhoto or a row with its columns
+    return {
+        "id": photo.id,
+        "image_url": photo.image_url,
+        "is_main": photo.is_main,
+        "variants": [
+            {field: v[field] for field in VARIANT_FIELDS} for v in photo.variants or []
         ],
-    )
+    }
 
 
-@router.get("", response_model=BasePagedResponse[ApartmentDto])
-async def get_apartments(
-    session: SessionDep,
-    q: Annotated[ApartmentFilter, Depends()],
-):
-    query = select(Apartment)
+def map_apartment_to_list_dto(apartment: Apartment) -> dict:
+    return {
+        "id": apartment.id,
+        "user_id": apartment.user_id,
+        "title": apartment.title,
+        "description": apartment.description,
+        "address": apartment.address,
+        "city": apartment.city,
+        "country": apartment.country,
+        "price_per_night": apartment.price_per_night,
+        "max_guests": apartment.max_guests,
+        "status": apartment.status,
+        "latitude": apartment.latitude,
+        "longitude": apartment.longitude,
+        "rating_average": apartment.rating_average,
+        "reviews_count": apartment.reviews_count,
+        "photos": [map_photo_to_dict(photo) for photo in apartment.photos],
+    }
+
+
+def map_card_row_to_dict(row, main_photo: Optional[dict]) -> dict:
+    return {
+        "id": row.id,
+        "title": row.title,
+        "description": row.description,
+        "city": row.city,
+        "country": row.country,
+        "price_per_night": row.price_per_night,
+        "max_guests": row.max_guests,
+        "latitude": row.latitude,
+        "longitude": row.longitude,
+        "rating_average": row.rating_average,
+        "reviews_count": row.reviews_count,
+        "main_photo": main_photo,
+    }
+
+
+def map_apartment_to_detail_dto(
+    apartment: Apartment, tags: List[dict], include_svg: bool = True
+) -> dict:
+    detail = map_apartment_to_list_dto(apartment)
+    detail["tags"] = [
+        {
+            "id": tag["id"],
+            "name": tag["name"],
+            "icon_key": tag["icon_key"],
+            "svg_icon": tag["svg_icon"] if include_svg else None,
+        }
+        for tag in tags
+    ]
+    return detail
+
+
+def apply_apartment_filters(query, q: ApartmentFilter, dialect: str):
+    """Returns the filtered query and the sorts that only exist for these filters."""
+    extra_sorts: dict[str, SortKey] = {}
+
+    if q.q and q.q.strip():
+        query, relevance = apply_text_search(query, q.q.strip(), dialect)
+        if relevance is not None:
+            extra_sorts["relevance"] = relevance
+
+    if q.near:
+        lat, lon = parse_point(q.near)
+        query, distance = apply_radius(query, lat, lon, q.radius_km)
+        extra_sorts["distance"] = distance
+    elif q.radius_km is not None:
+        raise HTTPException(status_code=400, detail="radius_km requires near")
+
+    if q.bbox:
+        query = apply_bbox(query, parse_bbox(q.bbox))
 
-    # filters
     if q.name:
-        query = query.where(Apartment.name.ilike(f"%{q.name}%"))
+        query = query.where(Apartment.title.ilike(f"%{q.name}%"))
 
     if q.address:
         query = query.where(Apartment.address.ilike(f"%{q.address}%"))
@@ -192,81 +288,212 @@ async def get_apartments(
     if q.rating_average_max is not None:
         query = query.where(Apartment.rating_average <= q.rating_average_max)
 
-    count_query = select(func.count()).select_from(query.subquery())
-    total = (await session.exec(count_query)).one()
+    if q.check_in is not None or q.check_out is not None:
+        if q.check_in is None or q.check_out is None:
+            raise HTTPException(
+                status_code=400, detail="check_in and check_out go together"
+            )
+        if q.check_out <= q.check_in:
+            raise HTTPException(
+                status_code=400, detail="check_out must be after check_in"
+            )
+
+        # anti join, a range seek on the booked days primary key
+        booked = (
+            select(BookedDay.day)
+            .where(
+                BookedDay.apartment_id == Apartment.id,
+                BookedDay.day >= q.check_in,
+                BookedDay.day < q.check_out,
+            )
+            .exists()
+        )
+        query = query.where(~booked)
+
+    return query, extra_sorts
+
+
+def _total_cache_key(scope: str, q: ApartmentFilter) -> tuple:
+    filters = q.model_dump(
+        exclude={"page_number", "page_size", "cursor", "total_mode", "sort", "view"},
+        exclude_none=True,
+    )
+    return (scope, tuple(sorted((k, str(v)) for k, v in filters.items())))
+
 
-    offset = (q.page_number - 1) * q.page_size
-    query = (
-        query.options(selectinload(Apartment.photos)).offset(offset).limit(q.page_size)
+def _resolve_sort(q: ApartmentFilter, extra_sorts: dict[str, SortKey]):
+    sort = q.sort or next(iter(extra_sorts), "id")
+
+    sort_key = extra_sorts.get(sort) or APARTMENT_SORTS.get(sort)
+    if sort_key is None:
+        raise HTTPException(
+            status_code=400, detail=f"Sort '{sort}' is not available for these filters"
+        )
+
+    return sort, sort_key
+
+
+CARD_DESCRIPTION_LENGTH = 200
+CARD_COLUMNS = (
+    Apartment.id,
+    Apartment.title,
+    # cut in SQL so the full text never leaves the database
+    func.substr(Apartment.description, 1, CARD_DESCRIPTION_LENGTH).label(
+        "description"
+    ),
+    Apartment.city,
+    Apartment.country,
+    Apartment.price_per_night,
+    Apartment.max_guests,
+    Apartment.latitude,
+    Apartment.longitude,
+    Apartment.rating_average,
+    Apartment.reviews_count,
+)
+
+
+async def fetch_main_photos(
+    session: AsyncSession, apartment_ids: List[int]
+) -> dict[int, dict]:
+    """
+    One photo per apartment: the one marked main, else the first uploaded.
+    Ranked with a window function over the photos of this page only.
+    """
+    if not apartment_ids:
+        return {}
+
+    ranked = (
+        select(
+            ApartmentPhoto.apartment_id,
+            ApartmentPhoto.id,
+            ApartmentPhoto.image_url,
+            ApartmentPhoto.is_main,
+            ApartmentPhoto.variants,
+            func.row_number()
+            .over(
+                partition_by=ApartmentPhoto.apartment_id,
+                order_by=(ApartmentPhoto.is_main.desc(), ApartmentPhoto.id),
+            )
+            .label("rank"),
+        )
+        .where(ApartmentPhoto.apartment_id.in_(apartment_ids))
+        .subquery()
     )
+    rows = (await session.execute(select(ranked).where(ranked.c.rank == 1))).all()
+    return {row.apartment_id: map_photo_to_dict(row) for row in rows}
+
+
+async def fetch_apartment_page(
+    session: AsyncSession,
+    query,
+    q: ApartmentFilter,
+    scope: str,
+    extra_sorts: dict[str, SortKey],
+) -> dict:
+    sort, sort_key = _resolve_sort(q, extra_sorts)
+
+    if q.cursor:
+        # keyset mode: seek past the last seen (sort key, id), no OFFSET and no COUNT
+        after = decode_cursor(q.cursor, sort, sort_key)
+        total, total_exact = None, False
+        query = apply_keyset(query, sort_key, Apartment.id, after)
+    else:
+        total, total_exact = await count_total(
+            session, query, q.total_mode, _total_cache_key(scope, q)
+        )
+
+        offset = (q.page_number - 1) * q.page_size
+        query = apply_keyset(query, sort_key, Apartment.id).offset(offset)
+
+    # one extra row tells us whether there is a next page
+    query = query.limit(q.page_size + 1)
 
-    items = (await session.exec(query)).all()
-    dto_items = [map_apartment_to_list_dto(a) for a in items]
+    if q.view == "card":
+        # plain columns instead of entities, no description beyond the snippet
+        query = query.with_only_columns(
+            *CARD_COLUMNS, sort_key.column.label("sort_value")
+        )
+        rows = [(row, row.sort_value) for row in (await session.execute(query)).all()]
+    elif sort_key.computed:
+        query = query.options(selectinload(Apartment.photos)).add_columns(
+            sort_key.column.label("sort_value")
+        )
+        rows = [(row[0], row[1]) for row in (await session.execute(query)).all()]
+    else:
+        query = query.options(selectinload(Apartment.photos))
+        rows = [
+            (a, getattr(a, sort_key.column.key))
+            for a in (await session.exec(query)).all()
+        ]
+
+    page = rows[: q.page_size]
+
+    next_cursor = None
+    if len(rows) > q.page_size:
+        last, last_key = page[-1]
+        next_cursor = encode_cursor(sort, last_key, last.id)
+
+    if q.view == "card":
+        main_photos = await fetch_main_photos(session, [row.id for row, _ in page])
+        items = [map_card_row_to_dict(row, main_photos.get(row.id)) for row, _ in page]
+    else:
+        items = [map_apartment_to_list_dto(a) for a, _ in page]
 
     return {
         "page_number": q.page_number,
         "page_size": q.page_size,
         "total": total,
-        "items": dto_items,
+        "total_exact": total_exact,
+        "items": items,
+        "next_cursor": next_cursor,
     }
 
 
 @router.get(
-    "/my", response_model=BasePagedResponse[ApartmentDto]
+    "", response_model=BasePagedResponse[Union[ApartmentDto, ApartmentCardDto]]
+)
+async def get_apartments(
+    request: Request,
+    session: ReadSessionDep,
+    q: Annotated[ApartmentFilter, Depends()],
+):
+    cache_key = response_cache.make_key(
+        "apartments", sorted(q.model_dump(exclude_none=True).items())
+    )
+    cached = await response_cache.get(request, cache_key)
+    if cached is not None:
+        return cached
+
+    dialect = session.get_bind().dialect.name
+    query, extra_sorts = apply_apartment_filters(select(Apartment), q, dialect)
+    page = await fetch_apartment_page(
+        session, query, q, scope="public", extra_sorts=extra_sorts
+    )
+
+    # any apartment write can move items between pages, listings share one dependency
+    return await response_cache.store(request, cache_key, page, deps=["apartments"])
+
+
+@router.get(
+    "/my", response_model=BasePagedResponse[Union[ApartmentDto, ApartmentCardDto]]
 )  # this endpoint is used for filtering only apparmets that belongs to host
 async def get_my_apartments(
-    session: SessionDep,
+    session: ReadSessionDep,
     q: Annotated[ApartmentFilter, Depends()],
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     allowed: bool = Depends(Policy({Role.HOST}).check_access),
 ):
     query = select(Apartment).where(Apartment.user_id == current_user.id)
-
-    # filters (same as get_apartments)
-    if q.name:
-        query = query.where(Apartment.name.ilike(f"%{q.name}%"))
-
-    if q.address:
-        query = query.where(Apartment.address.ilike(f"%{q.address}%"))
-
-    if q.city:
-        query = query.where(Apartment.city.ilike(f"%{q.city}%"))
-
-    if q.country:
-        query = query.where(Apartment.country.ilike(f"%{q.country}%"))
-
-    if q.price_per_night_min is not None:
-        query = query.where(Apartment.price_per_night >= q.price_per_night_min)
-
-    if q.price_per_night_max is not None:
-        query = query.where(Apartment.price_per_night <= q.price_per_night_max)
-
-    if q.max_guests is not None:
-        query = query.where(Apartment.max_guests >= q.max_guests)
-
-    if q.rating_average_min is not None:
-        query = query.where(Apartment.rating_average >= q.rating_average_min)
-
-    if q.rating_average_max is not None:
-        query = query.where(Apartment.rating_average <= q.rating_average_max)
-
-    count_query = select(func.count()).select_from(query.subquery())
-    total = (await session.exec(count_query)).one()
-
-    offset = (q.page_number - 1) * q.page_size
-    query = (
-        query.options(selectinload(Apartment.photos)).offset(offset).limit(q.page_size)
+    dialect = session.get_bind().dialect.name
+    query, extra_sorts = apply_apartment_filters(query, q, dialect)
+    page = await fetch_apartment_page(
+        session,
+        query,
+        q,
+        scope=f"user:{current_user.id}",
+        extra_sorts=extra_sorts,
     )
-
-    items = (await session.exec(query)).all()
-    dto_items = [map_apartment_to_list_dto(a) for a in items]
-
-    return {
-        "page_number": q.page_number,
-        "page_size": q.page_size,
-        "total": total,
-        "items": dto_items,
-    }
+    return FastJSONResponse(page)
 
 
 class ApartmentCreateRequest(BaseModel):
@@ -286,19 +513,9 @@ class ApartmentCreateRequest(BaseModel):
 async def create_apartment(
     session: SessionDep,
     request_body: ApartmentCreateRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     allowed: bool = Depends(Policy({Role.HOST}).check_access),
 ):
-    coords = None
-    try:
-        coords = await geocode_osm_nominatim(
-            address=request_body.address,
-            city=request_body.city,
-            country=request_body.country,
-        )
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-
     apartment = Apartment(
         user_id=current_user.id,
         title=request_body.title,
@@ -309,8 +526,9 @@ async def create_apartment(
         price_per_night=request_body.price_per_night,
         max_guests=request_body.max_guests,
         status="active",
-        latitude=coords[0] if coords else None,
-        longitude=coords[1] if coords else None,
+        # filled in by the background geocode worker
+        latitude=None,
+        longitude=None,
     )
 
     if request_body.tag_ids:
@@ -326,37 +544,292 @@ async def create_apartment(
         apartment.tags = list(tags)
 
     session.add(apartment)
+    await session.flush()
+
+    # outbox row commits together with the apartment
+    job = enqueue_geocode(session, apartment.id)
+
     await session.commit()
     await session.refresh(apartment)
+    clear_total_cache()
+    await response_cache.invalidate("apartments")
+    geocode_worker.notify(job.id)
 
     return apartment
 
 
+AVAILABILITY_MAX_APARTMENTS = 50
+AVAILABILITY_MAX_DAYS = 366
+
+
+class ApartmentAvailabilityDto(BaseModel):
+    apartment_id: int
+    booked_days: int
+    # exactly one of these is set, depending on the requested encoding
+    bitmap: Optional[str] = None  # base64, little endian, bit i = day i booked
+    runs: Optional[List[Tuple[int, int]]] = None  # (day offset, length) booked
+
+
+class AvailabilityCalendarResponse(BaseModel):
+    start: date
+    end: date  # exclusive
+    days: int
+    encoding: Literal["bitmap", "rle"]
+    apartments: List[ApartmentAvailabilityDto]
+
+
+# must be registered before "/{apartment_id}"
+@router.get(
+    "/availability",
+    response_model=AvailabilityCalendarResponse,
+    response_model_exclude_none=True,
+)
+async def get_availability_calendar(
+    session: ReadSessionDep,
+    apartment_ids: List[int] = Query(..., min_length=1),
+    start: date = Query(...),
+    end: date = Query(..., description="exclusive"),
+    encoding: Literal["bitmap", "rle"] = Query("bitmap"),
+):
+    ids = list(dict.fromkeys(apartment_ids))
+    if len(ids) > AVAILABILITY_MAX_APARTMENTS:
+        raise HTTPException(
+            400, f"At most {AVAILABILITY_MAX_APARTMENTS} apartments per request"
+        )
+
+    days = (end - start).days
+    if days <= 0:
+        raise HTTPException(400, "end must be after start")
+    if days > AVAILABILITY_MAX_DAYS:
+        raise HTTPException(400, "Range can't be longer than 12 months")
+
+    now = datetime.now(UTC)
+    if start < date(now.year, now.month, 1):
+        raise HTTPException(400, "You can't query previous dates")
+
+    existing = (
+        await session.exec(select(Apartment.id).where(Apartment.id.in_(ids)))
+    ).all()
+    if len(existing) != len(ids):
+        raise HTTPException(404, "Invalid apartment")
+
+    booked = await get_booked_days(session, ids, start, end)
+    apartments = []
+    for apartment_id in ids:
+        runs = days_to_runs(booked[apartment_id], start, end)
+        dto = ApartmentAvailabilityDto(
+            apartment_id=apartment_id,
+            booked_days=sum(length for _, length in runs),
+        )
+        if encoding == "bitmap":
+            dto.bitmap = runs_to_bitmap(runs, days)
+        else:
+            dto.runs = runs
+        apartments.append(dto)
+
+    return AvailabilityCalendarResponse(
+        start=start, end=end, days=days, encoding=encoding, apartments=apartments
+    )
+
+
+QUOTE_MAX_APARTMENTS = 50
+QUOTE_MAX_NIGHTS = 366
+
+
+class QuoteDto(BaseModel):
+    apartment_id: int
+    check_in: date
+    check_out: date  # exclusive
+    nights: int
+    guests: int
+    total_price: Decimal
+    # takes the guests and has no confirmed stay in the range
+    available: bool
+    # only in single apartment quotes
+    nightly_prices: Optional[List[Decimal]] = None
+
+
+class PriceOverrideRequest(BaseModel):
+    start: date
+    end: date  # exclusive
+    # None goes back to the apartment's price_per_night
+    price_per_night: Optional[Decimal] = Field(default=None, gt=0)
+
+
+def validate_stay(check_in: date, check_out: date) -> None:
+    nights = (check_out - check_in).days
+    if nights <= 0:
+        raise HTTPException(400, "check_out must be after check_in")
+    if nights > QUOTE_MAX_NIGHTS:
+        raise HTTPException(400, f"At most {QUOTE_MAX_NIGHTS} nights")
+    if check_in < datetime.now(UTC).date():
+        raise HTTPException(400, "You can't query previous dates")
+
+
+async def build_quotes(
+    session: AsyncSession,
+    ids: List[int],
+    check_in: date,
+    check_out: date,
+    guests: int,
+    nightly: bool = False,
+) -> List[QuoteDto]:
+    # only the columns a quote needs
+    apartments = (
+        await session.exec(
+            select(
+                Apartment.id,
+                Apartment.price_per_night,
+                Apartment.price_version,
+                Apartment.max_guests,
+            ).where(Apartment.id.in_(ids))
+        )
+    ).all()
+    if len(apartments) != len(ids):
+        raise HTTPException(404, "Invalid apartment")
+
+    quotes = await price_quoter.quote_many(session, apartments, check_in, check_out)
+    booked = await get_booked_apartments(session, ids, check_in, check_out)
+
+    by_id = {a.id: a for a in apartments}
+    return [
+        QuoteDto(
+            apartment_id=apartment_id,
+            check_in=check_in,
+            check_out=check_out,
+            nights=quotes[apartment_id].nights,
+            guests=guests,
+            total_price=quotes[apartment_id].total_price,
+            available=(
+                apartment_id not in booked
+                and guests <= by_id[apartment_id].max_guests
+            ),
+            nightly_prices=(
+                list(quotes[apartment_id].nightly_prices) if nightly else None
+            ),
+        )
+        for apartment_id in ids
+    ]
+
+
+# must be registered before "/{apartment_id}"
+@router.get(
+    "/quotes", response_model=List[QuoteDto], response_model_exclude_none=True
+)
+async def get_quotes(
+    session: ReadSessionDep,
+    apartment_ids: List[int] = Query(..., min_length=1),
+    check_in: date = Query(...),
+    check_out: date = Query(..., description="exclusive"),
+    guests: int = Query(1, ge=1),
+):
+    """Totals for many apartments at once, e.g. for a page of search results."""
+    ids = list(dict.fromkeys(apartment_ids))
+    if len(ids) > QUOTE_MAX_APARTMENTS:
+        raise HTTPException(
+            400, f"At most {QUOTE_MAX_APARTMENTS} apartments per request"
+        )
+    validate_stay(check_in, check_out)
+
+    return await build_quotes(session, ids, check_in, check_out, guests)
+
+
+@router.get("/{apartment_id}/quote", response_model=QuoteDto)
+async def get_quote(
+    apartment_id: int,
+    session: ReadSessionDep,
+    check_in: date = Query(...),
+    check_out: date = Query(..., description="exclusive"),
+    guests: int = Query(1, ge=1),
+):
+    validate_stay(check_in, check_out)
+
+    quotes = await build_quotes(
+        session, [apartment_id], check_in, check_out, guests, nightly=True
+    )
+    return quotes[0]
+
+
+@router.put("/{apartment_id}/prices", status_code=204)
+async def set_apartment_prices(
+    apartment_id: int,
+    request_body: PriceOverrideRequest,
+    session: SessionDep,
+    current_user: Principal = Depends(get_current_principal),
+    allowed: bool = Depends(Policy({Role.HOST}).check_access),
+):
+    """Price of every night in [start, end), overriding price_per_night."""
+    apartment = (
+        await session.exec(select(Apartment).where(Apartment.id == apartment_id))
+    ).first()
+    if not apartment:
+        raise HTTPException(status_code=404, detail="Apartment not found")
+    if apartment.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    validate_stay(request_body.start, request_body.end)
+
+    await set_price_overrides(
+        session,
+        apartment_id,
+        request_body.start,
+        request_body.end,
+        request_body.price_per_night,
+    )
+    await session.commit()
+    clear_total_cache()
+    await response_cache.invalidate("apartments", f"apartment:{apartment_id}")
+
+    return Response(status_code=204)
+
+
 @router.get("/{apartment_id}", response_model=ApartmentByIdDto)
 async def get_apartment_by_id(
+    request: Request,
     apartment_id: int,
-    session: SessionDep,
+    session: ReadSessionDep,
+    # clients that draw icons by icon_key can skip the inline SVG markup
+    include_svg: bool = Query(default=True),
 ):
+    cache_key = response_cache.make_key("apartment", apartment_id, include_svg)
+    cached = await response_cache.get(request, cache_key)
+    if cached is not None:
+        return cached
+
     result = await session.exec(
         select(Apartment)
         .where(Apartment.id == apartment_id)
-        .options(
-            selectinload(Apartment.photos),
-            selectinload(Apartment.tags),
-        )
+        .options(selectinload(Apartment.photos))
     )
     apartment = result.first()
 
     if not apartment:
         raise HTTPException(status_code=404, detail="Apartment not found")
 
-    return map_apartment_to_detail_dto(apartment)
+    # tag details come from the in-memory catalogue, only ids from the database
+    tag_ids = set(
+        (
+            await session.exec(
+                select(ApartmentTag.tag_id).where(
+                    ApartmentTag.apartment_id == apartment_id
+                )
+            )
+        ).all()
+    )
+    tags = [tag for tag in await tag_catalogue.all() if tag["id"] in tag_ids]
+
+    return await response_cache.store(
+        request,
+        cache_key,
+        map_apartment_to_detail_dto(apartment, tags, include_svg),
+        deps=[f"apartment:{apartment_id}"] + [f"tag:{tag_id}" for tag_id in tag_ids],
+    )
 
 
 @router.get("/{apartment_id}/rented-days")
 async def get_rented_days(
     apartment_id: int,
-    session: SessionDep,
+    session: ReadSessionDep,
     month: int = Query(..., ge=1, le=12),
     year: int = Query(...),
 ):
@@ -378,27 +851,10 @@ async def get_rented_days(
         day=1
     )
 
-    query = (
-        select(Reservation)
-        .where(
-            Reservation.apartment_id == apartment_id, Reservation.status == "confirmed"
-        )
-        .where(Reservation.check_in < month_end_exclusive)
-        .where(Reservation.check_out > month_start)
+    booked = await get_booked_days(
+        session, [apartment_id], month_start, month_end_exclusive
     )
-    res = await session.exec(query)
-    reservations = res.all()
-
-    rented_days: set[date] = set()
-
-    for reservation in reservations:
-        start = max(reservation.check_in, month_start)
-        end = min(reservation.check_out, month_end_exclusive)
-
-        d = start
-        while d < end:
-            rented_days.add(d)
-            d += timedelta(days=1)
+    rented_days = set(booked[apartment_id])
 
     result = []
     d = month_start
@@ -409,19 +865,11 @@ async def get_rented_days(
     return result
 
 
-from fastapi import Response
-
-
-from fastapi import Response
-from sqlalchemy import delete as sqldelete
-from app.models.apartment_photo import ApartmentPhoto
-
-
 @router.delete("/{apartment_id}", status_code=204)
 async def delete_apartment(
     apartment_id: int,
     session: SessionDep,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     allowed: bool = Depends(Policy({Role.HOST}).check_access),
 ):
     result = await session.exec(select(Apartment).where(Apartment.id == apartment_id))
@@ -433,11 +881,45 @@ async def delete_apartment(
     if apartment.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not allowed")
 
+    # pending and confirmed stays keep the apartment, cancelled and expired
+    # ones are only history and go with it
+    if await reservation_service.lock_apartment_for_removal(session, apartment_id):
+        await session.rollback()
+        raise HTTPException(
+            status_code=409, detail="Apartment has pending or confirmed reservations"
+        )
+
+    photos = (
+        await session.exec(
+            select(ApartmentPhoto).where(ApartmentPhoto.apartment_id == apartment_id)
+        )
+    ).all()
+    keys = [key for photo in photos for key in variant_keys(photo.variants)]
+
     await session.exec(
         sqldelete(ApartmentPhoto).where(ApartmentPhoto.apartment_id == apartment_id)
     )
+    await session.exec(
+        sqldelete(GeocodeJob).where(GeocodeJob.apartment_id == apartment_id)
+    )
+    await session.exec(
+        sqldelete(BookedDay).where(BookedDay.apartment_id == apartment_id)
+    )
+    await session.exec(
+        sqldelete(Reservation).where(Reservation.apartment_id == apartment_id)
+    )
+    await session.exec(
+        sqldelete(ApartmentPriceOverride).where(
+            ApartmentPriceOverride.apartment_id == apartment_id
+        )
+    )
+    released = await release_blobs(session, keys)
 
     await session.delete(apartment)
     await session.commit()
+    clear_total_cache()
+    await response_cache.invalidate("apartments", f"apartment:{apartment_id}")
+
+    await collect_blobs(session, photo_storage, released)
 
     return Response(status_code=204)
@@ -12,25 +12,34 @@ from app.models.apartment import Apartment
 from sqlalchemy import func
 
 from app.auth.authorization import Policy
-from app.auth.current_user import get_current_user
+from app.auth.current_user import Principal, get_current_principal
 from app.enums.role_enum import Role
-from app.models.user import User
 
 
 router = APIRouter(
     prefix="/apartments/{apartment_id}/photos", tags=["apartments_photo"]
 )
 SessionDep = Annotated[AsyncSession, Depends(db.get_session)]
+ReadSessionDep = Annotated[AsyncSession, Depends(db.get_read_session)]
 
 
 class ApartmentPhotoResponse(BaseModel):
     items: list[ApartmentPhotoDto] = []
 
 
+class ApartmentPhotoVariantDto(BaseModel):
+    name: str  # thumb, card, full
+    format: str  # webp, avif
+    width: int
+    height: int
+    url: str
+
+
 class ApartmentPhotoDto(BaseModel):
     id: int
     path: str
     is_main: bool
+    variants: list[ApartmentPhotoVariantDto] = []
 
 
 from fastapi import Depends, HTTPException
@@ -40,7 +49,7 @@ from sqlmodel import select
 async def apartment_belongs_to_host(
     apartment_id: int,
     session: SessionDep,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
 ) -> Apartment:
     apt = (
         await session.exec(select(Apartment).where(Apartment.id == apartment_id))
@@ -58,7 +67,7 @@ async def apartment_belongs_to_host(
 @router.get("", response_model=list[ApartmentPhotoDto])
 async def get_apartment_main_photo(
     apartment_id: int,
-    session: SessionDep,
+    session: ReadSessionDep,
 ):
     apt = (
         await session.exec(select(Apartment).where(Apartment.id == apartment_id))
@@ -76,7 +85,10 @@ async def get_apartment_main_photo(
     result: list[ApartmentPhotoDto] = []
     for item in photos:
         photo_dto = ApartmentPhotoDto(
-            id=item.id, path=item.image_url, is_main=item.is_main
+            id=item.id,
+            path=item.image_url,
+            is_main=item.is_main,
+            variants=item.variants or [],
         )
         result.append(photo_dto)
 
@@ -89,6 +101,23 @@ from fastapi.staticfiles import StaticFiles
 from typing import Annotated, List
 from uuid import uuid4
 from app.models.apartment_photo import ApartmentPhoto
+from app.services.image_processing import InvalidImageError, create_variants
+from app.services.photo_storage import (
+    abandon_blobs,
+    blob_key,
+    collect_blobs,
+    photo_storage,
+    release_blobs,
+    store_blob,
+    variant_keys,
+)
+from app.services.response_cache import response_cache
+from app.services.upload_storage import (
+    create_staging_dir,
+    remove_files,
+    remove_staging_dir,
+    save_upload,
+)
 
 
 UPLOAD_DIR = Path("static/images/apartments")
@@ -102,9 +131,6 @@ async def upload_apartment_photos(
     apartment: Apartment = Depends(apartment_belongs_to_host),
     allowed: bool = Depends(Policy({Role.HOST}).check_access),
 ):
-    apartment_dir = UPLOAD_DIR / str(apartment.id)
-    apartment_dir.mkdir(parents=True, exist_ok=True)
-
     created: list[ApartmentPhoto] = []
 
     for file in photos:
@@ -114,35 +140,77 @@ async def upload_apartment_photos(
                 detail=f"Only image files are allowed. Invalid: {file.filename}",
             )
 
-    for file in photos:
-        ext = Path(file.filename).suffix.lower()
-        # filename = f"{uuid4().hex}{ext}"
-        filename = file.filename
-
-        file_path = apartment_dir / filename
-        url = f"/static/images/apartments/{apartment.id}/{filename}"
-
-        with file_path.open("wb") as buffer:
-            while chunk := await file.read(1024 * 1024):
-                buffer.write(chunk)
+    # references taken so far, dropped again if the upload fails part way
+    acquired: list[str] = []
+    staging = await create_staging_dir()
+    try:
+        for index, file in enumerate(photos):
+            ext = Path(file.filename).suffix.lower()
+            original = staging / f"{index}{ext}"
+
+            await save_upload(file, original)
+
+            # resized, re-encoded variants replace the original upload
+            try:
+                variants = await create_variants(original, staging, str(index))
+            except InvalidImageError:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Could not read image: {file.filename}",
+                )
+
+            # identical variants (same upload twice, or a small image whose
+            # sizes coincide) share one stored object, counted per reference
+            for variant in variants:
+                key = blob_key(variant.pop("sha256"), variant["format"])
+                content_type = f"image/{variant['format']}"
+
+                await store_blob(
+                    photo_storage,
+                    key,
+                    staging / variant.pop("filename"),
+                    variant.pop("size"),
+                    content_type,
+                )
+                acquired.append(key)
+
+                variant["key"] = key
+                variant["url"] = photo_storage.url(key)
+
+            full = next(
+                v
+                for v in variants
+                if v["name"] == "full" and v["format"] == "webp"
+            )
 
-        photo = ApartmentPhoto(
-            apartment_id=apartment.id,
-            image_url=url,
-            is_main=False,
-        )
-        session.add(photo)
-        created.append(photo)
+            photo = ApartmentPhoto(
+                apartment_id=apartment.id,
+                image_url=full["url"],
+                is_main=False,
+                variants=variants,
+            )
+            session.add(photo)
+            created.append(photo)
 
-        await file.close()
+        await session.commit()
+    except BaseException:
+        await session.rollback()
+        await abandon_blobs(photo_storage, acquired)
+        raise
+    finally:
+        await remove_staging_dir(staging)
 
-    await session.commit()
+    # listings and the detail page both show photos
+    await response_cache.invalidate("apartments", f"apartment:{apartment.id}")
 
     for p in created:
         await session.refresh(p)
 
     return [
-        ApartmentPhotoDto(id=p.id, path=p.image_url, is_main=False) for p in created
+        ApartmentPhotoDto(
+            id=p.id, path=p.image_url, is_main=False, variants=p.variants or []
+        )
+        for p in created
     ]
 
 
@@ -174,15 +242,25 @@ async def delete_appartment_photo(
     if not matched_ids:
         return
 
+    keys = []
+    legacy_paths = []
+    for photo in apartment_photos:
+        photo_keys = variant_keys(photo.variants)
+        if photo_keys:
+            keys.extend(photo_keys)
+            continue
+
+        # uploaded before photo storage, plain files in the apartment folder
+        urls = [photo.image_url] + [v["url"] for v in photo.variants or []]
+        legacy_paths.extend(
+            UPLOAD_DIR / str(apartment_id) / Path(url).name for url in urls
+        )
+
     await session.exec(delete(ApartmentPhoto).where(ApartmentPhoto.id.in_(matched_ids)))
+    released = await release_blobs(session, keys)
     await session.commit()
+    await response_cache.invalidate("apartments", f"apartment:{apartment_id}")
 
-    # delete files from disk
-    apartment_dir = UPLOAD_DIR / str(apartment_id)
-
-    for photo in apartment_photos:
-        filename = Path(photo.image_url).name
-        filepath = apartment_dir / filename
-
-        if filepath.is_file():
-            filepath.unlink()
+    # delete files no other photo uses
+    await collect_blobs(session, photo_storage, released)
+    await remove_files(legacy_paths)
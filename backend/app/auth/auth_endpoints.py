@@ -11,11 +11,12 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.db import db
 from app.models.user import User
-from app.models.user_session import UserSession
 from app.auth.dependencies import get_auth_service
 from app.auth.auth_helper import AuthHelper
 from app.enums.role_enum import Role
 from app.auth.current_user import get_current_user
+from app.auth.session_store import NewSession, session_store
+from app.auth.user_cache import get_cached_user
 
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -30,6 +31,24 @@ class RegisterRequest(BaseModel):
     role: Role = Role.USER
 
 
+REFRESH_ERRORS = {
+    "invalid": "Invalid refresh token",
+    "revoked": "Refresh token revoked",
+    "expired": "Refresh token expired",
+    # the token was already exchanged by someone else, the whole login is revoked
+    "reused": "Refresh token reuse detected, log in again",
+}
+
+
+def new_session(auth: AuthHelper, request: Request, refresh_hash: str) -> NewSession:
+    return NewSession(
+        token_hash=refresh_hash,
+        ttl=timedelta(days=auth.REFRESH_TTL_DAYS),
+        user_agent=request.headers.get("user-agent"),
+        ip_address=request.client.host if request.client else None,
+    )
+
+
 @router.post("/register", status_code=201)
 async def register(
     payload: RegisterRequest,
@@ -40,32 +59,19 @@ async def register(
 ):
     refresh_raw = auth.create_refresh_token()
     refresh_hash = auth.hash_refresh_token(refresh_raw)
+    password_hash = await auth.hash_password(payload.password)
 
     try:
         user = User(
             role=payload.role,
             name=payload.name,
             email=payload.email,
-            password=auth.hash_password(payload.password),
+            password=password_hash,
             phone=payload.phone,
             created_at=auth.utcnow(),
             updated_at=auth.utcnow(),
         )
         session.add(user)
-        await session.flush()
-
-        session.add(
-            UserSession(
-                user_id=user.id,
-                refresh_token_hash=refresh_hash,
-                user_agent=request.headers.get("user-agent"),
-                ip_address=request.client.host if request.client else None,
-                created_at=auth.utcnow(),
-                expires_at=auth.utcnow() + timedelta(days=auth.REFRESH_TTL_DAYS),
-                revoked_at=None,
-            )
-        )
-
         await session.commit()
 
     except IntegrityError:
@@ -75,6 +81,8 @@ async def register(
         await session.rollback()
         raise
 
+    await session_store.create(user.id, new_session(auth, request, refresh_hash))
+
     auth.set_refresh_cookie(response, refresh_raw)
 
     return {
@@ -104,24 +112,13 @@ async def login(
     q = await session.exec(select(User).where(User.email == email))
     user = q.first()
 
-    if not user or not auth.verify_password(password, user.password):
+    if not user or not await auth.verify_password(password, user.password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     refresh_raw = auth.create_refresh_token()
     refresh_hash = auth.hash_refresh_token(refresh_raw)
 
-    session.add(
-        UserSession(
-            user_id=user.id,
-            refresh_token_hash=refresh_hash,
-            user_agent=request.headers.get("user-agent"),
-            ip_address=request.client.host if request.client else None,
-            created_at=auth.utcnow(),
-            expires_at=auth.utcnow() + timedelta(days=auth.REFRESH_TTL_DAYS),
-            revoked_at=None,
-        )
-    )
-    await session.commit()
+    await session_store.create(user.id, new_session(auth, request, refresh_hash))
 
     auth.set_refresh_cookie(response, refresh_raw)
 
@@ -144,42 +141,21 @@ async def refresh(
         raise HTTPException(status_code=401, detail="Missing refresh token")
 
     refresh_hash = auth.hash_refresh_token(refresh_raw)
+    new_refresh_raw = auth.create_refresh_token()
+    new_refresh_hash = auth.hash_refresh_token(new_refresh_raw)
 
-    q = await session.exec(
-        select(UserSession).where(UserSession.refresh_token_hash == refresh_hash)
+    # revoke the old token and issue the new one in one atomic step
+    result = await session_store.rotate(
+        refresh_hash, new_session(auth, request, new_refresh_hash)
     )
-    old = q.first()
-
-    if not old:
-        raise HTTPException(status_code=401, detail="Invalid refresh token")
-    if old.revoked_at is not None:
-        raise HTTPException(status_code=401, detail="Refresh token revoked")
-    if old.expires_at <= auth.utcnow():
-        raise HTTPException(status_code=401, detail="Refresh token expired")
+    if result.status != "rotated":
+        raise HTTPException(status_code=401, detail=REFRESH_ERRORS[result.status])
 
-    user = await session.get(User, old.user_id)
+    # usually served from the user cache, no database round trip
+    user = await get_cached_user(session, result.user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
 
-    old.revoked_at = auth.utcnow()
-    session.add(old)
-
-    new_refresh_raw = auth.create_refresh_token()
-    new_refresh_hash = auth.hash_refresh_token(new_refresh_raw)
-
-    session.add(
-        UserSession(
-            user_id=user.id,
-            refresh_token_hash=new_refresh_hash,
-            user_agent=request.headers.get("user-agent"),
-            ip_address=request.client.host if request.client else None,
-            created_at=auth.utcnow(),
-            expires_at=auth.utcnow() + timedelta(days=auth.REFRESH_TTL_DAYS),
-            revoked_at=None,
-        )
-    )
-    await session.commit()
-
     auth.set_refresh_cookie(response, new_refresh_raw)
 
     return {
@@ -193,21 +169,12 @@ async def refresh(
 async def logout(
     response: Response,
     request: Request,
-    session: SessionDep,
     auth: AuthHelper = Depends(get_auth_service),
 ):
     refresh_raw = request.cookies.get(auth.REFRESH_COOKIE_NAME)
 
     if refresh_raw:
-        refresh_hash = auth.hash_refresh_token(refresh_raw)
-        q = await session.exec(
-            select(UserSession).where(UserSession.refresh_token_hash == refresh_hash)
-        )
-        us = q.first()
-        if us and us.revoked_at is None:
-            us.revoked_at = auth.utcnow()
-            session.add(us)
-            await session.commit()
+        await session_store.revoke(auth.hash_refresh_token(refresh_raw))
 
     auth.clear_refresh_cookie(response)
     return {"status": "ok"}
@@ -5,11 +5,11 @@ import secrets
 
 import jwt
 from fastapi import HTTPException, Response
-from passlib.context import CryptContext
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.models.user import User
-from app.env_loader import require_env
+from app.env_loader import get_env, require_env
+from app.auth.password_hasher import PasswordHasher
 
 
 class AuthHelper:
@@ -27,17 +27,25 @@ class AuthHelper:
 
     REFRESH_HASH_PEPPER = require_env("REFRESH_HASH_PEPPER")
 
+    BCRYPT_ROUNDS = int(get_env("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS = int(get_env("PASSWORD_HASH_WORKERS", "4"))
+    PASSWORD_HASH_MAX_QUEUE = int(get_env("PASSWORD_HASH_MAX_QUEUE", "32"))
+
     def __init__(self):
-        self._pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self.password_hasher = PasswordHasher(
+            rounds=self.BCRYPT_ROUNDS,
+            workers=self.PASSWORD_HASH_WORKERS,
+            max_queue=self.PASSWORD_HASH_MAX_QUEUE,
+        )
 
     def utcnow(self) -> datetime:
         return datetime.now(timezone.utc)
 
-    def hash_password(self, password: str) -> str:
-        return self._pwd_context.hash(password)
+    async def hash_password(self, password: str) -> str:
+        return await self.password_hasher.hash(password)
 
-    def verify_password(self, plain: str, stored_hash: str) -> bool:
-        return self._pwd_context.verify(plain, stored_hash)
+    async def verify_password(self, plain: str, stored_hash: str) -> bool:
+        return await self.password_hasher.verify(plain, stored_hash)
 
     def hash_refresh_token(self, raw: str) -> str:
         return hmac.new(
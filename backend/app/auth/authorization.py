@@ -1,15 +1,14 @@
 from fastapi import Depends, HTTPException
 
-from app.models.user import User
 from app.enums.role_enum import Role
-from app.auth.current_user import get_current_user
+from app.auth.current_user import Principal, get_current_principal
 
 
 class Policy:
     def __init__(self, allowed_roles: set[Role]):
         self.allowed_roles = allowed_roles
 
-    def check_access(self, user: User = Depends(get_current_user)) -> bool:
+    def check_access(self, user: Principal = Depends(get_current_principal)) -> bool:
         if user.role == Role.ADMIN:
             return True
 
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from typing import Annotated
 
 from fastapi import Depends, HTTPException
@@ -6,22 +7,40 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.db import db
 from app.models.user import User
+from app.enums.role_enum import Role
 from app.auth.dependencies import get_auth_service
 from app.auth.auth_helper import AuthHelper
+from app.auth.user_cache import get_cached_user
 
 SessionDep = Annotated[AsyncSession, Depends(db.get_session)]
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-async def get_current_user(
-    session: SessionDep,
+@dataclass(frozen=True)
+class Principal:
+    """Caller identity taken from the verified access token claims."""
+
+    id: int
+    role: Role
+
+
+def get_current_principal(
     token: str = Depends(oauth2_scheme),
     auth: AuthHelper = Depends(get_auth_service),
-) -> User:
+) -> Principal:
+    # no DB round trip, role and ownership checks only need sub + role
     payload = auth.decode_access_token(token)
-    user_id = int(payload["sub"])
+    try:
+        return Principal(id=int(payload["sub"]), role=Role(payload["role"]))
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=401, detail="Invalid access token")
+
 
-    user = await session.get(User, user_id)
+async def get_current_user(
+    session: SessionDep,
+    principal: Principal = Depends(get_current_principal),
+) -> User:
+    user = await get_cached_user(session, principal.id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
 
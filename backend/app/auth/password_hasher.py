@@ -0,0 +1,103 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+
+@dataclass
+class _Timing:
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def add(self, ms: float) -> None:
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated thread pool so it never blocks the
+    event loop (bcrypt releases the GIL while hashing).
+
+    At most `workers` hashes run at once and at most `max_queue` more wait
+    for a worker, anything beyond that is rejected with 503 right away
+    instead of piling up behind a login burst.
+    """
+
+    def __init__(self, rounds: int, workers: int, max_queue: int):
+        self._pwd_context = CryptContext(
+            schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hash"
+        )
+        self._capacity = workers + max_queue
+        self._in_flight = 0
+
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+
+        self._wait = _Timing()
+        self._hash = _Timing()
+        self._rejected = 0
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        return result, started, time.perf_counter()
+
+    async def _run(self, fn, *args):
+        if self._in_flight >= self._capacity:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Too many authentication requests, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+
+        self._in_flight += 1
+        submitted = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, started, finished = await loop.run_in_executor(
+                self._executor, self._timed, fn, *args
+            )
+        finally:
+            self._in_flight -= 1
+
+        self._wait.add((started - submitted) * 1000)
+        self._hash.add((finished - started) * 1000)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._pwd_context.hash, password)
+
+    async def verify(self, plain: str, stored_hash: str) -> bool:
+        return await self._run(self._pwd_context.verify, plain, stored_hash)
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "rejected": self._rejected,
+            "wait": self._wait.as_dict(),
+            "hash": self._hash.as_dict(),
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
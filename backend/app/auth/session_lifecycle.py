@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Optional
+
+from app.auth.session_store import SessionStore, session_store
+from app.env_loader import get_env
+
+logger = logging.getLogger(__name__)
+
+SESSION_SWEEP_INTERVAL_SECONDS = float(
+    get_env("SESSION_SWEEP_INTERVAL_SECONDS", "3600")
+)
+
+
+class SessionSweeper:
+    """
+    Periodically deletes expired sessions and sessions revoked more than
+    SESSION_REVOKED_RETENTION_HOURS ago from the session store, so its size
+    (and the refresh token index) follows the number of live sessions.
+    """
+
+    def __init__(
+        self,
+        store: SessionStore,
+        interval_seconds: float = SESSION_SWEEP_INTERVAL_SECONDS,
+    ):
+        self._store = store
+        self._interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.deleted_total = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                deleted = await self.sweep()
+                if deleted:
+                    logger.info("Session sweep deleted %s sessions", deleted)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Session sweep failed")
+
+            await asyncio.sleep(self._interval_seconds)
+
+    async def sweep(self) -> int:
+        deleted = await self._store.sweep()
+        self.deleted_total += deleted
+        return deleted
+
+    def stats(self) -> dict:
+        return {"deleted_total": self.deleted_total}
+
+
+# SINGLE shared sweeper for whole app
+session_sweeper = SessionSweeper(session_store)
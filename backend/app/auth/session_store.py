@@ -0,0 +1,420 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+from uuid import uuid4
+
+from sqlalchemy import DateTime, String, delete, insert, literal, or_, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import db
+from app.env_loader import get_env
+from app.models.user_session import UserSession
+
+# db (user_sessions table) | memory (per process, single instance deployments)
+SESSION_STORE = get_env("SESSION_STORE", "db")
+# older active sessions of the user are revoked when a new one goes over this
+MAX_ACTIVE_SESSIONS_PER_USER = int(get_env("MAX_ACTIVE_SESSIONS_PER_USER", "10"))
+SESSION_SWEEP_BATCH_SIZE = int(get_env("SESSION_SWEEP_BATCH_SIZE", "1000"))
+# revoked rows are kept a while so a replayed refresh token is still recognized
+SESSION_REVOKED_RETENTION_HOURS = float(
+    get_env("SESSION_REVOKED_RETENTION_HOURS", "24")
+)
+# a second tab refreshing with the same token at once gets a new one instead
+# of being treated as token theft (once per token)
+REFRESH_REUSE_GRACE_SECONDS = float(get_env("REFRESH_REUSE_GRACE_SECONDS", "10"))
+
+
+def utcnow() -> datetime:
+    # naive UTC, the way session timestamps are stored
+    return datetime.utcnow()
+
+
+@dataclass(frozen=True)
+class NewSession:
+    token_hash: str
+    ttl: timedelta
+    user_agent: Optional[str] = None
+    ip_address: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class RotateResult:
+    # rotated | invalid | expired | revoked | reused
+    status: str
+    user_id: Optional[int] = None
+
+
+class SessionStore(ABC):
+    """
+    Refresh token sessions. Tokens are only ever seen as their hash.
+
+    Every login starts a family, each rotation adds the successor to it.
+    Presenting a token that was already rotated means two parties hold the
+    same family, so the whole family is revoked. Only within the grace
+    period, and only once per token, the replay gets a successor of its own.
+    """
+
+    @abstractmethod
+    async def create(self, user_id: int, new: NewSession) -> None:
+        """Starts a session (and family), revokes sessions over the per-user cap."""
+
+    @abstractmethod
+    async def rotate(self, token_hash: str, new: NewSession) -> RotateResult:
+        """Revokes `token_hash` and issues `new` in its family, atomically."""
+
+    @abstractmethod
+    async def revoke(self, token_hash: str) -> None: ...
+
+    @abstractmethod
+    async def sweep(self) -> int:
+        """Deletes expired and long revoked sessions, returns how many."""
+
+
+class DatabaseSessionStore(SessionStore):
+    def __init__(
+        self,
+        session_factory,
+        max_active: int = MAX_ACTIVE_SESSIONS_PER_USER,
+        grace: timedelta = timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS),
+        sweep_batch_size: int = SESSION_SWEEP_BATCH_SIZE,
+        revoked_retention: timedelta = timedelta(hours=SESSION_REVOKED_RETENTION_HOURS),
+    ):
+        self._session_factory = session_factory
+        self._max_active = max_active
+        self._grace = grace
+        self._sweep_batch_size = sweep_batch_size
+        self._revoked_retention = revoked_retention
+
+    @staticmethod
+    def _row(user_id: int, family_id: str, new: NewSession, now: datetime) -> dict:
+        return dict(
+            user_id=user_id,
+            family_id=family_id,
+            refresh_token_hash=new.token_hash,
+            user_agent=new.user_agent,
+            ip_address=new.ip_address,
+            created_at=now,
+            expires_at=now + new.ttl,
+        )
+
+    async def _limit_active(
+        self, session: AsyncSession, user_id: int, now: datetime
+    ) -> None:
+        over_limit = (
+            await session.exec(
+                select(UserSession.id)
+                .where(
+                    UserSession.user_id == user_id,
+                    UserSession.revoked_at.is_(None),
+                    UserSession.expires_at > now,
+                )
+                .order_by(UserSession.created_at.desc(), UserSession.id.desc())
+                .offset(self._max_active)
+            )
+        ).all()
+
+        if over_limit:
+            await session.exec(
+                update(UserSession)
+                .where(UserSession.id.in_(over_limit))
+                .values(revoked_at=now)
+            )
+
+    async def create(self, user_id: int, new: NewSession) -> None:
+        now = utcnow()
+        async with self._session_factory() as session:
+            await session.exec(
+                insert(UserSession).values(**self._row(user_id, uuid4().hex, new, now))
+            )
+            await self._limit_active(session, user_id, now)
+            await session.commit()
+
+    @staticmethod
+    def _revoke_current(token_hash: str, now: datetime):
+        return (
+            update(UserSession)
+            .where(
+                UserSession.refresh_token_hash == token_hash,
+                UserSession.revoked_at.is_(None),
+                UserSession.expires_at > now,
+            )
+            .values(revoked_at=now, rotated_at=now)
+            .returning(UserSession.user_id, UserSession.family_id)
+        )
+
+    async def _rotate_current(
+        self, session: AsyncSession, token_hash: str, new: NewSession, now: datetime
+    ) -> Optional[int]:
+        """The happy path, returns the user id or None if the token isn't current."""
+        if session.get_bind().dialect.name == "postgresql":
+            # one statement: the UPDATE runs as a CTE feeding the INSERT
+            old = self._revoke_current(token_hash, now).cte("old")
+            row = self._row(0, "", new, now)
+            result = await session.exec(
+                insert(UserSession)
+                .from_select(
+                    list(row),
+                    select(
+                        old.c.user_id,
+                        old.c.family_id,
+                        literal(new.token_hash, String),
+                        literal(new.user_agent, String),
+                        literal(new.ip_address, String),
+                        literal(now, DateTime),
+                        literal(row["expires_at"], DateTime),
+                    ),
+                )
+                .returning(UserSession.user_id)
+            )
+            return result.scalar_one_or_none()
+
+        old = (await session.exec(self._revoke_current(token_hash, now))).first()
+        if old is None:
+            return None
+        await session.exec(
+            insert(UserSession).values(
+                **self._row(old.user_id, old.family_id, new, now)
+            )
+        )
+        return old.user_id
+
+    async def rotate(self, token_hash: str, new: NewSession) -> RotateResult:
+        now = utcnow()
+        async with self._session_factory() as session:
+            user_id = await self._rotate_current(session, token_hash, new, now)
+            if user_id is not None:
+                await session.commit()
+                return RotateResult("rotated", user_id)
+
+            # not current: find out why (failure path only)
+            await session.rollback()
+            old = (
+                await session.exec(
+                    select(UserSession).where(
+                        UserSession.refresh_token_hash == token_hash
+                    )
+                )
+            ).first()
+
+            if old is None:
+                return RotateResult("invalid")
+            if old.expires_at <= now:
+                return RotateResult("expired", old.user_id)
+            if old.rotated_at is None:
+                # logged out or over the session cap
+                return RotateResult("revoked", old.user_id)
+
+            if now - old.rotated_at <= self._grace:
+                # a parallel refresh of the same token gets its own successor,
+                # claimed on the old row so a further replay counts as reuse
+                claimed = await session.exec(
+                    update(UserSession)
+                    .where(
+                        UserSession.id == old.id,
+                        UserSession.grace_used_at.is_(None),
+                    )
+                    .values(grace_used_at=now)
+                )
+                if claimed.rowcount == 1:
+                    await session.exec(
+                        insert(UserSession).values(
+                            **self._row(old.user_id, old.family_id, new, now)
+                        )
+                    )
+                    await self._limit_active(session, old.user_id, now)
+                    await session.commit()
+                    return RotateResult("rotated", old.user_id)
+
+            # someone else rotated this token before: revoke the whole family
+            if old.family_id is not None:
+                await session.exec(
+                    update(UserSession)
+                    .where(
+                        UserSession.family_id == old.family_id,
+                        UserSession.revoked_at.is_(None),
+                    )
+                    .values(revoked_at=now)
+                )
+            await session.commit()
+            return RotateResult("reused", old.user_id)
+
+    async def revoke(self, token_hash: str) -> None:
+        async with self._session_factory() as session:
+            await session.exec(
+                update(UserSession)
+                .where(
+                    UserSession.refresh_token_hash == token_hash,
+                    UserSession.revoked_at.is_(None),
+                )
+                .values(revoked_at=utcnow())
+            )
+            await session.commit()
+
+    async def sweep(self) -> int:
+        """Deletes in batches with a commit after each, so locks stay short."""
+        now = utcnow()
+        deleted = 0
+        while True:
+            async with self._session_factory() as session:
+                ids = (
+                    await session.exec(
+                        select(UserSession.id)
+                        .where(
+                            or_(
+                                UserSession.expires_at <= now,
+                                UserSession.revoked_at <= now - self._revoked_retention,
+                            )
+                        )
+                        .limit(self._sweep_batch_size)
+                    )
+                ).all()
+                if not ids:
+                    return deleted
+
+                await session.exec(delete(UserSession).where(UserSession.id.in_(ids)))
+                await session.commit()
+
+            deleted += len(ids)
+            if len(ids) < self._sweep_batch_size:
+                return deleted
+
+
+@dataclass
+class _MemorySession:
+    user_id: int
+    family_id: str
+    created_at: datetime
+    expires_at: datetime
+    revoked_at: Optional[datetime] = None
+    rotated_at: Optional[datetime] = None
+    grace_used_at: Optional[datetime] = None
+
+
+@dataclass
+class _MemoryState:
+    sessions: Dict[str, _MemorySession] = field(default_factory=dict)
+    by_family: Dict[str, Set[str]] = field(default_factory=dict)
+    by_user: Dict[int, Set[str]] = field(default_factory=dict)
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Per process store with the layout a Redis one would use (a record per
+    token hash, a set per family and per user). No method awaits between
+    reading and writing its state, so every operation is atomic on the
+    event loop, which is what a Lua script gives on Redis. Also the fake
+    for local runs and tests.
+    """
+
+    def __init__(
+        self,
+        max_active: int = MAX_ACTIVE_SESSIONS_PER_USER,
+        grace: timedelta = timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS),
+        revoked_retention: timedelta = timedelta(hours=SESSION_REVOKED_RETENTION_HOURS),
+    ):
+        self._max_active = max_active
+        self._grace = grace
+        self._revoked_retention = revoked_retention
+        self._state = _MemoryState()
+
+    def _add(self, user_id: int, family_id: str, new: NewSession, now: datetime):
+        self._state.sessions[new.token_hash] = _MemorySession(
+            user_id=user_id,
+            family_id=family_id,
+            created_at=now,
+            expires_at=now + new.ttl,
+        )
+        self._state.by_family.setdefault(family_id, set()).add(new.token_hash)
+        self._state.by_user.setdefault(user_id, set()).add(new.token_hash)
+
+    def _active(self, token_hashes: Set[str], now: datetime) -> list[str]:
+        sessions = self._state.sessions
+        return [
+            h
+            for h in token_hashes
+            if h in sessions
+            and sessions[h].revoked_at is None
+            and sessions[h].expires_at > now
+        ]
+
+    def _limit_active(self, user_id: int, now: datetime) -> None:
+        active = self._active(self._state.by_user[user_id], now)
+        active.sort(key=lambda h: self._state.sessions[h].created_at, reverse=True)
+        for h in active[self._max_active :]:
+            self._state.sessions[h].revoked_at = now
+
+    async def create(self, user_id: int, new: NewSession) -> None:
+        now = utcnow()
+        self._add(user_id, uuid4().hex, new, now)
+        self._limit_active(user_id, now)
+
+    async def rotate(self, token_hash: str, new: NewSession) -> RotateResult:
+        now = utcnow()
+        old = self._state.sessions.get(token_hash)
+
+        if old is None:
+            return RotateResult("invalid")
+        if old.expires_at <= now:
+            return RotateResult("expired", old.user_id)
+
+        if old.revoked_at is None:
+            old.revoked_at = old.rotated_at = now
+            self._add(old.user_id, old.family_id, new, now)
+            return RotateResult("rotated", old.user_id)
+
+        if old.rotated_at is None:
+            return RotateResult("revoked", old.user_id)
+
+        if now - old.rotated_at <= self._grace and old.grace_used_at is None:
+            old.grace_used_at = now
+            self._add(old.user_id, old.family_id, new, now)
+            self._limit_active(old.user_id, now)
+            return RotateResult("rotated", old.user_id)
+
+        for h in self._active(self._state.by_family[old.family_id], now):
+            self._state.sessions[h].revoked_at = now
+        return RotateResult("reused", old.user_id)
+
+    async def revoke(self, token_hash: str) -> None:
+        session = self._state.sessions.get(token_hash)
+        if session is not None and session.revoked_at is None:
+            session.revoked_at = utcnow()
+
+    async def sweep(self) -> int:
+        now = utcnow()
+        state = self._state
+        stale = [
+            h
+            for h, s in state.sessions.items()
+            if s.expires_at <= now
+            or (
+                s.revoked_at is not None
+                and s.revoked_at <= now - self._revoked_retention
+            )
+        ]
+        for h in stale:
+            s = state.sessions.pop(h)
+            for index, key in (
+                (state.by_family, s.family_id),
+                (state.by_user, s.user_id),
+            ):
+                index[key].discard(h)
+                if not index[key]:
+                    del index[key]
+        return len(stale)
+
+
+def create_session_store() -> SessionStore:
+    if SESSION_STORE == "db":
+        return DatabaseSessionStore(db.session_factory)
+    if SESSION_STORE == "memory":
+        return MemorySessionStore()
+    raise RuntimeError(f"Unknown SESSION_STORE: {SESSION_STORE}")
+
+
+# SINGLE shared store for whole app
+session_store = create_session_store()
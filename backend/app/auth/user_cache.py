@@ -0,0 +1,38 @@
+from typing import Optional
+
+from sqlalchemy import event
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.cache import TTLCache
+from app.env_loader import get_env
+from app.models.user import User
+
+USER_CACHE_SIZE = int(get_env("USER_CACHE_SIZE", "2048"))
+USER_CACHE_TTL_SECONDS = float(get_env("USER_CACHE_TTL_SECONDS", "60"))
+
+# detached User rows for endpoints that need more than the token claims
+_users: TTLCache[int, User] = TTLCache(
+    maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS
+)
+
+
+async def get_cached_user(session: AsyncSession, user_id: int) -> Optional[User]:
+    user = _users.get(user_id)
+    if user is not None:
+        return user
+
+    user = await session.get(User, user_id)
+    if user is not None:
+        _users.set(user_id, user)
+    return user
+
+
+def invalidate_user(user_id: int) -> None:
+    _users.pop(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_write(mapper, connection, target: User) -> None:
+    if target.id is not None:
+        invalidate_user(target.id)
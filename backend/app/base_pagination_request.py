@@ -1,6 +1,14 @@
+from typing import Literal, Optional
+
 from pydantic import BaseModel, Field
 
 
 class BasePaginationRequest(BaseModel):
     page_number: int = Field(default=1, ge=1)
-    page_size: int = Field(default=10, ge=1, le=50)
\ No newline at end of file
+    page_size: int = Field(default=10, ge=1, le=50)
+    # opaque keyset cursor taken from a previous page's `next_cursor`,
+    # when it is set `page_number` is ignored
+    cursor: Optional[str] = Field(default=None, max_length=512)
+    # how `total` is calculated: exact COUNT(*), planner estimate,
+    # exact up to a cap ("1000+") or not at all
+    total_mode: Literal["exact", "estimated", "capped", "none"] = "exact"
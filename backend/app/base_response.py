@@ -1,4 +1,4 @@
-from typing import Generic, TypeVar, List
+from typing import Generic, TypeVar, List, Optional
 from pydantic.generics import GenericModel
 
 T = TypeVar("T")
@@ -7,5 +7,7 @@ T = TypeVar("T")
 class BasePagedResponse(GenericModel, Generic[T]):
     page_number: int
     page_size: int
-    total: int
-    items: List[T]
\ No newline at end of file
+    total: Optional[int]  # not calculated in cursor mode or total_mode=none
+    total_exact: bool = True  # False for estimated / capped totals
+    items: List[T]
+    next_cursor: Optional[str] = None
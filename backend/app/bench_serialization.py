@@ -0,0 +1,159 @@
+"""
+Micro-benchmark of rendering one apartment listing page to JSON bytes.
+
+    python -m app.bench_serialization [--items 50] [--photos 5] [--rounds 200]
+
+"before" is the old path: pydantic DTOs built field by field, validated
+again through the response_model and dumped by FastAPI's JSON encoder.
+"after" is the fast path: plain dicts encoded once by app.json_encoding.
+No database is needed, the apartments are built in memory.
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from app.env_loader import load_env
+
+load_env()
+
+from pydantic import TypeAdapter  # noqa: E402
+
+import app.models  # noqa: E402,F401
+from app.apartment.apartments_endpoints import (  # noqa: E402
+    ApartmentDto,
+    ApartmentPhotoDto,
+    map_apartment_to_list_dto,
+)
+from app.base_response import BasePagedResponse  # noqa: E402
+from app.json_encoding import dumps, orjson  # noqa: E402
+from app.models.apartment import Apartment  # noqa: E402
+from app.models.apartment_photo import ApartmentPhoto  # noqa: E402
+
+
+def build_apartments(items: int, photos: int) -> list[Apartment]:
+    apartments = []
+    for i in range(items):
+        apartment = Apartment(
+            id=i + 1,
+            user_id=1,
+            title=f"Sunny flat {i}",
+            description="Bright apartment close to the center. " * 20,
+            address=f"Knez Mihailova {i}",
+            city="Beograd",
+            country="Srbija",
+            price_per_night=Decimal("54.50"),
+            max_guests=4,
+            status="active",
+            latitude=Decimal("44.817800"),
+            longitude=Decimal("20.456900"),
+            rating_average=Decimal("4.60"),
+            reviews_count=12,
+            created_at=datetime(2026, 1, 1),
+        )
+        apartment.photos = [
+            ApartmentPhoto(
+                id=i * photos + p,
+                apartment_id=i + 1,
+                image_url=f"/static/images/apartments/blobs/ab/{i}{p}_full.webp",
+                is_main=p == 0,
+                variants=[
+                    {
+                        "name": name,
+                        "format": fmt,
+                        "width": width,
+                        "height": width * 2 // 3,
+                        "url": f"/static/images/apartments/blobs/ab/{i}{p}{name}.{fmt}",
+                        "key": f"ab/{i}{p}{name}.{fmt}",
+                    }
+                    for name, width in (("thumb", 320), ("card", 800), ("full", 1920))
+                    for fmt in ("webp", "avif")
+                ],
+            )
+            for p in range(photos)
+        ]
+        apartments.append(apartment)
+    return apartments
+
+
+def page(items: list) -> dict:
+    return {
+        "page_number": 1,
+        "page_size": len(items),
+        "total": 1000,
+        "total_exact": True,
+        "items": items,
+        "next_cursor": None,
+    }
+
+
+def render_before(apartments: list[Apartment], adapter: TypeAdapter) -> bytes:
+    items = [
+        ApartmentDto(
+            **{
+                **map_apartment_to_list_dto(a),
+                "photos": [
+                    ApartmentPhotoDto(
+                        id=p.id,
+                        image_url=p.image_url,
+                        is_main=p.is_main,
+                        variants=p.variants or [],
+                    )
+                    for p in a.photos
+                ],
+            }
+        )
+        for a in apartments
+    ]
+    # what FastAPI does with a returned value and response_model
+    validated = adapter.validate_python(page(items))
+    content = adapter.dump_python(validated, mode="json")
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def render_after(apartments: list[Apartment]) -> bytes:
+    return dumps(page([map_apartment_to_list_dto(a) for a in apartments]))
+
+
+def measure(fn, rounds: int) -> float:
+    fn()  # warm up
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--photos", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    apartments = build_apartments(args.items, args.photos)
+    adapter = TypeAdapter(BasePagedResponse[ApartmentDto])
+
+    before_bytes = render_before(apartments, adapter)
+    after_bytes = render_after(apartments)
+    if json.loads(before_bytes) != json.loads(after_bytes):
+        raise SystemExit("before and after render different JSON")
+
+    before = measure(lambda: render_before(apartments, adapter), args.rounds)
+    after = measure(lambda: render_after(apartments), args.rounds)
+
+    encoder = "orjson" if orjson is not None else "json (orjson not installed)"
+    print(f"{args.items} items x {args.photos} photos, encoder: {encoder}")
+    for label, seconds in (("before", before), ("after", after)):
+        print(
+            f"{label:>6}: {seconds * 1000:8.3f} ms/page"
+            f"  {seconds / args.items * 1e6:8.1f} us/item"
+        )
+    print(f"speedup: {before / after:.1f}x, identical JSON: yes")
+
+
+if __name__ == "__main__":
+    main()
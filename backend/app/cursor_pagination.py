@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+
+@dataclass(frozen=True)
+class SortKey:
+    """
+    One listing order usable with keyset pagination.
+
+    `column` is the sort expression, the row id is always used as tie breaker
+    so the order is total and stable between pages.
+    `parse` turns the JSON value stored in a cursor back into a python value.
+    `computed` keys (e.g. a search rank) are not model attributes, their value
+    is selected next to the row so it can be put in the next cursor.
+    """
+
+    column: Any
+    descending: bool = False
+    parse: Callable[[Any], Any] = lambda v: v
+    computed: bool = False
+
+
+def _dump(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(sort: str, key: Any, last_id: int) -> str:
+    payload = json.dumps(
+        {"s": sort, "k": _dump(key), "i": last_id}, separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, sort_key: SortKey) -> Tuple[Any, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if data["s"] != sort:
+            raise HTTPException(
+                status_code=400, detail="Cursor does not match requested sort"
+            )
+        return sort_key.parse(data["k"]), int(data["i"])
+    except HTTPException:
+        raise
+    except (ValueError, KeyError, TypeError, binascii.Error, ArithmeticError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_keyset(
+    query,
+    sort_key: SortKey,
+    id_column,
+    after: Optional[Tuple[Any, int]] = None,
+):
+    """Orders the query by (sort key, id) and seeks past `after` when given."""
+    column = sort_key.column
+
+    if after is not None:
+        key, last_id = after
+        if sort_key.descending:
+            query = query.where(
+                or_(column < key, and_(column == key, id_column < last_id))
+            )
+        else:
+            query = query.where(
+                or_(column > key, and_(column == key, id_column > last_id))
+            )
+
+    if sort_key.descending:
+        return query.order_by(column.desc(), id_column.desc())
+    return query.order_by(column.asc(), id_column.asc())
@@ -1,18 +1,187 @@
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+from fastapi import Request, Response
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 
+@dataclass
+class PoolStats:
+    checkouts: int = 0
+    wait_total_ms: float = 0.0
+    wait_max_ms: float = 0.0
+    overflow_events: int = 0  # connections opened above pool_size
+    timeouts: int = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "wait_avg_ms": (
+                round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else 0.0
+            ),
+            "wait_max_ms": round(self.wait_max_ms, 3),
+            "overflow_events": self.overflow_events,
+            "timeouts": self.timeouts,
+        }
+
+
+def _instrumented_pool_class(stats: PoolStats):
+    class InstrumentedPool(AsyncAdaptedQueuePool):
+        # _do_get is where a checkout waits for a free connection
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            except PoolTimeoutError:
+                stats.timeouts += 1
+                raise
+            finally:
+                waited_ms = (time.perf_counter() - started) * 1000
+                stats.checkouts += 1
+                stats.wait_total_ms += waited_ms
+                stats.wait_max_ms = max(stats.wait_max_ms, waited_ms)
+
+    return InstrumentedPool
+
+
 class DatabaseConnection:
-    def __init__(self, url: str, echo: bool = False):
-        self.engine = create_async_engine(url, echo=echo)
-        self.session_factory = sessionmaker(
-            self.engine,
+    """
+    Primary engine for everything that writes, plus zero or more read replica
+    engines used by `get_read_session`. Without replicas reads use the primary.
+    """
+
+    # set after a write, reads from this client go to the primary until it expires
+    STICKY_COOKIE_NAME = "db_primary_until"
+
+    def __init__(
+        self,
+        url: str,
+        echo: bool = False,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: float = 30,
+        pool_recycle: int = -1,
+        pool_pre_ping: bool = False,
+        statement_timeout_ms: Optional[int] = None,
+        replica_urls: Sequence[str] = (),
+        sticky_seconds: int = 5,
+    ):
+        engine_options = dict(
+            echo=echo,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pool_pre_ping,
+            statement_timeout_ms=statement_timeout_ms,
+        )
+
+        self.stats = PoolStats()
+        self.engine = self._create_engine(url, self.stats, **engine_options)
+        self.session_factory = self._create_session_factory(self.engine)
+
+        self.replica_stats = [PoolStats() for _ in replica_urls]
+        self.replica_engines = [
+            self._create_engine(replica_url, stats, **engine_options)
+            for replica_url, stats in zip(replica_urls, self.replica_stats)
+        ]
+        self._replica_session_factories = [
+            self._create_session_factory(engine) for engine in self.replica_engines
+        ]
+        self._next_replica = itertools.cycle(range(len(self.replica_engines)))
+
+        self.sticky_seconds = sticky_seconds
+
+    @staticmethod
+    def _create_engine(
+        url: str,
+        stats: PoolStats,
+        echo: bool,
+        pool_size: int,
+        max_overflow: int,
+        pool_timeout: float,
+        pool_recycle: int,
+        pool_pre_ping: bool,
+        statement_timeout_ms: Optional[int],
+    ):
+        engine_kwargs = {"echo": echo}
+        connect_args = {}
+
+        # in-memory sqlite lives in a single connection (StaticPool), nothing to tune
+        in_memory = url.startswith("sqlite") and (
+            ":memory:" in url or url.endswith("://")
+        )
+        if not in_memory:
+            engine_kwargs.update(
+                poolclass=_instrumented_pool_class(stats),
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_timeout=pool_timeout,
+                pool_recycle=pool_recycle,
+                pool_pre_ping=pool_pre_ping,
+            )
+
+        if statement_timeout_ms and url.startswith("postgresql+asyncpg"):
+            connect_args["server_settings"] = {
+                "statement_timeout": str(statement_timeout_ms)
+            }
+
+        if connect_args:
+            engine_kwargs["connect_args"] = connect_args
+
+        engine = create_async_engine(url, **engine_kwargs)
+
+        @event.listens_for(engine.sync_engine.pool, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            pool = engine.sync_engine.pool
+            if hasattr(pool, "overflow") and pool.overflow() > 0:
+                stats.overflow_events += 1
+
+        return engine
+
+    @staticmethod
+    def _create_session_factory(engine):
+        return sessionmaker(
+            engine,
             class_=AsyncSession,
             expire_on_commit=False,  # IMPORTANT for async + returning values after commit
         )
 
+    @property
+    def has_replicas(self) -> bool:
+        return bool(self.replica_engines)
+
+    @staticmethod
+    def _engine_stats(engine, stats: PoolStats) -> dict:
+        pool = engine.sync_engine.pool
+        live = {}
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            live = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            }
+        return {**live, **stats.as_dict()}
+
+    def pool_stats(self) -> dict:
+        result = self._engine_stats(self.engine, self.stats)
+        if self.has_replicas:
+            result["replicas"] = [
+                self._engine_stats(engine, stats)
+                for engine, stats in zip(self.replica_engines, self.replica_stats)
+            ]
+        return result
+
     async def create_tables(self) -> None:
         async with self.engine.begin() as conn:
             await conn.run_sync(SQLModel.metadata.create_all)
@@ -20,3 +189,40 @@ class DatabaseConnection:
     async def get_session(self):
         async with self.session_factory() as session:
             yield session
+
+    def _reads_pinned_to_primary(self, request: Request) -> bool:
+        raw = request.cookies.get(self.STICKY_COOKIE_NAME)
+        try:
+            return raw is not None and float(raw) > time.time()
+        except ValueError:
+            return False
+
+    async def get_read_session(self, request: Request):
+        """
+        Session for read-only endpoints, served by a replica (round robin).
+        A client that wrote recently keeps reading from the primary so it
+        always sees its own writes despite replication lag.
+        """
+        if not self.has_replicas or self._reads_pinned_to_primary(request):
+            factory = self.session_factory
+        else:
+            factory = self._replica_session_factories[next(self._next_replica)]
+            # the response cache won't keep what may be a lagging read
+            request.state.read_from_replica = True
+
+        async with factory() as session:
+            yield session
+
+    def pin_reads_to_primary(self, response: Response) -> None:
+        response.set_cookie(
+            key=self.STICKY_COOKIE_NAME,
+            value=str(time.time() + self.sticky_seconds),
+            max_age=self.sticky_seconds,
+            httponly=True,
+            samesite="lax",
+        )
+
+    async def dispose(self) -> None:
+        await self.engine.dispose()
+        for engine in self.replica_engines:
+            await engine.dispose()
@@ -1,8 +1,24 @@
 from app.database_connection import DatabaseConnection
-from app.env_loader import require_env
-
+from app.env_loader import get_env, require_env
 
 DATABASE_URL = require_env("DATABASE_URL")
+# comma separated, reads of GET endpoints are spread over these
+DATABASE_REPLICA_URLS = [
+    url.strip()
+    for url in get_env("DATABASE_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
 
 # SINGLE shared db instance for whole app
-db = DatabaseConnection(DATABASE_URL, echo=True)
+db = DatabaseConnection(
+    DATABASE_URL,
+    echo=get_env("DB_ECHO", "false").lower() == "true",
+    pool_size=int(get_env("DB_POOL_SIZE", "5")),
+    max_overflow=int(get_env("DB_MAX_OVERFLOW", "10")),
+    pool_timeout=float(get_env("DB_POOL_TIMEOUT_SECONDS", "30")),
+    pool_recycle=int(get_env("DB_POOL_RECYCLE_SECONDS", "1800")),
+    pool_pre_ping=get_env("DB_POOL_PRE_PING", "true").lower() == "true",
+    statement_timeout_ms=int(get_env("DB_STATEMENT_TIMEOUT_MS", "0")) or None,
+    replica_urls=DATABASE_REPLICA_URLS,
+    sticky_seconds=int(get_env("DB_READ_YOUR_WRITES_SECONDS", "5")),
+)
@@ -13,3 +13,10 @@ def require_env(name: str) -> str:
 def load_env() -> None:
     env_path = Path(__file__).resolve().parents[1] / ".env"
     load_dotenv(dotenv_path=env_path, override=False)
+
+
+def get_env(name: str, default: str) -> str:
+    val = os.getenv(name)
+    if val is None or val == "":
+        return default
+    return val
@@ -9,13 +9,23 @@ from contextlib import asynccontextmanager
 from pathlib import Path
 from uuid import uuid4
 
-from fastapi import FastAPI, File, UploadFile, Depends, HTTPException
+from fastapi import FastAPI, File, UploadFile, Depends, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.db import db
+from app.static_images import ImageFiles
 import app.models  # IMPORTANT: ensures SQLModel metadata is populated
 from app.seed import seed_database
+from app.services.apartment_search import ensure_text_search_schema
+from app.services.geocoding import close_geocoding_client
+from app.services.geocode_worker import geocode_worker
+from app.services.image_processing import shutdown_image_pool
+from app.services.pricing import price_quoter
+from app.services.reservations import reservation_expirer
+from app.services.response_cache import response_cache
+from app.services.upload_storage import UploadLimitMiddleware, save_upload
 
 from app.auth.auth_endpoints import router as auth_router
 from app.apartment.apartments_endpoints import router as apartments_router
@@ -23,6 +33,12 @@ from app.apartment_photo.apartment_photo_endpoints import (
     router as apartment_photo_router,
 )
 from app.tag.tag_endpoints import router as tag_router
+from app.reservation.reservation_endpoints import router as reservation_router
+from app.tag.tag_catalogue import tag_catalogue
+from app.auth.authorization import Policy
+from app.auth.dependencies import get_auth_service
+from app.auth.session_lifecycle import session_sweeper
+from app.enums.role_enum import Role
 
 
 UPLOAD_DIR = Path("static/images/apartments")
@@ -35,19 +51,55 @@ SessionDep = Annotated[AsyncSession, Depends(db.get_session)]
 async def lifespan(app: FastAPI):
     # create tables
     await db.create_tables()
+    await ensure_text_search_schema(db.engine)
 
     # # seed roles
     async with db.session_factory() as session:
         await seed_database(session)
         await session.commit()
 
+    await tag_catalogue.refresh()
+
+    geocode_worker.start()
+    session_sweeper.start()
+    reservation_expirer.start()
+
     yield
 
-    await db.engine.dispose()
+    await reservation_expirer.stop()
+    await session_sweeper.stop()
+    await geocode_worker.stop()
+    get_auth_service().password_hasher.shutdown()
+    await close_geocoding_client()
+    shutdown_image_pool()
+    await db.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
 
+
+def upload_limit_key(scope) -> object:
+    # the caller's user id when a valid access token is sent, the client
+    # address otherwise (the /pictures route has no login)
+    authorization = Headers(scope=scope).get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            return int(get_auth_service().decode_access_token(token)["sub"])
+        except (HTTPException, KeyError, ValueError):
+            pass
+    client = scope.get("client")
+    return client[0] if client else None
+
+
+# size cap and per-host slots must hold before FastAPI buffers the form,
+# added before CORS so CORS wraps its early 413/429 responses too
+app.add_middleware(
+    UploadLimitMiddleware,
+    routes=[r"/pictures/[^/]+", r"/apartments/[^/]+/photos"],
+    key=upload_limit_key,
+)
+
 from fastapi.middleware.cors import CORSMiddleware
 
 app.add_middleware(
@@ -61,10 +113,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    response = await call_next(request)
+
+    # after a successful write this client reads from the primary for a while
+    if (
+        db.has_replicas
+        and request.method not in ("GET", "HEAD", "OPTIONS")
+        and response.status_code < 400
+    ):
+        db.pin_reads_to_primary(response)
+
+    return response
+
+
 app.include_router(auth_router)
 app.include_router(apartments_router)
 app.include_router(apartment_photo_router)
 app.include_router(tag_router)
+app.include_router(reservation_router)
+
+# apartment photos get caching headers, ranges and an in-memory LRU
+apartment_images = ImageFiles(directory=str(UPLOAD_DIR))
+app.mount("/static/images/apartments", apartment_images, name="apartment_images")
 
 # Serves ./static at /static
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -75,6 +148,19 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def metrics(allowed: bool = Depends(Policy({Role.ADMIN}).check_access)):
+    return {
+        "database_pool": db.pool_stats(),
+        "password_hasher": get_auth_service().password_hasher.stats(),
+        "image_cache": apartment_images.stats(),
+        "response_cache": response_cache.stats(),
+        "quote_cache": price_quoter.stats(),
+        "session_sweeper": session_sweeper.stats(),
+        "reservation_expirer": reservation_expirer.stats(),
+    }
+
+
 @app.post("/pictures/{apartment_id}")
 async def upload_apartment_images(
     apartment_id: int,
@@ -97,12 +183,7 @@ async def upload_apartment_images(
         filename = f"{uuid4()}{file_ext}"
         file_path = apartment_dir / filename
 
-        with file_path.open("wb") as buffer:
-            while True:
-                chunk = await file.read(1024 * 1024)
-                if not chunk:
-                    break
-                buffer.write(chunk)
+        await save_upload(file, file_path)
 
         saved.append(
             {
@@ -113,6 +194,4 @@ async def upload_apartment_images(
             }
         )
 
-        await file.close()
-
     return {"apartment_id": apartment_id, "count": len(saved), "files": saved}
@@ -4,4 +4,9 @@ from .apartment_photo import ApartmentPhoto
 from .tag import Tag
 from .apartment_tag import ApartmentTag
 from .reservation import Reservation
-from .user_session import UserSession
\ No newline at end of file
+from .user_session import UserSession
+from .geocode_cache import GeocodeCacheEntry
+from .geocode_job import GeocodeJob
+from .photo_blob import PhotoBlob
+from .booked_day import BookedDay
+from .apartment_price import ApartmentPriceOverride
@@ -2,7 +2,7 @@
 from datetime import datetime
 from decimal import Decimal
 from typing import Optional, List, TYPE_CHECKING
-from sqlalchemy import Column, Text, Numeric
+from sqlalchemy import Column, Index, Text, Numeric
 from sqlmodel import SQLModel, Field, Relationship
 
 from .apartment_tag import ApartmentTag
@@ -20,6 +20,11 @@ def utcnow() -> datetime:
 
 class Apartment(SQLModel, table=True):
     __tablename__ = "apartments"
+    __table_args__ = (
+        # keyset pagination: (sort key, id) so every page is an index seek
+        Index("ix_apartments_created_at_id", "created_at", "id"),
+        Index("ix_apartments_price_per_night_id", "price_per_night", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="users.id", index=True)  # host/owner
@@ -32,11 +37,15 @@ class Apartment(SQLModel, table=True):
 
     price_per_night: Decimal = Field(sa_column=Column(Numeric(10, 2), nullable=False))
     max_guests: int = Field(nullable=False)
+    # bumped on every price change (overrides included), part of quote cache keys
+    price_version: int = Field(default=0)
 
     status: str = Field(max_length=20, index=True)  # 'active','inactive'
 
     latitude: Optional[Decimal] = Field(default=None, sa_column=Column(Numeric(10, 6)))
     longitude: Optional[Decimal] = Field(default=None, sa_column=Column(Numeric(10, 6)))
+    # geohash of (latitude, longitude), spatial index for radius / bbox search
+    geohash: Optional[str] = Field(default=None, max_length=12, index=True)
 
     rating_average: Optional[Decimal] = Field(default=None, sa_column=Column(Numeric(3, 2)))
     reviews_count: int = Field(default=0)
@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import Optional, TYPE_CHECKING
+from sqlalchemy import Column, JSON
 from sqlmodel import SQLModel, Field, Relationship
 
 if TYPE_CHECKING:
@@ -18,6 +19,8 @@ class ApartmentPhoto(SQLModel, table=True):
 
     image_url: str = Field(max_length=500)
     is_main: bool = Field(default=False)
+    # [{"name": "thumb", "format": "webp", "width": .., "height": .., "url": ..}]
+    variants: Optional[list] = Field(default=None, sa_column=Column(JSON))
 
     created_at: datetime = Field(default_factory=utcnow)
 
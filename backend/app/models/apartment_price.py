@@ -0,0 +1,16 @@
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import Column, Numeric
+from sqlmodel import SQLModel, Field
+
+
+class ApartmentPriceOverride(SQLModel, table=True):
+    """Price of one night that differs from Apartment.price_per_night."""
+
+    __tablename__ = "apartment_price_overrides"
+
+    # quotes read a stay's overrides as one primary key range
+    apartment_id: int = Field(foreign_key="apartments.id", primary_key=True)
+    day: date = Field(primary_key=True)
+
+    price_per_night: Decimal = Field(sa_column=Column(Numeric(10, 2), nullable=False))
@@ -0,0 +1,18 @@
+from datetime import date
+from sqlmodel import SQLModel, Field
+
+
+class BookedDay(SQLModel, table=True):
+    """
+    One row per night of a confirmed reservation, derived from `reservations`
+    and kept in sync by app.services.reservations (rebuild: app.rebuild_occupancy).
+    """
+
+    __tablename__ = "apartment_booked_days"
+
+    # (apartment_id, day) primary key: calendar reads and availability
+    # filters are range seeks on it, and a night can't be booked twice
+    apartment_id: int = Field(foreign_key="apartments.id", primary_key=True)
+    day: date = Field(primary_key=True)
+
+    reservation_id: int = Field(foreign_key="reservations.id", index=True)
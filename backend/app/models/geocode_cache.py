@@ -0,0 +1,24 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+from sqlalchemy import Column, Text, Numeric
+from sqlmodel import SQLModel, Field
+
+
+def utcnow() -> datetime:
+    return datetime.utcnow()
+
+
+class GeocodeCacheEntry(SQLModel, table=True):
+    __tablename__ = "geocode_cache"
+
+    # sha256 of the normalized "address, city, country" query
+    query_hash: str = Field(primary_key=True, max_length=64)
+    query: str = Field(sa_column=Column(Text, nullable=False))
+
+    # both None means the geocoder found nothing (negative cache)
+    latitude: Optional[Decimal] = Field(default=None, sa_column=Column(Numeric(10, 6)))
+    longitude: Optional[Decimal] = Field(default=None, sa_column=Column(Numeric(10, 6)))
+
+    created_at: datetime = Field(default_factory=utcnow)
+    last_used_at: datetime = Field(default_factory=utcnow, index=True)  # LRU
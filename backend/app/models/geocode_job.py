@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+
+def utcnow() -> datetime:
+    return datetime.utcnow()
+
+
+class GeocodeJob(SQLModel, table=True):
+    """Outbox row: apartment still waiting for latitude/longitude."""
+
+    __tablename__ = "geocode_jobs"
+    __table_args__ = (
+        Index("ix_geocode_jobs_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    apartment_id: int = Field(foreign_key="apartments.id", unique=True)
+
+    status: str = Field(default="pending", max_length=20)  # 'pending','failed'
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = Field(default=None, max_length=500)
+
+    next_attempt_at: datetime = Field(default_factory=utcnow)
+    created_at: datetime = Field(default_factory=utcnow)
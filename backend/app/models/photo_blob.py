@@ -0,0 +1,20 @@
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+
+def utcnow() -> datetime:
+    return datetime.utcnow()
+
+
+class PhotoBlob(SQLModel, table=True):
+    __tablename__ = "photo_blobs"
+
+    # "<sha256[:2]>/<sha256>.<ext>", the object key in photo storage
+    key: str = Field(primary_key=True, max_length=100)
+    size: int
+    content_type: str = Field(max_length=50)
+
+    # photo variants pointing at this blob, the object is deleted at 0
+    ref_count: int = Field(default=0)
+
+    created_at: datetime = Field(default_factory=utcnow)
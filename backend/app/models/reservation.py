@@ -1,7 +1,7 @@
 from datetime import date, datetime
 from decimal import Decimal
 from typing import Optional, TYPE_CHECKING
-from sqlalchemy import Column, Numeric
+from sqlalchemy import Column, Index, Numeric
 from sqlmodel import SQLModel, Field, Relationship
 
 if TYPE_CHECKING:
@@ -15,6 +15,22 @@ def utcnow() -> datetime:
 
 class Reservation(SQLModel, table=True):
     __tablename__ = "reservations"
+    # on Postgres the ex_reservations_apartment_dates exclusion constraint
+    # (migration 0c4e9b2d7f61) backs up the booking lock, pending and
+    # confirmed stays of one apartment can't overlap, see
+    # app.services.reservations
+    __table_args__ = (
+        # overlap checks: equality on apartment/status, then the date range
+        Index(
+            "ix_reservations_apartment_status_dates",
+            "apartment_id",
+            "status",
+            "check_in",
+            "check_out",
+        ),
+        # pending reservations past their confirm deadline (expiry sweep)
+        Index("ix_reservations_status_expires_at", "status", "expires_at"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
 
@@ -26,9 +42,12 @@ class Reservation(SQLModel, table=True):
     guests_count: int = Field(nullable=False)
 
     total_price: Decimal = Field(sa_column=Column(Numeric(10, 2), nullable=False))
-    status: str = Field(max_length=20, index=True)  # 'pending','confirmed','cancelled'
+    # 'pending','confirmed','cancelled','expired'
+    status: str = Field(max_length=20, index=True)
 
     created_at: datetime = Field(default_factory=utcnow)
+    # confirm deadline of a pending reservation, after it the nights are free
+    expires_at: Optional[datetime] = Field(default=None)
 
     apartment: Optional["Apartment"] = Relationship(back_populates="reservations")
     guest: Optional["User"] = Relationship(back_populates="reservations")
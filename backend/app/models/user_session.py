@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional, TYPE_CHECKING
-from sqlalchemy import Column, Text
+from sqlalchemy import Column, Index, Text, text
 from sqlmodel import SQLModel, Field, Relationship
 
 if TYPE_CHECKING:
@@ -13,6 +13,18 @@ def utcnow() -> datetime:
 
 class UserSession(SQLModel, table=True):
     __tablename__ = "user_sessions"
+    __table_args__ = (
+        # the sweeper deletes by these, revoked_at only indexes revoked rows
+        Index("ix_user_sessions_expires_at", "expires_at"),
+        Index(
+            "ix_user_sessions_revoked_at",
+            "revoked_at",
+            postgresql_where=text("revoked_at IS NOT NULL"),
+            sqlite_where=text("revoked_at IS NOT NULL"),
+        ),
+        # active sessions of a user, newest first (per-user cap)
+        Index("ix_user_sessions_user_id_created_at", "user_id", "created_at"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="users.id", index=True)
@@ -29,7 +41,14 @@ class UserSession(SQLModel, table=True):
     user_agent: Optional[str] = Field(default=None, max_length=255)
     ip_address: Optional[str] = Field(default=None, max_length=50)
 
+    # all sessions descending from one login, revoked together on token reuse
+    family_id: Optional[str] = Field(default=None, max_length=40, index=True)
+
     revoked_at: Optional[datetime] = Field(default=None)
+    # set together with revoked_at when the token was exchanged for a new one
+    rotated_at: Optional[datetime] = Field(default=None)
+    # set when a replay within the grace period got its one extra successor
+    grace_used_at: Optional[datetime] = Field(default=None)
 
     created_at: datetime = Field(default_factory=utcnow)
     expires_at: datetime
@@ -0,0 +1,57 @@
+"""
+Reconciles the booked days table with the confirmed reservations.
+
+    python -m app.rebuild_occupancy                  # every apartment
+    python -m app.rebuild_occupancy --apartment 12   # only these (repeatable)
+
+Confirm / cancel keep the table in sync on their own, this repairs it after
+manual edits of `reservations` or a restore. Safe to run while the app runs.
+"""
+
+import argparse
+import asyncio
+
+from sqlmodel import select
+
+from app.env_loader import load_env
+
+load_env()
+
+from app.db import db  # noqa: E402
+import app.models  # noqa: E402,F401
+from app.models.apartment import Apartment  # noqa: E402
+from app.services.occupancy import rebuild_occupancy  # noqa: E402
+
+BATCH_SIZE = 200
+
+
+async def main(apartment_ids: list[int] | None) -> None:
+    async with db.session_factory() as session:
+        if apartment_ids is None:
+            apartment_ids = list(
+                (await session.exec(select(Apartment.id).order_by(Apartment.id))).all()
+            )
+
+        added = removed = 0
+        # apartment batches keep every transaction short
+        for i in range(0, len(apartment_ids), BATCH_SIZE):
+            batch_added, batch_removed = await rebuild_occupancy(
+                session, apartment_ids[i : i + BATCH_SIZE]
+            )
+            added += batch_added
+            removed += batch_removed
+
+    print(
+        f"Checked {len(apartment_ids)} apartments: "
+        f"{added} booked days added, {removed} removed"
+    )
+    await db.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--apartment", type=int, action="append", help="apartment id to rebuild"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.apartment))
@@ -0,0 +1,70 @@
+"""
+Queues every apartment that still has no coordinates for geocoding.
+
+    python -m app.regeocode          # queue only, the running app's worker picks them up
+    python -m app.regeocode --now    # queue and geocode right here (rate limited)
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy import update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.env_loader import load_env
+
+load_env()
+
+from app.db import db  # noqa: E402
+import app.models  # noqa: E402,F401
+from app.models.apartment import Apartment  # noqa: E402
+from app.models.geocode_job import GeocodeJob  # noqa: E402
+from app.services.geocode_worker import enqueue_geocode, geocode_worker  # noqa: E402
+from app.services.geocoding import close_geocoding_client  # noqa: E402
+
+
+async def enqueue_missing_coordinates(session: AsyncSession) -> int:
+    # failed jobs get a fresh set of attempts
+    await session.exec(
+        update(GeocodeJob)
+        .where(GeocodeJob.status == "failed")
+        .values(status="pending", attempts=0, last_error=None)
+    )
+
+    missing = (
+        await session.exec(
+            select(Apartment.id).where(
+                (Apartment.latitude.is_(None)) | (Apartment.longitude.is_(None)),
+                ~select(GeocodeJob.id)
+                .where(GeocodeJob.apartment_id == Apartment.id)
+                .exists(),
+            )
+        )
+    ).all()
+
+    for apartment_id in missing:
+        enqueue_geocode(session, apartment_id)
+
+    await session.commit()
+    return len(missing)
+
+
+async def main(now: bool) -> None:
+    async with db.session_factory() as session:
+        queued = await enqueue_missing_coordinates(session)
+    print(f"Queued {queued} apartments for geocoding")
+
+    if now:
+        processed = await geocode_worker.process_due()
+        print(f"Processed {processed} geocode jobs")
+
+    await close_geocoding_client()
+    await db.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--now", action="store_true", help="geocode in this process")
+    args = parser.parse_args()
+    asyncio.run(main(args.now))
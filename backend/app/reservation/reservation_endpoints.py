@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import db
+from app.models.apartment import Apartment
+from app.models.reservation import Reservation
+from app.auth.authorization import Policy
+from app.auth.current_user import Principal, get_current_principal
+from app.enums.role_enum import Role
+from app.services.reservations import (
+    ReservationBusyError,
+    ReservationConflictError,
+    ReservationError,
+    reservation_service,
+)
+from app.services.response_cache import response_cache
+from app.services.total_counter import clear_total_cache
+
+router = APIRouter(prefix="/reservations", tags=["reservations"])
+SessionDep = Annotated[AsyncSession, Depends(db.get_session)]
+
+
+class ReservationCreateRequest(BaseModel):
+    apartment_id: int
+    check_in: date
+    check_out: date  # exclusive, the day the guest leaves
+    guests_count: int = Field(ge=1)
+
+
+class ReservationDto(BaseModel):
+    id: int
+    apartment_id: int
+    user_id: int
+    check_in: date
+    check_out: date
+    guests_count: int
+    total_price: Decimal
+    status: str
+    created_at: datetime
+
+
+async def availability_changed() -> None:
+    # listings filtered by check_in/check_out only count confirmed stays
+    clear_total_cache()
+    await response_cache.invalidate("apartments")
+
+
+async def get_reservation_with_host(
+    session: AsyncSession, reservation_id: int
+) -> tuple[Reservation, int]:
+    row = (
+        await session.exec(
+            select(Reservation, Apartment.user_id)
+            .join(Apartment, Apartment.id == Reservation.apartment_id)
+            .where(Reservation.id == reservation_id)
+        )
+    ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    return row
+
+
+def raise_for_reservation_error(e: Exception):
+    if isinstance(e, ReservationConflictError):
+        raise HTTPException(
+            status_code=409, detail="Apartment is already booked for these dates"
+        )
+    if isinstance(e, ReservationBusyError):
+        raise HTTPException(
+            status_code=503,
+            detail="Too many concurrent bookings, try again",
+            headers={"Retry-After": "1"},
+        )
+    raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("", status_code=201, response_model=ReservationDto)
+async def create_reservation(
+    session: SessionDep,
+    request_body: ReservationCreateRequest,
+    current_user: Principal = Depends(get_current_principal),
+    allowed: bool = Depends(Policy({Role.USER, Role.HOST}).check_access),
+):
+    apartment = (
+        await session.exec(
+            select(Apartment).where(Apartment.id == request_body.apartment_id)
+        )
+    ).first()
+    if not apartment or apartment.status != "active":
+        raise HTTPException(status_code=404, detail="Apartment not found")
+    if apartment.user_id == current_user.id:
+        raise HTTPException(status_code=400, detail="You can't book your own apartment")
+
+    try:
+        return await reservation_service.create(
+            session,
+            apartment,
+            user_id=current_user.id,
+            check_in=request_body.check_in,
+            check_out=request_body.check_out,
+            guests_count=request_body.guests_count,
+        )
+    except (ReservationError, ReservationConflictError, ReservationBusyError) as e:
+        raise_for_reservation_error(e)
+
+
+@router.post("/{reservation_id}/confirm", response_model=ReservationDto)
+async def confirm_reservation(
+    reservation_id: int,
+    session: SessionDep,
+    current_user: Principal = Depends(get_current_principal),
+    allowed: bool = Depends(Policy({Role.HOST}).check_access),
+):
+    reservation, host_id = await get_reservation_with_host(session, reservation_id)
+    # only the apartment's host confirms
+    if host_id != current_user.id and current_user.role != Role.ADMIN:
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    try:
+        await reservation_service.confirm(session, reservation_id)
+    except (ReservationError, ReservationConflictError, ReservationBusyError) as e:
+        raise_for_reservation_error(e)
+
+    await availability_changed()
+    await session.refresh(reservation)
+    return reservation
+
+
+@router.post("/{reservation_id}/cancel", response_model=ReservationDto)
+async def cancel_reservation(
+    reservation_id: int,
+    session: SessionDep,
+    current_user: Principal = Depends(get_current_principal),
+):
+    reservation, host_id = await get_reservation_with_host(session, reservation_id)
+    # the guest or the apartment's host
+    if current_user.id not in (reservation.user_id, host_id) and (
+        current_user.role != Role.ADMIN
+    ):
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    try:
+        previous = await reservation_service.cancel(session, reservation_id)
+    except (ReservationError, ReservationBusyError) as e:
+        raise_for_reservation_error(e)
+
+    if previous == "confirmed":
+        await availability_changed()
+    await session.refresh(reservation)
+    return reservation
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import re
+from typing import Optional, Tuple
+
+from sqlalchemy import column, func, literal_column, select, table, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.cursor_pagination import SortKey
+from app.models.apartment import Apartment
+
+# Postgres: generated `search_vector` tsvector column with a GIN index
+# SQLite: external content FTS5 table kept in sync by triggers
+# (both are created by the "apartment text search" migration, and at startup
+# by ensure_text_search_schema for databases made by db.create_tables())
+_PG_SEARCH_VECTOR = literal_column("apartments.search_vector")
+
+_FTS_TABLE_NAME = "apartments_fts"
+_fts = table(_FTS_TABLE_NAME, column("rowid"))
+
+# bm25 column weights: title, description, city, country
+_FTS_WEIGHTS = (10.0, 1.0, 5.0, 5.0)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+# columns with a pg_trgm index, lets the ILIKE '%...%' filters use an index
+TRGM_COLUMNS = ["title", "address", "city", "country"]
+
+# The one definition of the search schema: migration 8d41e0b7c2a5 runs these
+# statements, and ensure_text_search_schema runs them at startup for
+# databases made by db.create_tables(). Every statement is idempotent.
+PG_TEXT_SEARCH_SCHEMA = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # weighted document: title > city/country > description
+    """
+    ALTER TABLE apartments ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(
+            to_tsvector('simple', coalesce(city, '') || ' ' || coalesce(country, '')),
+            'B'
+        ) ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_apartments_search_vector "
+    "ON apartments USING gin (search_vector)",
+] + [
+    f"CREATE INDEX IF NOT EXISTS ix_apartments_{col}_trgm "
+    f"ON apartments USING gin ({col} gin_trgm_ops)"
+    for col in TRGM_COLUMNS
+]
+
+SQLITE_TEXT_SEARCH_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS apartments_fts USING fts5(
+        title, description, city, country,
+        content='apartments', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS apartments_fts_ai AFTER INSERT ON apartments BEGIN
+        INSERT INTO apartments_fts(rowid, title, description, city, country)
+        VALUES (new.id, new.title, new.description, new.city, new.country);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS apartments_fts_ad AFTER DELETE ON apartments BEGIN
+        INSERT INTO apartments_fts(apartments_fts, rowid, title, description, city, country)
+        VALUES ('delete', old.id, old.title, old.description, old.city, old.country);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS apartments_fts_au
+    AFTER UPDATE OF title, description, city, country ON apartments BEGIN
+        INSERT INTO apartments_fts(apartments_fts, rowid, title, description, city, country)
+        VALUES ('delete', old.id, old.title, old.description, old.city, old.country);
+        INSERT INTO apartments_fts(rowid, title, description, city, country)
+        VALUES (new.id, new.title, new.description, new.city, new.country);
+    END
+    """,
+    # index rows that already exist
+    f"INSERT INTO {_FTS_TABLE_NAME}({_FTS_TABLE_NAME}) VALUES ('rebuild')",
+]
+
+_PG_SCHEMA_INDEXES = ["ix_apartments_search_vector"] + [
+    f"ix_apartments_{col}_trgm" for col in TRGM_COLUMNS
+]
+
+
+async def ensure_text_search_schema(engine: AsyncEngine) -> None:
+    """Creates the search column / FTS table, its indexes and triggers if missing."""
+    dialect = engine.dialect.name
+    if dialect == "postgresql":
+        names = ", ".join(f"'{name}'" for name in _PG_SCHEMA_INDEXES)
+        probe = (
+            "SELECT count(*) FROM pg_indexes "
+            f"WHERE tablename = 'apartments' AND indexname IN ({names})"
+        )
+        expected = len(_PG_SCHEMA_INDEXES)
+        schema = PG_TEXT_SEARCH_SCHEMA
+    elif dialect == "sqlite":
+        probe = f"SELECT count(*) FROM sqlite_master WHERE name = '{_FTS_TABLE_NAME}'"
+        expected = 1
+        schema = SQLITE_TEXT_SEARCH_SCHEMA
+    else:
+        return
+
+    async with engine.begin() as conn:
+        # checked first, so a migrated database takes no DDL locks at startup
+        if (await conn.execute(text(probe))).scalar() == expected:
+            return
+        for statement in schema:
+            await conn.execute(text(statement))
+
+
+def _fts5_query(text: str) -> Optional[str]:
+    # quote every word so user input can never be read as FTS5 syntax,
+    # the last word is a prefix match to support search-as-you-type
+    words = _WORD_RE.findall(text)
+    if not words:
+        return None
+
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def apply_text_search(
+    query, text: str, dialect: str
+) -> Tuple[object, Optional[SortKey]]:
+    """
+    Restricts an apartment query to rows matching the free text `text`.
+
+    Returns the narrowed query and a "relevance" sort key (None when the text
+    has nothing searchable in it and the query is returned unchanged).
+    """
+    if dialect == "postgresql":
+        ts_query = func.websearch_to_tsquery(literal_column("'simple'"), text)
+        rank = func.ts_rank(_PG_SEARCH_VECTOR, ts_query)
+
+        query = query.where(_PG_SEARCH_VECTOR.op("@@")(ts_query))
+        return query, SortKey(rank, descending=True, parse=float, computed=True)
+
+    if dialect == "sqlite":
+        match_query = _fts5_query(text)
+        if match_query is None:
+            return query, None
+
+        fts_ref = literal_column(_FTS_TABLE_NAME)
+        matches = (
+            select(
+                _fts.c.rowid.label("apartment_id"),
+                func.bm25(fts_ref, *_FTS_WEIGHTS).label("rank"),
+            )
+            .select_from(_fts)
+            .where(fts_ref.op("MATCH")(match_query))
+            .subquery("fts_matches")
+        )
+
+        query = query.join(matches, matches.c.apartment_id == Apartment.id)
+        # bm25 is lower for better matches
+        return query, SortKey(matches.c.rank, parse=float, computed=True)
+
+    # no index backed search for this backend, plain substring match
+    pattern = f"%{text}%"
+    query = query.where(
+        Apartment.title.ilike(pattern)
+        | Apartment.description.ilike(pattern)
+        | Apartment.city.ilike(pattern)
+        | Apartment.country.ilike(pattern)
+    )
+    return query, None
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import math
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Float, and_, case, cast, or_
+
+from app.cursor_pagination import SortKey
+from app.models.apartment import Apartment
+from app.services.geohash import cover_bbox, prefix_end
+
+KM_PER_DEGREE = 111.32
+
+BBox = Tuple[float, float, float, float]  # min_lat, min_lon, max_lat, max_lon
+
+
+def _parse_floats(raw: str, count: int, name: str) -> list[float]:
+    try:
+        values = [float(part) for part in raw.split(",")]
+    except ValueError:
+        values = []
+
+    if len(values) != count or not all(math.isfinite(v) for v in values):
+        raise HTTPException(status_code=400, detail=f"Invalid {name}")
+    return values
+
+
+def parse_point(raw: str) -> Tuple[float, float]:
+    lat, lon = _parse_floats(raw, 2, "near, expected lat,lon")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise HTTPException(status_code=400, detail="near is out of range")
+    return lat, lon
+
+
+def parse_bbox(raw: str) -> BBox:
+    min_lat, min_lon, max_lat, max_lon = _parse_floats(
+        raw, 4, "bbox, expected min_lat,min_lon,max_lat,max_lon"
+    )
+    if not (
+        -90 <= min_lat <= max_lat <= 90
+        and -180 <= min_lon <= 180
+        and -180 <= max_lon <= 180
+    ):
+        raise HTTPException(status_code=400, detail="bbox is out of range")
+    if min_lon > max_lon:
+        raise HTTPException(
+            status_code=400,
+            detail="bbox can't cross the 180th meridian, split it in two",
+        )
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def _bbox_clause(bbox: BBox):
+    min_lat, min_lon, max_lat, max_lon = bbox
+
+    conditions = []
+    prefixes = [p for p in cover_bbox(*bbox) if p]
+    if prefixes:
+        ranges = []
+        for prefix in prefixes:
+            end = prefix_end(prefix)
+            ranges.append(
+                and_(Apartment.geohash >= prefix, Apartment.geohash < end)
+                if end
+                else Apartment.geohash >= prefix
+            )
+        conditions.append(or_(*ranges))
+
+    conditions.append(Apartment.latitude.between(min_lat, max_lat))
+    conditions.append(Apartment.longitude.between(min_lon, max_lon))
+    return and_(*conditions)
+
+
+def apply_bbox(query, bbox: BBox):
+    """Geohash prefix ranges narrow the scan, the exact lat/lon check finishes it."""
+    return query.where(_bbox_clause(bbox))
+
+
+def _radius_bboxes(lat: float, lon: float, radius_deg: float, lon_scale: float):
+    min_lat = max(-90.0, lat - radius_deg)
+    max_lat = min(90.0, lat + radius_deg)
+    half_width = radius_deg / lon_scale
+    if half_width >= 180:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+
+    west, east = lon - half_width, lon + half_width
+    # a circle across the 180th meridian is two boxes, one on each side
+    if west < -180:
+        return [
+            (min_lat, west + 360, max_lat, 180.0),
+            (min_lat, -180.0, max_lat, east),
+        ]
+    if east > 180:
+        return [
+            (min_lat, west, max_lat, 180.0),
+            (min_lat, -180.0, max_lat, east - 360),
+        ]
+    return [(min_lat, west, max_lat, east)]
+
+
+def apply_radius(query, lat: float, lon: float, radius_km: Optional[float]):
+    """
+    Restricts to apartments within `radius_km` of (lat, lon) when a radius is
+    given and returns the "distance" sort key.
+
+    Distance is an equirectangular approximation, which only needs arithmetic
+    in SQL (no trig functions on SQLite) and is accurate at city scale.
+    """
+    lon_scale = max(math.cos(math.radians(lat)), 1e-6)
+
+    dy = cast(Apartment.latitude, Float) - lat
+    dlon = cast(Apartment.longitude, Float) - lon
+    # shortest way around, so both sides of the 180th meridian are near
+    dlon = case((dlon > 180, dlon - 360), (dlon < -180, dlon + 360), else_=dlon)
+    dx = dlon * lon_scale
+    # squared distance in degrees of latitude, only compared against
+    # radius_deg squared and used for ordering (never shown as km)
+    distance_sq = dx * dx + dy * dy
+
+    query = query.where(Apartment.latitude.is_not(None))
+
+    if radius_km is not None:
+        radius_deg = radius_km / KM_PER_DEGREE
+        # the geohash box prefilter narrows the scan, the distance check
+        # cuts its corners off
+        boxes = _radius_bboxes(lat, lon, radius_deg, lon_scale)
+        query = query.where(or_(*(_bbox_clause(box) for box in boxes)))
+        query = query.where(distance_sq <= radius_deg * radius_deg)
+
+    return query, SortKey(distance_sq, parse=float, computed=True)
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import db
+from app.env_loader import get_env
+from app.models.apartment import Apartment
+from app.models.geocode_job import GeocodeJob
+from app.services.geocoding import geocode_osm_nominatim
+from app.services.geohash import encode as geohash_encode
+from app.services.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+GEOCODE_MAX_ATTEMPTS = int(get_env("GEOCODE_MAX_ATTEMPTS", "8"))
+GEOCODE_BACKOFF_BASE_SECONDS = float(get_env("GEOCODE_BACKOFF_BASE_SECONDS", "30"))
+GEOCODE_BACKOFF_MAX_SECONDS = float(get_env("GEOCODE_BACKOFF_MAX_SECONDS", "21600"))
+GEOCODE_POLL_SECONDS = float(get_env("GEOCODE_POLL_SECONDS", "30"))
+# a claimed job is not due for other workers until its lease runs out, so the
+# job of a worker that died mid-way is picked up again after this long
+GEOCODE_LEASE_SECONDS = float(get_env("GEOCODE_LEASE_SECONDS", "300"))
+GEOCODE_BATCH_SIZE = 50
+
+
+def enqueue_geocode(session: AsyncSession, apartment_id: int) -> GeocodeJob:
+    """Adds an outbox row to the caller's transaction, notify the worker after commit."""
+    job = GeocodeJob(apartment_id=apartment_id)
+    session.add(job)
+    return job
+
+
+def _backoff(attempts: int) -> timedelta:
+    delay = min(
+        GEOCODE_BACKOFF_MAX_SECONDS, GEOCODE_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1)
+    )
+    # jitter so failed jobs don't all come back at the same moment
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+class GeocodeWorker:
+    """
+    Fills in apartment coordinates in the background.
+
+    The geocode_jobs table is the durable outbox (jobs survive restarts),
+    the asyncio queue only wakes the worker up for freshly committed jobs.
+    Due jobs are also picked up by a periodic sweep, which is how retries
+    and jobs left over from a previous run get processed.
+
+    Every app process runs a worker, so a job is claimed with a conditional
+    UPDATE (pushing its next_attempt_at out by the lease) before it runs,
+    and only the worker whose UPDATE matched processes it.
+    """
+
+    def __init__(self, session_factory, poll_seconds: float = GEOCODE_POLL_SECONDS):
+        self._session_factory = session_factory
+        self._poll_seconds = poll_seconds
+        self._queue: asyncio.Queue[int] = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self, job_id: int) -> None:
+        self._queue.put_nowait(job_id)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        job_id = None  # start with a sweep for jobs left from a previous run
+        while True:
+            try:
+                if job_id is not None:
+                    await self.process_job(job_id)
+                else:
+                    await self.process_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Geocode worker iteration failed")
+
+            try:
+                job_id = await asyncio.wait_for(
+                    self._queue.get(), timeout=self._poll_seconds
+                )
+            except asyncio.TimeoutError:
+                job_id = None
+
+    async def process_due(self) -> int:
+        """Processes every job that is due right now, returns how many ran."""
+        processed = 0
+        while True:
+            async with self._session_factory() as session:
+                job_ids = (
+                    await session.exec(
+                        select(GeocodeJob.id)
+                        .where(
+                            GeocodeJob.status == "pending",
+                            GeocodeJob.next_attempt_at <= datetime.utcnow(),
+                        )
+                        .order_by(GeocodeJob.next_attempt_at)
+                        .limit(GEOCODE_BATCH_SIZE)
+                    )
+                ).all()
+
+            if not job_ids:
+                return processed
+
+            for job_id in job_ids:
+                if await self.process_job(job_id):
+                    processed += 1
+
+    @staticmethod
+    async def _claim(session: AsyncSession, job_id: int) -> Optional[int]:
+        """Leases the job if it is still due, returns its apartment id."""
+        now = datetime.utcnow()
+        result = await session.exec(
+            update(GeocodeJob)
+            .where(
+                GeocodeJob.id == job_id,
+                GeocodeJob.status == "pending",
+                GeocodeJob.next_attempt_at <= now,
+            )
+            .values(next_attempt_at=now + timedelta(seconds=GEOCODE_LEASE_SECONDS))
+            .returning(GeocodeJob.apartment_id)
+        )
+        apartment_id = result.scalar_one_or_none()
+        await session.commit()
+        return apartment_id
+
+    async def process_job(self, job_id: int) -> bool:
+        """Runs the job unless another worker has it, returns whether it ran."""
+        # claim, read what we need and release the connection before the
+        # network call
+        async with self._session_factory() as session:
+            apartment_id = await self._claim(session, job_id)
+            if apartment_id is None:
+                return False
+
+            apartment = await session.get(Apartment, apartment_id)
+            if apartment is None:
+                job = await session.get(GeocodeJob, job_id)
+                if job is not None:
+                    await session.delete(job)
+                    await session.commit()
+                return True
+
+            address, city, country = (
+                apartment.address,
+                apartment.city,
+                apartment.country,
+            )
+
+        try:
+            coords = await geocode_osm_nominatim(
+                address=address, city=city, country=country
+            )
+        except Exception as e:
+            await self._record_failure(job_id, e)
+            return True
+
+        async with self._session_factory() as session:
+            apartment = await session.get(Apartment, apartment_id)
+            if apartment is not None and coords:
+                apartment.latitude, apartment.longitude = coords
+                apartment.geohash = geohash_encode(float(coords[0]), float(coords[1]))
+                session.add(apartment)
+
+            job = await session.get(GeocodeJob, job_id)
+            if job is not None:
+                await session.delete(job)
+            await session.commit()
+
+        if coords:
+            await response_cache.invalidate("apartments", f"apartment:{apartment_id}")
+        return True
+
+    async def _record_failure(self, job_id: int, error: Exception) -> None:
+        async with self._session_factory() as session:
+            job = await session.get(GeocodeJob, job_id)
+            if job is None:
+                return
+
+            job.attempts += 1
+            job.last_error = f"{type(error).__name__}: {error}"[:500]
+            if job.attempts >= GEOCODE_MAX_ATTEMPTS:
+                job.status = "failed"
+                logger.warning(
+                    "Giving up geocoding apartment %s: %s",
+                    job.apartment_id,
+                    job.last_error,
+                )
+            else:
+                job.next_attempt_at = datetime.utcnow() + _backoff(job.attempts)
+
+            session.add(job)
+            await session.commit()
+
+
+# SINGLE shared worker for whole app
+geocode_worker = GeocodeWorker(db.session_factory)
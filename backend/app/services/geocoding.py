@@ -1,30 +1,208 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timedelta
 from decimal import Decimal
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 
 import httpx
+from sqlalchemy import delete, func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.cache import TTLCache
+from app.db import db
+from app.env_loader import get_env
+from app.models.geocode_cache import GeocodeCacheEntry
 
-NOMINATIM_SEARCH_URL = "https://nominatim.openstreetmap.org/search"
+# overridable so tests can point at a local stub server
+NOMINATIM_SEARCH_URL = get_env(
+    "NOMINATIM_SEARCH_URL", "https://nominatim.openstreetmap.org/search"
+)
 
+# Nominatim usage policy: at most 1 request per second (the bucket is per
+# process, with N app processes set it to 1/N)
+GEOCODE_RATE_PER_SECOND = float(get_env("GEOCODE_RATE_PER_SECOND", "1"))
+GEOCODE_CACHE_TTL_DAYS = int(get_env("GEOCODE_CACHE_TTL_DAYS", "90"))
+GEOCODE_CACHE_MAX_ENTRIES = int(get_env("GEOCODE_CACHE_MAX_ENTRIES", "50000"))
+# last_used_at is only rewritten once it is this old, so hits are plain reads
+GEOCODE_CACHE_TOUCH_INTERVAL = timedelta(hours=12)
+# the table size is only checked every this many inserts (per process), so
+# it may go over the limit by about 1% before it is trimmed
+GEOCODE_CACHE_EVICT_EVERY = max(1, GEOCODE_CACHE_MAX_ENTRIES // 100)
 
-async def geocode_osm_nominatim(
-    address: str,
-    city: str,
-    country: str,
-) -> Optional[Tuple[Decimal, Decimal]]:
-    """
-    Returns (lat, lon) as Decimals, or None if not found.
+Coords = Tuple[Decimal, Decimal]
 
-    Notes:
-    - Nominatim requires a valid User-Agent identifying your app.
-    - You should add caching + rate limiting in production.
-    """
-    query = ", ".join(
-        [part for part in [address, city, country] if part and part.strip()]
+
+class TokenBucket:
+    """Async token bucket, `acquire` waits until a token is available."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+_rate_limiter = TokenBucket(rate=GEOCODE_RATE_PER_SECOND)
+_client: Optional[httpx.AsyncClient] = None
+
+# hot entries in memory in front of the geocode_cache table
+_memory_cache: TTLCache[str, Optional[Coords]] = TTLCache(maxsize=1024, ttl=3600)
+# lookups currently waiting on Nominatim, concurrent callers share them
+_in_flight: Dict[str, asyncio.Task] = {}
+_inserts_since_eviction = 0
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=2),
+            headers={
+                "User-Agent": "booking-clone/1.0 (contact: sp2019@student.fon.bg.ac.rs)",
+                "Accept": "application/json",
+            },
+        )
+    return _client
+
+
+async def close_geocoding_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def normalize_query(address: str, city: str, country: str) -> str:
+    # case and whitespace differences should hit the same cache entry
+    return ", ".join(
+        " ".join(part.lower().split())
+        for part in [address, city, country]
+        if part and part.strip()
+    )
+
+
+def _query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+async def _load_cached(query_hash: str) -> Tuple[bool, Optional[Coords]]:
+    async with db.session_factory() as session:
+        entry = await session.get(GeocodeCacheEntry, query_hash)
+        if entry is None:
+            return False, None
+
+        now = datetime.utcnow()
+        if entry.created_at < now - timedelta(days=GEOCODE_CACHE_TTL_DAYS):
+            return False, None
+
+        # coarse LRU: a hit only writes when the last touch is old enough
+        if entry.last_used_at < now - GEOCODE_CACHE_TOUCH_INTERVAL:
+            await session.exec(
+                update(GeocodeCacheEntry)
+                .where(GeocodeCacheEntry.query_hash == query_hash)
+                .values(last_used_at=now)
+            )
+            await session.commit()
+
+        if entry.latitude is None or entry.longitude is None:
+            return True, None
+        return True, (entry.latitude, entry.longitude)
+
+
+async def _evict_cached(session: AsyncSession) -> None:
+    """LRU eviction, drops the least recently used rows above the limit."""
+    total = (
+        await session.exec(select(func.count()).select_from(GeocodeCacheEntry))
+    ).one()
+    overflow = total - GEOCODE_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        oldest = (
+            select(GeocodeCacheEntry.query_hash)
+            .order_by(GeocodeCacheEntry.last_used_at)
+            .limit(overflow)
+        )
+        await session.exec(
+            delete(GeocodeCacheEntry).where(GeocodeCacheEntry.query_hash.in_(oldest))
+        )
+        await session.commit()
+
+
+async def _upsert_cached(session: AsyncSession, values: dict) -> None:
+    # another worker or process may store the same query at the same time
+    dialect = session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = pg_insert if dialect == "postgresql" else sqlite_insert
+        stmt = insert(GeocodeCacheEntry).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[GeocodeCacheEntry.query_hash],
+            set_={k: v for k, v in values.items() if k != "query_hash"},
+        )
+        await session.exec(stmt)
+        await session.commit()
+        return
+
+    try:
+        session.add(GeocodeCacheEntry(**values))
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        await session.exec(
+            update(GeocodeCacheEntry)
+            .where(GeocodeCacheEntry.query_hash == values["query_hash"])
+            .values(**values)
+        )
+        await session.commit()
+
+
+async def _store_cached(query_hash: str, query: str, coords: Optional[Coords]) -> None:
+    global _inserts_since_eviction
+
+    now = datetime.utcnow()
+    values = dict(
+        query_hash=query_hash,
+        query=query,
+        latitude=coords[0] if coords else None,
+        longitude=coords[1] if coords else None,
+        created_at=now,
+        last_used_at=now,
     )
 
+    async with db.session_factory() as session:
+        await _upsert_cached(session, values)
+        # stores only follow cache misses, so nearly all of them are inserts
+        _inserts_since_eviction += 1
+
+        # amortized: the COUNT(*) runs once per GEOCODE_CACHE_EVICT_EVERY inserts
+        if _inserts_since_eviction >= GEOCODE_CACHE_EVICT_EVERY:
+            _inserts_since_eviction = 0
+            await _evict_cached(session)
+
+
+async def _fetch_nominatim(query: str) -> Optional[Coords]:
     params = {
         "q": query,
         "format": "jsonv2",
@@ -32,27 +210,63 @@ async def geocode_osm_nominatim(
         "addressdetails": 0,
     }
 
-    headers = {
-        "User-Agent": "booking-clone/1.0 (contact: sp2019@student.fon.bg.ac.rs)",
-        "Accept": "application/json",
-    }
+    await _rate_limiter.acquire()
+
+    r = await _get_client().get(NOMINATIM_SEARCH_URL, params=params)
+    r.raise_for_status()
+
+    data = r.json()
+    if not data:
+        return None
 
-    timeout = httpx.Timeout(10.0, connect=5.0)
+    lat_str = data[0].get("lat")
+    lon_str = data[0].get("lon")
+    if not lat_str or not lon_str:
+        return None
 
-    async with httpx.AsyncClient(timeout=timeout, headers=headers) as client:
-        r = await client.get(NOMINATIM_SEARCH_URL, params=params)
-        r.raise_for_status()
+    # DB columns are Numeric(10,6) to round on 6 decimals
+    lat = Decimal(lat_str).quantize(Decimal("0.000001"))
+    lon = Decimal(lon_str).quantize(Decimal("0.000001"))
+    return lat, lon
+
+
+async def _lookup(query: str, query_hash: str) -> Optional[Coords]:
+    found, coords = await _load_cached(query_hash)
+    if not found:
+        coords = await _fetch_nominatim(query)
+        await _store_cached(query_hash, query, coords)
+
+    _memory_cache.set(query_hash, coords)
+    return coords
+
+
+async def geocode_osm_nominatim(
+    address: str,
+    city: str,
+    country: str,
+) -> Optional[Coords]:
+    """
+    Returns (lat, lon) as Decimals, or None if not found.
+
+    Notes:
+    - Nominatim requires a valid User-Agent identifying your app.
+    - Results (also "not found") are cached per normalized address in memory
+      and in the geocode_cache table, concurrent lookups of the same address
+      share one request and requests are rate limited to Nominatim's policy.
+    """
+    query = normalize_query(address, city, country)
+    if not query:
+        return None
 
-        data = r.json()
-        if not data:
-            return None
+    query_hash = _query_hash(query)
+    if query_hash in _memory_cache:
+        return _memory_cache.get(query_hash)
 
-        lat_str = data[0].get("lat")
-        lon_str = data[0].get("lon")
-        if not lat_str or not lon_str:
-            return None
+    task = _in_flight.get(query_hash)
+    if task is None:
+        task = asyncio.create_task(_lookup(query, query_hash))
+        _in_flight[query_hash] = task
+        task.add_done_callback(lambda _: _in_flight.pop(query_hash, None))
 
-        # DB columns are Numeric(10,6) to round on 6 decimals
-        lat = Decimal(lat_str).quantize(Decimal("0.000001"))
-        lon = Decimal(lon_str).quantize(Decimal("0.000001"))
-        return lat, lon
+    # shield: one caller giving up must not cancel the lookup for the others
+    return await asyncio.shield(task)
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import math
+from typing import List, Optional
+
+# Pure python geohash, used to give apartments a sortable spatial cell so
+# radius / bounding box searches become prefix range scans on a btree index.
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+GEOHASH_PRECISION = 9  # ~4.8m x 4.8m cells, more than enough for listings
+
+# largest cover we are willing to turn into OR'ed range conditions
+MAX_COVER_CELLS = 24
+
+
+def encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # geohash starts with a longitude bit
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                bits = (bits << 1) | 1
+                lon_lo = mid
+            else:
+                bits <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    """(height, width) of a cell in degrees."""
+    total_bits = precision * 5
+    lat_bits = total_bits // 2
+    lon_bits = total_bits - lat_bits
+    return 180.0 / (2**lat_bits), 360.0 / (2**lon_bits)
+
+
+def prefix_end(prefix: str) -> Optional[str]:
+    """
+    Smallest string after every geohash starting with `prefix` (None when
+    there is none), so [prefix, prefix_end) is the prefix range. It is made
+    of geohash characters only, which sort the same under any collation
+    (digits before lowercase letters), unlike punctuation.
+    """
+    stripped = prefix.rstrip(_BASE32[-1])
+    if not stripped:
+        return None
+    return stripped[:-1] + _BASE32[_BASE32.index(stripped[-1]) + 1]
+
+
+def _cell_range(lo: float, hi: float, origin: float, size: float, limit: int):
+    first = max(0, math.floor((lo - origin) / size))
+    last = min(limit - 1, math.floor((hi - origin) / size))
+    return first, last
+
+
+def cover_bbox(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    max_cells: int = MAX_COVER_CELLS,
+) -> List[str]:
+    """
+    Geohash prefixes whose cells together cover the bounding box.
+
+    Uses the finest precision that still needs at most `max_cells` cells,
+    the caller still has to apply the exact lat/lon condition on top.
+    """
+    best: List[str] = [""]
+
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        height, width = cell_size(precision)
+        lat_cells = round(180.0 / height)
+        lon_cells = round(360.0 / width)
+
+        lat_first, lat_last = _cell_range(min_lat, max_lat, -90.0, height, lat_cells)
+        lon_first, lon_last = _cell_range(min_lon, max_lon, -180.0, width, lon_cells)
+
+        count = (lat_last - lat_first + 1) * (lon_last - lon_first + 1)
+        if count > max_cells:
+            break
+
+        best = [
+            encode(
+                -90.0 + (i + 0.5) * height,
+                -180.0 + (j + 0.5) * width,
+                precision,
+            )
+            for i in range(lat_first, lat_last + 1)
+            for j in range(lon_first, lon_last + 1)
+        ]
+
+    return best
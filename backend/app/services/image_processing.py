@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from app.env_loader import get_env
+
+# longest edge in pixels, images are never upscaled
+VARIANT_SIZES = {
+    "thumb": 320,
+    "card": 800,
+    "full": 1920,
+}
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
+
+IMAGE_WORKERS = int(get_env("IMAGE_WORKERS", "2"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class InvalidImageError(ValueError):
+    pass
+
+
+def _avif_supported() -> bool:
+    return "avif" in features.modules and bool(features.check("avif"))
+
+
+def process_image(source: str, out_dir: str, stem: str) -> list[dict]:
+    """
+    Writes the size variants of `source` into `out_dir` and returns their
+    descriptions. Runs in a worker process, so only plain values in and out.
+
+    EXIF orientation is applied to the pixels and no metadata (EXIF, GPS,
+    ICC comments) is written to the variants.
+    """
+    try:
+        with Image.open(source) as opened:
+            image = ImageOps.exif_transpose(opened)
+            image.load()
+    except (UnidentifiedImageError, OSError) as e:
+        raise InvalidImageError(str(e))
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    formats = ["webp"] + (["avif"] if _avif_supported() else [])
+    variants = []
+
+    for name, max_edge in VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+        for fmt in formats:
+            filename = f"{stem}_{name}.{fmt}"
+            options = (
+                {"quality": WEBP_QUALITY, "method": 4}
+                if fmt == "webp"
+                else {"quality": AVIF_QUALITY}
+            )
+            target = Path(out_dir) / filename
+            partial = target.with_name(f".{filename}.part")
+            resized.save(partial, format=fmt.upper(), **options)
+            os.replace(partial, target)
+            data = target.read_bytes()
+
+            variants.append(
+                {
+                    "name": name,
+                    "format": fmt,
+                    "width": resized.width,
+                    "height": resized.height,
+                    "filename": filename,
+                    "size": len(data),
+                    "sha256": hashlib.sha256(data).hexdigest(),
+                }
+            )
+
+    return variants
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _pool
+
+
+async def create_variants(source: Path, out_dir: Path, stem: str) -> list[dict]:
+    """Runs `process_image` in the process pool, never on the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_pool(), process_image, str(source), str(out_dir), stem
+    )
+
+
+def shutdown_image_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import base64
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, false, insert, text, tuple_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.booked_day import BookedDay
+from app.models.reservation import Reservation
+
+# A run is (first day offset, length in days), offsets count from the start
+# of the requested range and the end of every interval is exclusive.
+Run = Tuple[int, int]
+
+
+def merge_runs(
+    intervals: Iterable[Tuple[date, date]], start: date, end: date
+) -> List[Run]:
+    """
+    Clips [check_in, check_out) intervals to [start, end) and merges the
+    overlapping / touching ones, cost depends on the number of reservations
+    and not on the number of days.
+    """
+    clipped = sorted(
+        (max(check_in, start), min(check_out, end))
+        for check_in, check_out in intervals
+        if check_in < end and check_out > start
+    )
+
+    runs: List[Run] = []
+    current_start = current_end = None
+
+    for s, e in clipped:
+        if current_end is not None and s <= current_end:
+            current_end = max(current_end, e)
+            continue
+
+        if current_start is not None:
+            runs.append(
+                ((current_start - start).days, (current_end - current_start).days)
+            )
+        current_start, current_end = s, e
+
+    if current_start is not None:
+        runs.append(((current_start - start).days, (current_end - current_start).days))
+
+    return runs
+
+
+def runs_to_bitmap(runs: List[Run], days: int) -> str:
+    """Base64 of a little endian bitset where bit i is set when day i is booked."""
+    mask = 0
+    for offset, length in runs:
+        mask |= ((1 << length) - 1) << offset
+
+    raw = mask.to_bytes((days + 7) // 8, "little")
+    return base64.b64encode(raw).decode("ascii")
+
+
+def stay_days(check_in: date, check_out: date) -> List[date]:
+    return [check_in + timedelta(days=i) for i in range((check_out - check_in).days)]
+
+
+def days_to_runs(days: Iterable[date], start: date, end: date) -> List[Run]:
+    return merge_runs(((d, d + timedelta(days=1)) for d in days), start, end)
+
+
+async def book_days(
+    session: AsyncSession,
+    reservation_id: int,
+    apartment_id: int,
+    check_in: date,
+    check_out: date,
+) -> None:
+    """Marks the nights of a confirmed reservation, in the caller's transaction."""
+    await session.execute(
+        insert(BookedDay),
+        [
+            {"apartment_id": apartment_id, "day": day, "reservation_id": reservation_id}
+            for day in stay_days(check_in, check_out)
+        ],
+    )
+
+
+async def free_days(session: AsyncSession, reservation_id: int) -> None:
+    await session.exec(
+        delete(BookedDay).where(BookedDay.reservation_id == reservation_id)
+    )
+
+
+async def get_booked_days(
+    session: AsyncSession, apartment_ids: List[int], start: date, end: date
+) -> Dict[int, List[date]]:
+    """Booked nights in [start, end) per apartment, a primary key range seek."""
+    rows = (
+        await session.exec(
+            select(BookedDay.apartment_id, BookedDay.day)
+            .where(
+                BookedDay.apartment_id.in_(apartment_ids),
+                BookedDay.day >= start,
+                BookedDay.day < end,
+            )
+            .order_by(BookedDay.apartment_id, BookedDay.day)
+        )
+    ).all()
+
+    days: Dict[int, List[date]] = {i: [] for i in apartment_ids}
+    for apartment_id, day in rows:
+        days[apartment_id].append(day)
+    return days
+
+
+async def get_booked_apartments(
+    session: AsyncSession, apartment_ids: List[int], start: date, end: date
+) -> Set[int]:
+    """The apartments among `apartment_ids` with a booked night in [start, end)."""
+    rows = await session.exec(
+        select(BookedDay.apartment_id)
+        .where(
+            BookedDay.apartment_id.in_(apartment_ids),
+            BookedDay.day >= start,
+            BookedDay.day < end,
+        )
+        .distinct()
+    )
+    return set(rows.all())
+
+
+async def rebuild_occupancy(
+    session: AsyncSession, apartment_ids: Optional[List[int]] = None
+) -> Tuple[int, int]:
+    """
+    Reconciles apartment_booked_days with the confirmed reservations of the
+    given apartments (all when None) and commits. Returns (added, removed).
+    """
+    # confirms / cancels wait until this commits, so none of them is lost
+    # between reading the reservations and writing the days
+    if session.get_bind().dialect.name == "postgresql":
+        await session.exec(text("LOCK TABLE apartment_booked_days IN EXCLUSIVE MODE"))
+    else:
+        # any write statement takes sqlite's single writer lock
+        await session.exec(delete(BookedDay).where(false()))
+
+    reservations = select(
+        Reservation.id,
+        Reservation.apartment_id,
+        Reservation.check_in,
+        Reservation.check_out,
+    ).where(Reservation.status == "confirmed")
+    booked = select(BookedDay.apartment_id, BookedDay.day, BookedDay.reservation_id)
+    if apartment_ids is not None:
+        reservations = reservations.where(Reservation.apartment_id.in_(apartment_ids))
+        booked = booked.where(BookedDay.apartment_id.in_(apartment_ids))
+
+    expected: Dict[Tuple[int, date], int] = {}
+    for reservation_id, apartment_id, check_in, check_out in (
+        await session.exec(reservations.order_by(Reservation.id))
+    ).all():
+        for day in stay_days(check_in, check_out):
+            # overlapping confirmed stays (legacy data): the first one keeps the night
+            expected.setdefault((apartment_id, day), reservation_id)
+
+    actual = {
+        (apartment_id, day): reservation_id
+        for apartment_id, day, reservation_id in (await session.exec(booked)).all()
+    }
+
+    stale = [key for key, rid in actual.items() if expected.get(key) != rid]
+    missing = [key for key, rid in expected.items() if actual.get(key) != rid]
+
+    for i in range(0, len(stale), 500):
+        await session.exec(
+            delete(BookedDay).where(
+                tuple_(BookedDay.apartment_id, BookedDay.day).in_(stale[i : i + 500])
+            )
+        )
+    if missing:
+        await session.execute(
+            insert(BookedDay),
+            [
+                {"apartment_id": a, "day": d, "reservation_id": expected[(a, d)]}
+                for a, d in missing
+            ],
+        )
+
+    await session.commit()
+    return len(missing), len(stale)
@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import db
+from app.env_loader import get_env
+from app.models.photo_blob import PhotoBlob
+
+PHOTO_STORAGE_BACKEND = get_env("PHOTO_STORAGE_BACKEND", "local")  # local | s3
+PHOTO_STORAGE_DIR = Path(get_env("PHOTO_STORAGE_DIR", "static/images/apartments/blobs"))
+# public URL prefix of stored objects, defaults depend on the backend
+PHOTO_STORAGE_BASE_URL = get_env("PHOTO_STORAGE_BASE_URL", "")
+
+# any S3 compatible service (AWS, MinIO, R2, ...), needs boto3
+S3_ENDPOINT_URL = get_env("S3_ENDPOINT_URL", "")
+S3_REGION = get_env("S3_REGION", "us-east-1")
+S3_BUCKET = get_env("S3_BUCKET", "")
+S3_ACCESS_KEY_ID = get_env("S3_ACCESS_KEY_ID", "")
+S3_SECRET_ACCESS_KEY = get_env("S3_SECRET_ACCESS_KEY", "")
+
+
+def blob_key(sha256: str, ext: str) -> str:
+    return f"{sha256[:2]}/{sha256}.{ext}"
+
+
+class PhotoStorage(ABC):
+    """Where photo files live. Keys are content addressed, so puts are idempotent."""
+
+    @abstractmethod
+    async def put(self, key: str, source: Path, content_type: str) -> None: ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool: ...
+
+    @abstractmethod
+    def url(self, key: str) -> str: ...
+
+
+class LocalPhotoStorage(PhotoStorage):
+    def __init__(self, root: Path, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def _put(self, key: str, source: Path) -> None:
+        target = self.root / key
+        if target.is_file():
+            return  # same key, same content
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(source, target)
+        except OSError:
+            # staging on another filesystem, copy next to the target then rename
+            with tempfile.NamedTemporaryFile(
+                dir=target.parent, suffix=".part", delete=False
+            ) as buffer:
+                with source.open("rb") as f:
+                    shutil.copyfileobj(f, buffer)
+            os.replace(buffer.name, target)
+
+    async def put(self, key: str, source: Path, content_type: str) -> None:
+        await asyncio.to_thread(self._put, key, source)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread((self.root / key).unlink, missing_ok=True)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread((self.root / key).is_file)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+class S3PhotoStorage(PhotoStorage):
+    """
+    S3 compatible object storage. Path style addressing, so a local MinIO
+    (S3_ENDPOINT_URL=http://localhost:9000) works the same as AWS.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region: str = "us-east-1",
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+    ):
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise RuntimeError("PHOTO_STORAGE_BACKEND=s3 requires boto3")
+
+        self.bucket = bucket
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None,
+            config=Config(s3={"addressing_style": "path"}),
+        )
+
+        if not base_url:
+            endpoint = endpoint_url or f"https://s3.{region}.amazonaws.com"
+            base_url = f"{endpoint.rstrip('/')}/{bucket}"
+        self.base_url = base_url.rstrip("/")
+
+    def _exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self._client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return False
+            raise
+
+    def _put(self, key: str, source: Path, content_type: str) -> None:
+        if self._exists(key):
+            return
+
+        self._client.upload_file(
+            str(source),
+            self.bucket,
+            key,
+            ExtraArgs={
+                "ContentType": content_type,
+                "CacheControl": "public, max-age=31536000, immutable",
+            },
+        )
+
+    async def put(self, key: str, source: Path, content_type: str) -> None:
+        await asyncio.to_thread(self._put, key, source, content_type)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._client.delete_object, Bucket=self.bucket, Key=key)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._exists, key)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+def create_photo_storage() -> PhotoStorage:
+    if PHOTO_STORAGE_BACKEND == "s3":
+        return S3PhotoStorage(
+            bucket=S3_BUCKET,
+            endpoint_url=S3_ENDPOINT_URL,
+            region=S3_REGION,
+            access_key_id=S3_ACCESS_KEY_ID,
+            secret_access_key=S3_SECRET_ACCESS_KEY,
+            base_url=PHOTO_STORAGE_BASE_URL,
+        )
+    if PHOTO_STORAGE_BACKEND == "local":
+        return LocalPhotoStorage(
+            PHOTO_STORAGE_DIR,
+            PHOTO_STORAGE_BASE_URL or "/static/images/apartments/blobs",
+        )
+    raise RuntimeError(f"Unknown PHOTO_STORAGE_BACKEND: {PHOTO_STORAGE_BACKEND}")
+
+
+# SINGLE shared storage for whole app
+photo_storage = create_photo_storage()
+
+
+async def acquire_blob(
+    session: AsyncSession, key: str, size: int, content_type: str
+) -> None:
+    """
+    Adds one reference to the blob `key` in the caller's transaction,
+    creating its row on first use. Commit it before storing the object,
+    see `store_blob`.
+    """
+    dialect = session.get_bind().dialect.name
+    values = dict(
+        key=key,
+        size=size,
+        content_type=content_type,
+        ref_count=1,
+        created_at=datetime.utcnow(),
+    )
+
+    if dialect in ("postgresql", "sqlite"):
+        insert = pg_insert if dialect == "postgresql" else sqlite_insert
+        stmt = insert(PhotoBlob).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PhotoBlob.key],
+            set_={"ref_count": PhotoBlob.ref_count + 1},
+        )
+        await session.exec(stmt)
+        return
+
+    result = await session.exec(
+        update(PhotoBlob)
+        .where(PhotoBlob.key == key)
+        .values(ref_count=PhotoBlob.ref_count + 1)
+    )
+    if result.rowcount == 0:
+        session.add(PhotoBlob(**values))
+        await session.flush()
+
+
+async def release_blobs(session: AsyncSession, keys: Iterable[str]) -> list[str]:
+    """
+    Drops one reference per occurrence of a key in the caller's transaction.
+    Returns the keys to pass to `collect_blobs` after commit.
+    """
+    counts = Counter(keys)
+    for key, n in counts.items():
+        await session.exec(
+            update(PhotoBlob)
+            .where(PhotoBlob.key == key)
+            .values(ref_count=PhotoBlob.ref_count - n)
+        )
+    return list(counts)
+
+
+async def collect_blobs(
+    session: AsyncSession, storage: PhotoStorage, keys: Iterable[str]
+) -> None:
+    """Deletes the objects among `keys` that no photo references any more."""
+    keys = list(keys)
+    if not keys:
+        return
+
+    # the objects are deleted before the commit: until then the deleted rows
+    # stay locked, so a concurrent acquire_blob of the same key waits and its
+    # put() then finds the object gone and writes it again
+    try:
+        result = await session.exec(
+            delete(PhotoBlob)
+            .where(PhotoBlob.key.in_(keys), PhotoBlob.ref_count <= 0)
+            .returning(PhotoBlob.key)
+        )
+        for key in result.scalars().all():
+            await storage.delete(key)
+        await session.commit()
+    except BaseException:
+        await session.rollback()
+        raise
+
+
+async def store_blob(
+    storage: PhotoStorage, key: str, source: Path, size: int, content_type: str
+) -> None:
+    """
+    Takes a reference to `key` in its own committed transaction, then stores
+    the object. Once the reference is committed collect_blobs leaves the
+    object alone, so the photo row written later can't end up dangling.
+    """
+    async with db.session_factory() as session:
+        await acquire_blob(session, key, size, content_type)
+        await session.commit()
+
+    try:
+        await storage.put(key, source, content_type)
+    except BaseException:
+        await abandon_blobs(storage, [key])
+        raise
+
+
+async def abandon_blobs(storage: PhotoStorage, keys: Iterable[str]) -> None:
+    """Drops the references `store_blob` took for an upload that failed."""
+    keys = list(keys)
+    if not keys:
+        return
+
+    async with db.session_factory() as session:
+        released = await release_blobs(session, keys)
+        await session.commit()
+        await collect_blobs(session, storage, released)
+
+
+def variant_keys(variants: Optional[list]) -> list[str]:
+    return [v["key"] for v in variants or [] if "key" in v]
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.cache import TTLCache
+from app.env_loader import get_env
+from app.models.apartment import Apartment
+from app.models.apartment_price import ApartmentPriceOverride
+from app.services.occupancy import stay_days
+
+QUOTE_CACHE_SIZE = int(get_env("QUOTE_CACHE_SIZE", "10000"))
+QUOTE_CACHE_TTL_SECONDS = float(get_env("QUOTE_CACHE_TTL_SECONDS", "600"))
+
+
+@dataclass(frozen=True)
+class Quote:
+    nightly_prices: Tuple[Decimal, ...]  # one per night, check_in first
+    total_price: Decimal
+
+    @property
+    def nights(self) -> int:
+        return len(self.nightly_prices)
+
+
+def price_stay(
+    base_price: Decimal,
+    overrides: Dict[date, Decimal],
+    check_in: date,
+    check_out: date,
+) -> Quote:
+    """Every night costs the base price unless that day has an override."""
+    nightly = tuple(
+        overrides.get(day, base_price) for day in stay_days(check_in, check_out)
+    )
+    return Quote(nightly_prices=nightly, total_price=sum(nightly, Decimal("0.00")))
+
+
+async def get_price_overrides(
+    session: AsyncSession, apartment_ids: List[int], start: date, end: date
+) -> Dict[int, Dict[date, Decimal]]:
+    """Overrides in [start, end) of all the apartments, one range query."""
+    rows = (
+        await session.exec(
+            select(
+                ApartmentPriceOverride.apartment_id,
+                ApartmentPriceOverride.day,
+                ApartmentPriceOverride.price_per_night,
+            ).where(
+                ApartmentPriceOverride.apartment_id.in_(apartment_ids),
+                ApartmentPriceOverride.day >= start,
+                ApartmentPriceOverride.day < end,
+            )
+        )
+    ).all()
+
+    overrides: Dict[int, Dict[date, Decimal]] = {i: {} for i in apartment_ids}
+    for apartment_id, day, price in rows:
+        overrides[apartment_id][day] = price
+    return overrides
+
+
+async def set_price_overrides(
+    session: AsyncSession,
+    apartment_id: int,
+    start: date,
+    end: date,
+    price_per_night: Optional[Decimal],
+) -> None:
+    """
+    Sets (or with None clears) the price of every night in [start, end) and
+    bumps the apartment's price version, in the caller's transaction.
+    """
+    await session.exec(
+        delete(ApartmentPriceOverride).where(
+            ApartmentPriceOverride.apartment_id == apartment_id,
+            ApartmentPriceOverride.day >= start,
+            ApartmentPriceOverride.day < end,
+        )
+    )
+    if price_per_night is not None:
+        await session.execute(
+            insert(ApartmentPriceOverride),
+            [
+                {
+                    "apartment_id": apartment_id,
+                    "day": day,
+                    "price_per_night": price_per_night,
+                }
+                for day in stay_days(start, end)
+            ],
+        )
+
+    await session.exec(
+        update(Apartment)
+        .where(Apartment.id == apartment_id)
+        .values(price_version=Apartment.price_version + 1)
+    )
+
+
+class PriceQuoter:
+    """
+    Quotes stays and memoizes them per (apartment, price version, base price,
+    check_in, check_out). A price change bumps the version in the database,
+    so stale entries are never hit again, in any process.
+    """
+
+    def __init__(
+        self, maxsize: int = QUOTE_CACHE_SIZE, ttl: float = QUOTE_CACHE_TTL_SECONDS
+    ):
+        self._cache: TTLCache[tuple, Quote] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _key(apartment, check_in: date, check_out: date) -> tuple:
+        return (
+            apartment.id,
+            apartment.price_version,
+            apartment.price_per_night,
+            check_in,
+            check_out,
+        )
+
+    async def quote_many(
+        self,
+        session: AsyncSession,
+        # Apartment objects or rows with id, price_per_night and price_version
+        apartments: Iterable,
+        check_in: date,
+        check_out: date,
+    ) -> Dict[int, Quote]:
+        quotes: Dict[int, Quote] = {}
+        missing = []
+        for apartment in apartments:
+            quote = self._cache.get(self._key(apartment, check_in, check_out))
+            if quote is None:
+                missing.append(apartment)
+            else:
+                quotes[apartment.id] = quote
+
+        self._hits += len(quotes)
+        self._misses += len(missing)
+        if not missing:
+            return quotes
+
+        overrides = await get_price_overrides(
+            session, [a.id for a in missing], check_in, check_out
+        )
+        for apartment in missing:
+            quote = price_stay(
+                apartment.price_per_night, overrides[apartment.id], check_in, check_out
+            )
+            self._cache.set(self._key(apartment, check_in, check_out), quote)
+            quotes[apartment.id] = quote
+
+        return quotes
+
+    async def quote(
+        self, session: AsyncSession, apartment, check_in: date, check_out: date
+    ) -> Quote:
+        quotes = await self.quote_many(session, [apartment], check_in, check_out)
+        return quotes[apartment.id]
+
+    def stats(self) -> dict:
+        return {"entries": len(self._cache), "hits": self._hits, "misses": self._misses}
+
+
+# SINGLE shared quoter for whole app
+price_quoter = PriceQuoter()
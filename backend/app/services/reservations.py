@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import db
+from app.env_loader import get_env
+from app.models.apartment import Apartment
+from app.models.reservation import Reservation
+from app.services.occupancy import book_days, free_days
+from app.services.pricing import price_quoter
+
+logger = logging.getLogger(__name__)
+
+# reservations in these states hold their dates, nobody else can book them
+# (a pending one only until its expires_at, see ReservationExpirer)
+ACTIVE_STATUSES = ("pending", "confirmed")
+
+# the host has this long to confirm, then the nights are free again
+RESERVATION_PENDING_TTL_HOURS = float(get_env("RESERVATION_PENDING_TTL_HOURS", "24"))
+RESERVATION_EXPIRY_INTERVAL_SECONDS = float(
+    get_env("RESERVATION_EXPIRY_INTERVAL_SECONDS", "300")
+)
+
+# attempts when the database reports a write conflict (sqlite "database is locked")
+RESERVATION_MAX_RETRIES = int(get_env("RESERVATION_MAX_RETRIES", "5"))
+RESERVATION_LOCK_STRIPES = 256
+
+# name of the Postgres exclusion constraint, see migration 0c4e9b2d7f61
+OVERLAP_CONSTRAINT = "ex_reservations_apartment_dates"
+
+T = TypeVar("T")
+
+
+class ReservationError(Exception):
+    """The request itself is invalid (dates, guests, state transition)."""
+
+
+class ReservationConflictError(Exception):
+    """The dates are already held by another reservation."""
+
+
+class ReservationBusyError(Exception):
+    """Gave up after RESERVATION_MAX_RETRIES write conflicts."""
+
+
+def _is_overlap_violation(error: IntegrityError) -> bool:
+    # asyncpg reports exclusion violations as SQLSTATE 23P01
+    orig = getattr(error, "orig", None)
+    sqlstate = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    return sqlstate == "23P01" or OVERLAP_CONSTRAINT in str(error)
+
+
+class ReservationService:
+    """
+    Create / confirm / cancel with no double bookings under concurrency.
+
+    The overlap check and the insert run under a per-apartment lock: a
+    write to the apartment row that opens the transaction, so writers from
+    other processes wait for it (a row lock on Postgres, the write lock on
+    SQLite) or fail and the whole transaction is retried. Except on
+    Postgres, a striped asyncio lock also queues this process's writers so
+    they don't spin on SQLite's database-wide lock.
+    On Postgres the exclusion constraint on (apartment_id, daterange) from
+    migration 0c4e9b2d7f61 is a backstop, a database built by
+    create_tables() doesn't have it.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = RESERVATION_MAX_RETRIES,
+        stripes: int = RESERVATION_LOCK_STRIPES,
+        pending_ttl_hours: float = RESERVATION_PENDING_TTL_HOURS,
+    ):
+        self.max_retries = max_retries
+        self.pending_ttl_hours = pending_ttl_hours
+        self._locks = [asyncio.Lock() for _ in range(stripes)]
+
+    @asynccontextmanager
+    async def _apartment_lock(self, session: AsyncSession, apartment_id: int):
+        if session.get_bind().dialect.name == "postgresql":
+            # the row lock taken in create() already queues writers
+            yield
+            return
+
+        async with self._locks[apartment_id % len(self._locks)]:
+            yield
+
+    async def _with_retry(
+        self, session: AsyncSession, operation: Callable[[], Awaitable[T]]
+    ) -> T:
+        for attempt in range(self.max_retries):
+            try:
+                return await operation()
+            except OperationalError:
+                await session.rollback()
+                if attempt == self.max_retries - 1:
+                    raise ReservationBusyError()
+                # jitter so retrying writers don't collide again
+                await asyncio.sleep(random.uniform(0.01, 0.05) * (attempt + 1))
+        raise ReservationBusyError()
+
+    @staticmethod
+    async def _lock_apartment_row(session: AsyncSession, apartment_id: int) -> None:
+        # no-op write: the overlap check below then runs inside a write
+        # transaction, which sqlite grants to one connection at a time and
+        # which holds the apartment's row lock on Postgres until commit
+        await session.exec(
+            update(Apartment)
+            .where(Apartment.id == apartment_id)
+            .values(id=Apartment.id)
+        )
+
+    @staticmethod
+    async def _expire_pending(
+        session: AsyncSession, now: datetime, apartment_id: Optional[int] = None
+    ) -> int:
+        """Moves pending reservations past their deadline to "expired"."""
+        stmt = update(Reservation).where(
+            Reservation.status == "pending",
+            Reservation.expires_at <= now,
+        )
+        if apartment_id is not None:
+            stmt = stmt.where(Reservation.apartment_id == apartment_id)
+        result = await session.exec(stmt.values(status="expired", expires_at=None))
+        return result.rowcount
+
+    @staticmethod
+    async def _has_overlap(
+        session: AsyncSession, apartment_id: int, check_in: date, check_out: date
+    ) -> bool:
+        result = await session.exec(
+            select(Reservation.id)
+            .where(
+                Reservation.apartment_id == apartment_id,
+                Reservation.status.in_(ACTIVE_STATUSES),
+                Reservation.check_in < check_out,
+                Reservation.check_out > check_in,
+            )
+            .limit(1)
+        )
+        return result.first() is not None
+
+    async def create(
+        self,
+        session: AsyncSession,
+        apartment: Apartment,
+        user_id: int,
+        check_in: date,
+        check_out: date,
+        guests_count: int,
+        today: Optional[date] = None,
+    ) -> Reservation:
+        """Books [check_in, check_out) as a pending reservation and commits."""
+        if check_out <= check_in:
+            raise ReservationError("check_out must be after check_in")
+        if check_in < (today or date.today()):
+            raise ReservationError("You can't book previous dates")
+        if guests_count < 1 or guests_count > apartment.max_guests:
+            raise ReservationError(
+                f"Apartment takes at most {apartment.max_guests} guests"
+            )
+
+        quote = await price_quoter.quote(session, apartment, check_in, check_out)
+        total_price = quote.total_price
+        apartment_id = apartment.id
+
+        async def book() -> Reservation:
+            await self._lock_apartment_row(session, apartment_id)
+            # in the same transaction, so neither the overlap check nor the
+            # exclusion constraint sees stale pending reservations
+            now = datetime.utcnow()
+            await self._expire_pending(session, now, apartment_id)
+            if await self._has_overlap(session, apartment_id, check_in, check_out):
+                # releases the row lock (the write lock on sqlite) right away
+                await session.rollback()
+                raise ReservationConflictError()
+
+            reservation = Reservation(
+                apartment_id=apartment_id,
+                user_id=user_id,
+                check_in=check_in,
+                check_out=check_out,
+                guests_count=guests_count,
+                total_price=total_price,
+                status="pending",
+                expires_at=now + timedelta(hours=self.pending_ttl_hours),
+            )
+            session.add(reservation)
+            try:
+                await session.commit()
+            except IntegrityError as e:
+                await session.rollback()
+                if _is_overlap_violation(e):
+                    raise ReservationConflictError()
+                raise
+            return reservation
+
+        async with self._apartment_lock(session, apartment_id):
+            return await self._with_retry(session, book)
+
+    async def _transition(
+        self,
+        session: AsyncSession,
+        reservation_id: int,
+        from_statuses: tuple[str, ...],
+        to_status: str,
+    ) -> str:
+        """
+        Moves the reservation to `to_status` if it is still in one of
+        `from_statuses`, in a single conditional UPDATE so two concurrent
+        transitions can't both win. Returns the previous status.
+        """
+
+        async def apply() -> str:
+            row = (
+                await session.exec(
+                    select(
+                        Reservation.status,
+                        Reservation.apartment_id,
+                        Reservation.check_in,
+                        Reservation.check_out,
+                        Reservation.expires_at,
+                    ).where(Reservation.id == reservation_id)
+                )
+            ).first()
+            previous = row.status if row else None
+            now = datetime.utcnow()
+            if previous == "pending" and row.expires_at and row.expires_at <= now:
+                # past the deadline, the expiry sweep just hasn't run yet
+                previous = "expired"
+            if previous not in from_statuses:
+                raise ReservationError(f"Reservation is {previous}")
+
+            result = await session.exec(
+                update(Reservation)
+                .where(
+                    Reservation.id == reservation_id,
+                    Reservation.status == previous,
+                )
+                .values(status=to_status, expires_at=None)
+            )
+            if result.rowcount == 0:
+                # changed between the read and the update
+                await session.rollback()
+                raise ReservationError("Reservation was changed, try again")
+
+            # booked nights change in the same transaction as the status
+            try:
+                if to_status == "confirmed":
+                    await book_days(
+                        session,
+                        reservation_id,
+                        row.apartment_id,
+                        row.check_in,
+                        row.check_out,
+                    )
+                elif previous == "confirmed":
+                    await free_days(session, reservation_id)
+                await session.commit()
+            except IntegrityError:
+                # a night already taken by another confirmed stay
+                await session.rollback()
+                raise ReservationConflictError()
+            return previous
+
+        return await self._with_retry(session, apply)
+
+    async def confirm(self, session: AsyncSession, reservation_id: int) -> str:
+        return await self._transition(
+            session, reservation_id, ("pending",), "confirmed"
+        )
+
+    async def cancel(self, session: AsyncSession, reservation_id: int) -> str:
+        return await self._transition(
+            session, reservation_id, ACTIVE_STATUSES, "cancelled"
+        )
+
+    async def lock_apartment_for_removal(
+        self, session: AsyncSession, apartment_id: int
+    ) -> bool:
+        """
+        Locks the apartment against new bookings until the transaction ends
+        and expires its overdue pending reservations. Returns whether any
+        reservation still holds its dates (then it can't be removed).
+        """
+        await self._lock_apartment_row(session, apartment_id)
+        await self._expire_pending(session, datetime.utcnow(), apartment_id)
+        result = await session.exec(
+            select(Reservation.id)
+            .where(
+                Reservation.apartment_id == apartment_id,
+                Reservation.status.in_(ACTIVE_STATUSES),
+            )
+            .limit(1)
+        )
+        return result.first() is not None
+
+    async def expire_pending(self, session: AsyncSession) -> int:
+        """Expires every pending reservation past its deadline and commits."""
+
+        async def apply() -> int:
+            expired = await self._expire_pending(session, datetime.utcnow())
+            await session.commit()
+            return expired
+
+        return await self._with_retry(session, apply)
+
+
+# SINGLE shared service for whole app (the locks must be shared)
+reservation_service = ReservationService()
+
+
+class ReservationExpirer:
+    """
+    Periodically expires pending reservations the host didn't confirm in
+    time. Booking expires the ones of its apartment by itself, this keeps
+    the reservations table (and what guests and hosts see) current.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        service: ReservationService,
+        interval_seconds: float = RESERVATION_EXPIRY_INTERVAL_SECONDS,
+    ):
+        self._session_factory = session_factory
+        self._service = service
+        self._interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.expired_total = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                expired = await self.expire()
+                if expired:
+                    logger.info("Expired %s pending reservations", expired)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Reservation expiry failed")
+
+            await asyncio.sleep(self._interval_seconds)
+
+    async def expire(self) -> int:
+        async with self._session_factory() as session:
+            expired = await self._service.expire_pending(session)
+        self.expired_total += expired
+        return expired
+
+    def stats(self) -> dict:
+        return {"expired_total": self.expired_total}
+
+
+# SINGLE shared expirer for whole app
+reservation_expirer = ReservationExpirer(db.session_factory, reservation_service)
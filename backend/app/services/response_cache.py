@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+from fastapi import Request, Response
+
+from app.cache import TTLCache
+from app.env_loader import get_env
+from app.json_encoding import dumps
+
+# memory (per process) | redis (shared) | off
+RESPONSE_CACHE_BACKEND = get_env("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_TTL_SECONDS = int(get_env("RESPONSE_CACHE_TTL_SECONDS", "60"))
+RESPONSE_CACHE_SIZE = int(get_env("RESPONSE_CACHE_SIZE", "2048"))
+REDIS_URL = get_env("REDIS_URL", "redis://localhost:6379/0")
+# replication lag the app assumes (same setting as the read-your-writes pin):
+# replica reads are not cached while a dependency changed more recently
+REPLICA_LAG_SECONDS = float(get_env("DB_READ_YOUR_WRITES_SECONDS", "5"))
+
+# clients may keep a copy but have to revalidate it, which costs a 304
+CACHE_CONTROL = "public, no-cache"
+
+# bumped by every invalidation
+_CLOCK = "*"
+
+
+class MemoryCacheBackend:
+    """Per process cache. Dependency versions are plain counters in a dict."""
+
+    def __init__(self, maxsize: int, ttl: int):
+        self._entries: TTLCache[str, bytes] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions: Dict[str, int] = {}
+        self._bumped_at: Dict[str, float] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        self._entries.set(key, value)
+
+    async def versions(self, deps: list[str]) -> list[int]:
+        return [self._versions.get(dep, 0) for dep in deps]
+
+    async def bump(self, deps: list[str]) -> None:
+        now = time.time()
+        for dep in deps:
+            self._versions[dep] = self._versions.get(dep, 0) + 1
+            self._bumped_at[dep] = now
+
+    async def last_bumped(self, deps: list[str]) -> float:
+        return max((self._bumped_at.get(dep, 0.0) for dep in deps), default=0.0)
+
+
+class RedisCacheBackend:
+    """Cache shared by all app processes, needs the `redis` package."""
+
+    def __init__(self, url: str, ttl: int, prefix: str = "rc:"):
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis requires redis")
+
+        self._redis = redis.from_url(url)
+        self._ttl = ttl
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(f"{self._prefix}e:{key}")
+
+    async def set(self, key: str, value: bytes) -> None:
+        await self._redis.set(f"{self._prefix}e:{key}", value, ex=self._ttl)
+
+    async def versions(self, deps: list[str]) -> list[int]:
+        if not deps:
+            return []
+        values = await self._redis.mget([f"{self._prefix}v:{dep}" for dep in deps])
+        return [int(v) if v is not None else 0 for v in values]
+
+    async def bump(self, deps: list[str]) -> None:
+        now = time.time()
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for dep in deps:
+                pipe.incr(f"{self._prefix}v:{dep}")
+                pipe.set(f"{self._prefix}t:{dep}", now)
+            await pipe.execute()
+
+    async def last_bumped(self, deps: list[str]) -> float:
+        if not deps:
+            return 0.0
+        values = await self._redis.mget([f"{self._prefix}t:{dep}" for dep in deps])
+        return max((float(v) for v in values if v is not None), default=0.0)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return etag in tags or "*" in tags
+
+
+class ResponseCache:
+    """
+    Caches rendered JSON bodies of public GET endpoints.
+
+    Every entry lists the dependencies it was built from ("apartments",
+    "apartment:12", "tag:3", ...) together with their version at build time.
+    Writes call `invalidate` with the dependencies they touch, which bumps
+    those versions, so exactly the affected entries stop validating. This
+    works the same with the per process and the shared backend.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def make_key(namespace: str, *parts: Hashable) -> str:
+        raw = json.dumps([namespace, *parts], default=str, separators=(",", ":"))
+        return f"{namespace}:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+    @staticmethod
+    def _response(request: Request, body: bytes, etag: str) -> Response:
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+    async def get(self, request: Request, key: str) -> Optional[Response]:
+        if self.backend is None:
+            return None
+
+        raw = await self.backend.get(key)
+        if raw is not None:
+            # "<header json>\n<body>", the body is stored as sent
+            header, body = raw.split(b"\n", 1)
+            entry = json.loads(header)
+            deps = list(entry["deps"])
+            if await self.backend.versions(deps) == [entry["deps"][d] for d in deps]:
+                self._hits += 1
+                return self._response(request, body, entry["etag"])
+
+        self._misses += 1
+        # remember the write clock, `store` only caches if no write happened since
+        request.state.response_cache_clock = (await self.backend.versions([_CLOCK]))[0]
+        return None
+
+    async def store(
+        self,
+        request: Request,
+        key: str,
+        content: Any,
+        deps: Iterable[str],
+    ) -> Response:
+        """
+        Encodes `content` (plain dicts/lists, see app.json_encoding), caches it
+        under `key` and answers the request (304 if the client already has
+        this exact body).
+        """
+        body = dumps(content)
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+        if self.backend is not None:
+            deps = sorted(set(deps))
+            *versions, clock = await self.backend.versions(deps + [_CLOCK])
+
+            # a write that landed while the body was built may not be in it,
+            # and a replica may not have replayed a recent write yet
+            unchanged = clock == getattr(request.state, "response_cache_clock", None)
+            if unchanged and not await self._maybe_stale(request, deps):
+                header = json.dumps({"etag": etag, "deps": dict(zip(deps, versions))})
+                await self.backend.set(key, header.encode() + b"\n" + body)
+
+        return self._response(request, body, etag)
+
+    async def _maybe_stale(self, request: Request, deps: list[str]) -> bool:
+        if not getattr(request.state, "read_from_replica", False):
+            return False
+        return time.time() - await self.backend.last_bumped(deps) < REPLICA_LAG_SECONDS
+
+    async def invalidate(self, *deps: str) -> None:
+        if self.backend is not None and deps:
+            await self.backend.bump([*deps, _CLOCK])
+
+    def stats(self) -> dict:
+        return {
+            "backend": RESPONSE_CACHE_BACKEND,
+            "hits": self._hits,
+            "misses": self._misses,
+        }
+
+
+def create_response_cache() -> ResponseCache:
+    if RESPONSE_CACHE_BACKEND == "off":
+        return ResponseCache(None)
+    if RESPONSE_CACHE_BACKEND == "redis":
+        return ResponseCache(RedisCacheBackend(REDIS_URL, RESPONSE_CACHE_TTL_SECONDS))
+    if RESPONSE_CACHE_BACKEND == "memory":
+        return ResponseCache(
+            MemoryCacheBackend(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS)
+        )
+    raise RuntimeError(f"Unknown RESPONSE_CACHE_BACKEND: {RESPONSE_CACHE_BACKEND}")
+
+
+# SINGLE shared cache for whole app
+response_cache = create_response_cache()
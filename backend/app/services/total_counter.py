@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import json
+from typing import Hashable, Literal, Optional, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import CompileError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.cache import TTLCache
+from app.env_loader import get_env
+
+TotalMode = Literal["exact", "estimated", "capped", "none"]
+
+TOTAL_COUNT_CAP = int(get_env("TOTAL_COUNT_CAP", "1000"))
+TOTAL_COUNT_CACHE_TTL_SECONDS = float(get_env("TOTAL_COUNT_CACHE_TTL_SECONDS", "30"))
+TOTAL_COUNT_CACHE_SIZE = int(get_env("TOTAL_COUNT_CACHE_SIZE", "1024"))
+
+# compiles the EXPLAINed listing query with :name parameters
+_EXPLAIN_DIALECT = postgresql.dialect(paramstyle="named")
+
+# exact counts per normalized filter combination, hot combinations stay cached
+_exact_counts: TTLCache[Hashable, int] = TTLCache(
+    maxsize=TOTAL_COUNT_CACHE_SIZE, ttl=TOTAL_COUNT_CACHE_TTL_SECONDS
+)
+
+
+def clear_total_cache() -> None:
+    _exact_counts.clear()
+
+
+async def _exact_count(session: AsyncSession, query) -> int:
+    count_query = select(func.count()).select_from(query.subquery())
+    return (await session.exec(count_query)).one()
+
+
+async def _capped_count(session: AsyncSession, query, cap: int) -> Tuple[int, bool]:
+    # counting at most cap + 1 rows lets the database stop early
+    count_query = select(func.count()).select_from(query.limit(cap + 1).subquery())
+    n = (await session.exec(count_query)).one()
+    if n > cap:
+        return cap, False
+    return n, True
+
+
+async def _estimated_count(session: AsyncSession, query) -> Optional[int]:
+    """
+    Row estimate from the Postgres planner, None on backends without one (or
+    when the query can't be turned into an EXPLAIN).
+    """
+    bind = session.get_bind()
+    if bind.dialect.name != "postgresql":
+        return None
+
+    # named parameters so the statement can be re-bound through text(), the
+    # values stay bound instead of being rendered as SQL literals
+    try:
+        compiled = query.compile(
+            dialect=_EXPLAIN_DIALECT, compile_kwargs={"render_postcompile": True}
+        )
+    except CompileError:
+        return None
+    explain = text(f"EXPLAIN (FORMAT JSON) {compiled}").bindparams(
+        **compiled.params
+    )
+    conn = await session.connection()
+    result = await conn.execute(explain)
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def count_total(
+    session: AsyncSession,
+    query,
+    mode: TotalMode,
+    cache_key: Hashable,
+) -> Tuple[Optional[int], bool]:
+    """
+    Returns (total, is_exact) for an unpaged listing query.
+
+    - exact: COUNT(*), cached per `cache_key` for a short TTL
+    - estimated: planner estimate, falls back to a capped count without a planner
+    - capped: exact up to TOTAL_COUNT_CAP, otherwise the cap ("1000+")
+    - none: no count at all
+    """
+    if mode == "none":
+        return None, False
+
+    if mode == "capped":
+        return await _capped_count(session, query, TOTAL_COUNT_CAP)
+
+    if mode == "estimated":
+        estimate = await _estimated_count(session, query)
+        if estimate is not None:
+            return estimate, False
+        return await _capped_count(session, query, TOTAL_COUNT_CAP)
+
+    cached = _exact_counts.get(cache_key)
+    if cached is not None:
+        return cached, True
+
+    total = await _exact_count(session, query)
+    _exact_counts.set(cache_key, total)
+    return total, True
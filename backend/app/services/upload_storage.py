@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Iterable
+
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.env_loader import get_env
+
+UPLOAD_MAX_FILE_BYTES = int(get_env("UPLOAD_MAX_FILE_BYTES", str(15 * 1024 * 1024)))
+UPLOAD_MAX_REQUEST_BYTES = int(
+    get_env("UPLOAD_MAX_REQUEST_BYTES", str(100 * 1024 * 1024))
+)
+UPLOAD_MAX_CONCURRENT_PER_HOST = int(get_env("UPLOAD_MAX_CONCURRENT_PER_HOST", "2"))
+# uploads and their variants are prepared here before they go to photo storage
+UPLOAD_STAGING_DIR = Path(get_env("UPLOAD_STAGING_DIR", "tmp/uploads"))
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadLimiter:
+    """
+    Caps how many uploads one key (host id, client address) runs at once.
+    Extra uploads are rejected with 429 instead of queueing, so one host
+    sending many large batches can't hog the disk and image workers.
+    """
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self._active: Dict[Hashable, int] = {}
+
+    def try_acquire(self, key: Hashable) -> bool:
+        if self._active.get(key, 0) >= self.max_concurrent:
+            return False
+        self._active[key] = self._active.get(key, 0) + 1
+        return True
+
+    def release(self, key: Hashable) -> None:
+        self._active[key] -= 1
+        if not self._active[key]:
+            del self._active[key]
+
+
+# SINGLE shared limiter for whole app
+upload_limiter = UploadLimiter(UPLOAD_MAX_CONCURRENT_PER_HOST)
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware for the upload routes. FastAPI parses (and buffers) the
+    whole multipart body before any dependency runs, so the request size cap
+    and the per-host slot have to be enforced here, ahead of the parsing:
+
+    - a Content-Length over `max_request_bytes` is rejected with 413 before
+      a byte of the body is read
+    - the body is counted as it arrives, crossing the cap aborts with 413
+      (chunked uploads and lying Content-Lengths included)
+    - no free slot for `key(scope)` is rejected with 429
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        routes: Iterable[str],
+        key: Callable[[Scope], Hashable],
+        limiter: UploadLimiter = upload_limiter,
+        max_request_bytes: int = UPLOAD_MAX_REQUEST_BYTES,
+    ):
+        self.app = app
+        # path regexes, matched against POST requests only
+        self._routes = [re.compile(route) for route in routes]
+        self._key = key
+        self._limiter = limiter
+        self._max_request_bytes = max_request_bytes
+
+    def _is_upload(self, scope: Scope) -> bool:
+        return (
+            scope["type"] == "http"
+            and scope["method"] == "POST"
+            and any(route.fullmatch(scope["path"]) for route in self._routes)
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self._is_upload(scope):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length and content_length.isdigit():
+            if int(content_length) > self._max_request_bytes:
+                await _too_large(scope, receive, send)
+                return
+
+        key = self._key(scope)
+        if not self._limiter.try_acquire(key):
+            response = JSONResponse(
+                {"detail": "Too many uploads in progress, try again shortly"},
+                status_code=429,
+                headers={"Retry-After": "5"},
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def counting_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self._max_request_bytes:
+                    # FastAPI re-raises HTTPExceptions from body parsing
+                    raise HTTPException(status_code=413, detail="Upload is too large")
+            return message
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal response_started
+            response_started = response_started or (
+                message["type"] == "http.response.start"
+            )
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, tracking_send)
+        except HTTPException as e:
+            if e.status_code != 413 or response_started:
+                raise
+            await _too_large(scope, receive, send)
+        finally:
+            self._limiter.release(key)
+
+
+async def _too_large(scope: Scope, receive: Receive, send: Send) -> None:
+    response = JSONResponse({"detail": "Upload is too large"}, status_code=413)
+    await response(scope, receive, send)
+
+
+def _open_temp(directory: Path):
+    return tempfile.NamedTemporaryFile(
+        dir=directory, prefix=".upload-", suffix=".part", delete=False
+    )
+
+
+def _discard(buffer) -> None:
+    buffer.close()
+    Path(buffer.name).unlink(missing_ok=True)
+
+
+def _finish(buffer, target: Path) -> None:
+    buffer.flush()
+    os.fsync(buffer.fileno())
+    buffer.close()
+    # same directory, so the rename is atomic: readers never see a partial file
+    os.replace(buffer.name, target)
+
+
+async def save_upload(
+    file: UploadFile, target: Path, max_bytes: int = UPLOAD_MAX_FILE_BYTES
+) -> int:
+    """
+    Streams `file` into `target` without blocking the event loop, returns the
+    size in bytes. Data goes to a temp file next to `target` which is renamed
+    into place once complete; going over `max_bytes` aborts with 413.
+    """
+    buffer = await asyncio.to_thread(_open_temp, target.parent)
+    size = 0
+    try:
+        while chunk := await file.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File is too large: {file.filename}",
+                )
+            await asyncio.to_thread(buffer.write, chunk)
+
+        await asyncio.to_thread(_finish, buffer, target)
+    except BaseException:
+        await asyncio.to_thread(_discard, buffer)
+        raise
+    finally:
+        await file.close()
+
+    return size
+
+
+def _remove_files(paths: list[Path]) -> None:
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+async def remove_files(paths: Iterable[Path]) -> None:
+    """Deletes files on a worker thread, missing files are ignored."""
+    await asyncio.to_thread(_remove_files, list(paths))
+
+
+def _create_staging_dir() -> Path:
+    UPLOAD_STAGING_DIR.mkdir(parents=True, exist_ok=True)
+    return Path(tempfile.mkdtemp(dir=UPLOAD_STAGING_DIR))
+
+
+async def create_staging_dir() -> Path:
+    """Private scratch directory for one upload request."""
+    return await asyncio.to_thread(_create_staging_dir)
+
+
+async def remove_staging_dir(path: Path) -> None:
+    await asyncio.to_thread(shutil.rmtree, path, ignore_errors=True)
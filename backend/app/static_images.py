@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import mimetypes
+import os
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import Response, StreamingResponse
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from app.cache import BytesLRUCache, TTLCache
+from app.env_loader import get_env
+
+# 0 turns the in-memory cache off
+STATIC_IMAGE_CACHE_MB = int(get_env("STATIC_IMAGE_CACHE_MB", "32"))
+STATIC_IMAGE_CACHE_MAX_FILE_KB = int(get_env("STATIC_IMAGE_CACHE_MAX_FILE_KB", "256"))
+
+# content hashed URLs never change, everything else is revalidated after an hour
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+# precompressed siblings ("logo.svg.br") served when the client accepts them
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+CHUNK_SIZE = 64 * 1024
+
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("image/avif", ".avif")
+
+
+def _is_content_hashed(path: str) -> bool:
+    # blobs/<hh>/<sha256>.<ext>, see app.services.photo_storage.blob_key
+    parts = Path(path).parts
+    stem = Path(path).name.split(".")[0]
+    return len(parts) >= 2 and parts[-2] == stem[:2] and len(stem) == 64
+
+
+def _accepted_encodings(headers: Headers) -> set[str]:
+    accepted = set()
+    for item in headers.get("accept-encoding", "").split(","):
+        name, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00"):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # weak comparison, as If-None-Match requires
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return etag in tags
+
+
+def _parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Single "bytes=" range as inclusive (start, end). None means serve the
+    whole file (multiple or malformed ranges), (-1, -1) is unsatisfiable.
+    """
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+
+    try:
+        if first == "":
+            # suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                return -1, -1
+            return max(size - length, 0), size - 1
+
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if start > end:
+        return None
+    if start >= size:
+        return -1, -1
+    return start, min(end, size - 1)
+
+
+def _read_range(path: str, start: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(length)
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageFiles(StaticFiles):
+    """
+    StaticFiles for apartment photos with caching headers that let browsers
+    and CDNs skip revalidation:
+
+    - content hashed blob URLs are `immutable` for a year, their ETag is the hash
+    - other files get a strong ETag from their sha256 and a short max-age
+    - If-None-Match / If-Modified-Since answer 304, Range answers 206
+    - small hot files are kept in a bounded in-memory LRU
+    """
+
+    def __init__(
+        self,
+        *,
+        directory: str,
+        cache_max_bytes: int = STATIC_IMAGE_CACHE_MB * 1024 * 1024,
+        cache_max_file_bytes: int = STATIC_IMAGE_CACHE_MAX_FILE_KB * 1024,
+        check_dir: bool = True,
+    ):
+        super().__init__(directory=directory, check_dir=check_dir)
+        self.cache_max_file_bytes = cache_max_file_bytes
+        self._cache: Optional[BytesLRUCache] = (
+            BytesLRUCache(cache_max_bytes) if cache_max_bytes > 0 else None
+        )
+        # sha256 of files without a hash in their name, per (path, mtime, size)
+        self._etags: TTLCache[tuple, str] = TTLCache(maxsize=4096, ttl=3600)
+        self._hits = 0
+        self._misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._cache is not None,
+            "entries": len(self._cache) if self._cache else 0,
+            "bytes": self._cache.total_bytes if self._cache else 0,
+            "max_bytes": self._cache.max_bytes if self._cache else 0,
+            "hits": self._hits,
+            "misses": self._misses,
+        }
+
+    def _lookup(self, path: str) -> Tuple[str, Optional[os.stat_result]]:
+        full_path, stat_result = self.lookup_path(path)
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            return full_path, None
+        return full_path, stat_result
+
+    async def _select_representation(
+        self, path: str, headers: Headers
+    ) -> Tuple[str, os.stat_result, Optional[str]]:
+        accepted = _accepted_encodings(headers)
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding in accepted:
+                full_path, stat_result = await asyncio.to_thread(
+                    self._lookup, path + suffix
+                )
+                if stat_result is not None:
+                    return full_path, stat_result, encoding
+
+        full_path, stat_result = await asyncio.to_thread(self._lookup, path)
+        if stat_result is None:
+            raise HTTPException(status_code=404)
+        return full_path, stat_result, None
+
+    async def _etag(
+        self, path: str, full_path: str, stat_result, encoding: Optional[str]
+    ) -> str:
+        if _is_content_hashed(path):
+            tag = Path(path).name.split(".")[0]
+        else:
+            key = (full_path, stat_result.st_mtime_ns, stat_result.st_size)
+            tag = self._etags.get(key)
+            if tag is None:
+                tag = await asyncio.to_thread(_sha256_file, full_path)
+                self._etags.set(key, tag)
+
+        # each encoding is a different representation, it needs its own tag
+        return f'"{tag}-{encoding}"' if encoding else f'"{tag}"'
+
+    async def _body(self, full_path: str, stat_result, start: int, length: int):
+        size = stat_result.st_size
+        if self._cache is None or size > self.cache_max_file_bytes:
+            return None
+
+        key = (full_path, stat_result.st_mtime_ns, size)
+        data = self._cache.get(key)
+        if data is None:
+            self._misses += 1
+            data = await asyncio.to_thread(_read_range, full_path, 0, size)
+            self._cache.set(key, data)
+        else:
+            self._hits += 1
+        return data[start : start + length]
+
+    async def _stream(self, full_path: str, start: int, length: int):
+        f = await asyncio.to_thread(open, full_path, "rb")
+        try:
+            await asyncio.to_thread(f.seek, start)
+            remaining = length
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+
+    def _not_modified(self, headers: Headers, etag: str, stat_result) -> bool:
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            return _etag_matches(if_none_match, etag)
+
+        if_modified_since = headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(stat_result.st_mtime) <= since
+        return False
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+
+        request_headers = Headers(scope=scope)
+        full_path, stat_result, encoding = await self._select_representation(
+            path, request_headers
+        )
+        etag = await self._etag(path, full_path, stat_result, encoding)
+
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "Cache-Control": (
+                IMMUTABLE_CACHE_CONTROL
+                if _is_content_hashed(path)
+                else DEFAULT_CACHE_CONTROL
+            ),
+            "Accept-Ranges": "bytes",
+            "Vary": "Accept-Encoding",
+        }
+        if encoding:
+            headers["Content-Encoding"] = encoding
+
+        if self._not_modified(request_headers, etag, stat_result):
+            return Response(status_code=304, headers=headers)
+
+        size = stat_result.st_size
+        start, end, status_code = 0, size - 1, 200
+
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header and (if_range is None or if_range == etag):
+            byte_range = _parse_range(range_header, size)
+            if byte_range == (-1, -1):
+                return Response(
+                    status_code=416,
+                    headers={**headers, "Content-Range": f"bytes */{size}"},
+                )
+            if byte_range is not None:
+                start, end = byte_range
+                status_code = 206
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+        length = end - start + 1
+        headers["Content-Length"] = str(length)
+
+        if scope["method"] == "HEAD":
+            return Response(
+                status_code=status_code, headers=headers, media_type=media_type
+            )
+
+        body = await self._body(full_path, stat_result, start, length)
+        if body is not None:
+            return Response(
+                body, status_code=status_code, headers=headers, media_type=media_type
+            )
+
+        return StreamingResponse(
+            self._stream(full_path, start, length),
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+        )
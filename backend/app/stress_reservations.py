@@ -0,0 +1,143 @@
+"""
+Concurrency check of the reservation service: many parallel bookings of
+overlapping dates for one apartment, exactly one of them may succeed.
+
+    python -m app.stress_reservations [--bookings 50] [--rounds 5]
+
+Runs against DATABASE_URL with a throwaway host, guest and apartment that
+are deleted afterwards. Exits with status 1 if any round double-books.
+"""
+
+import argparse
+import asyncio
+import sys
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+from sqlalchemy import delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.env_loader import load_env
+
+load_env()
+
+from app.db import db  # noqa: E402
+import app.models  # noqa: E402,F401
+from app.enums.role_enum import Role  # noqa: E402
+from app.models.apartment import Apartment  # noqa: E402
+from app.models.reservation import Reservation  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services.reservations import (  # noqa: E402
+    ReservationBusyError,
+    ReservationConflictError,
+    reservation_service,
+)
+
+
+async def create_fixtures(session: AsyncSession) -> tuple[User, User, Apartment]:
+    suffix = uuid4().hex[:12]
+    host = User(
+        role=Role.HOST,
+        name="stress host",
+        email=f"host-{suffix}@stress.test",
+        password="-",
+    )
+    guest = User(
+        role=Role.USER,
+        name="stress guest",
+        email=f"guest-{suffix}@stress.test",
+        password="-",
+    )
+    session.add_all([host, guest])
+    await session.flush()
+
+    apartment = Apartment(
+        user_id=host.id,
+        title="Stress test apartment",
+        description="",
+        address="-",
+        city="-",
+        country="-",
+        price_per_night=Decimal("50.00"),
+        max_guests=4,
+        status="active",
+    )
+    session.add(apartment)
+    await session.commit()
+    return host, guest, apartment
+
+
+async def book(
+    apartment: Apartment, guest_id: int, check_in: date, check_out: date
+) -> str:
+    async with db.session_factory() as session:
+        try:
+            await reservation_service.create(
+                session, apartment, guest_id, check_in, check_out, guests_count=2
+            )
+            return "booked"
+        except ReservationConflictError:
+            return "conflict"
+        except ReservationBusyError:
+            return "busy"
+
+
+async def run_round(
+    apartment: Apartment, guest_id: int, bookings: int, start: date
+) -> Counter:
+    # half ask for the same three nights, the other half overlap them partly
+    ranges = [
+        (
+            (start, start + timedelta(days=3))
+            if i % 2 == 0
+            else (start + timedelta(days=2), start + timedelta(days=5))
+        )
+        for i in range(bookings)
+    ]
+    results = await asyncio.gather(
+        *(
+            book(apartment, guest_id, check_in, check_out)
+            for check_in, check_out in ranges
+        )
+    )
+    return Counter(results)
+
+
+async def main(bookings: int, rounds: int) -> bool:
+    async with db.session_factory() as session:
+        host, guest, apartment = await create_fixtures(session)
+
+    ok = True
+    try:
+        for i in range(rounds):
+            # every round books a fresh week far enough in the future
+            start = date.today() + timedelta(days=30 + i * 7)
+            counts = await run_round(apartment, guest.id, bookings, start)
+            ok = ok and counts["booked"] == 1
+            print(
+                f"round {i + 1}: {counts['booked']} booked, "
+                f"{counts['conflict']} conflicts, {counts['busy']} gave up"
+                + ("" if counts["booked"] == 1 else "  <- expected exactly 1")
+            )
+    finally:
+        async with db.session_factory() as session:
+            await session.exec(
+                delete(Reservation).where(Reservation.apartment_id == apartment.id)
+            )
+            await session.exec(delete(Apartment).where(Apartment.id == apartment.id))
+            await session.exec(delete(User).where(User.id.in_([host.id, guest.id])))
+            await session.commit()
+        await db.dispose()
+
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bookings", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    if not asyncio.run(main(args.bookings, args.rounds)):
+        sys.exit(1)
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Dict, List, Optional
+
+from sqlmodel import select
+
+from app.db import db
+from app.env_loader import get_env
+from app.models.tag import Tag
+
+# other app processes refresh on their own writes only, this bounds how long
+# they can serve a catalogue that another process already changed
+TAG_CATALOGUE_MAX_AGE_SECONDS = float(get_env("TAG_CATALOGUE_MAX_AGE_SECONDS", "60"))
+
+
+class TagCatalogue:
+    """
+    All tags kept in memory (there are few of them and they rarely change).
+
+    `version` is a hash of the content, so every process holding the same
+    tags has the same version and ETag. The JSON body of GET /tags is
+    rendered once per version.
+    """
+
+    def __init__(self, session_factory, max_age: float = TAG_CATALOGUE_MAX_AGE_SECONDS):
+        self._session_factory = session_factory
+        self._max_age = max_age
+        self._lock = asyncio.Lock()
+
+        self._tags: Dict[int, dict] = {}
+        self._loaded_at = 0.0
+        self.version = ""
+        self.body = b"[]"
+
+    @property
+    def etag(self) -> str:
+        return f'"tags-{self.version}"'
+
+    def _is_stale(self) -> bool:
+        return time.monotonic() - self._loaded_at > self._max_age
+
+    async def refresh(self, only_if_stale: bool = False) -> None:
+        async with self._lock:
+            # callers that queued behind a reload find the catalogue fresh
+            if only_if_stale and not self._is_stale():
+                return
+
+            async with self._session_factory() as session:
+                tags = (await session.exec(select(Tag).order_by(Tag.name))).all()
+
+            items = [
+                {
+                    "id": t.id,
+                    "name": t.name,
+                    "icon_key": t.icon_key,
+                    "svg_icon": t.svg_icon,
+                }
+                for t in tags
+            ]
+            body = json.dumps(items, ensure_ascii=False, separators=(",", ":"))
+
+            self._tags = {item["id"]: item for item in items}
+            self.body = body.encode()
+            self.version = hashlib.sha256(self.body).hexdigest()[:16]
+            self._loaded_at = time.monotonic()
+
+    async def ensure_fresh(self) -> None:
+        if self._is_stale():
+            await self.refresh(only_if_stale=True)
+
+    async def all(self) -> List[dict]:
+        await self.ensure_fresh()
+        return list(self._tags.values())
+
+    async def get(self, tag_id: int) -> Optional[dict]:
+        await self.ensure_fresh()
+        return self._tags.get(tag_id)
+
+
+# SINGLE shared catalogue for whole app
+tag_catalogue = TagCatalogue(db.session_factory)
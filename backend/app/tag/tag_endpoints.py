@@ -2,17 +2,18 @@ from __future__ import annotations
 
 from typing import Annotated, Optional, List
 
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel, Field
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.db import db
 from app.auth.authorization import Policy
-from app.auth.current_user import get_current_user
+from app.auth.current_user import Principal, get_current_principal
 from app.enums.role_enum import Role
-from app.models.user import User
 from app.models.tag import Tag
+from app.services.response_cache import CACHE_CONTROL, etag_matches, response_cache
+from app.tag.tag_catalogue import tag_catalogue
 
 
 router = APIRouter(prefix="/tags", tags=["tags"])
@@ -92,18 +93,23 @@ async def _ensure_unique_on_update(
 
 # Endpoints
 @router.get("", response_model=List[TagDto])
-async def list_tags(session: SessionDep):
-    result = await session.exec(select(Tag).order_by(Tag.name))
-    tags = result.all()
-    return [map_tag_to_dto(t) for t in tags]
+async def list_tags(request: Request):
+    # served from memory, body and ETag only change when the tags do
+    await tag_catalogue.ensure_fresh()
+
+    headers = {"ETag": tag_catalogue.etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request, tag_catalogue.etag):
+        return Response(status_code=304, headers=headers)
+
+    return Response(tag_catalogue.body, media_type="application/json", headers=headers)
 
 
 @router.get("/{tag_id}", response_model=TagDto)
-async def get_tag_by_id(tag_id: int, session: SessionDep):
-    tag = (await session.exec(select(Tag).where(Tag.id == tag_id))).first()
+async def get_tag_by_id(tag_id: int):
+    tag = await tag_catalogue.get(tag_id)
     if not tag:
         raise HTTPException(status_code=404, detail="Tag not found")
-    return map_tag_to_dto(tag)
+    return TagDto(**tag)
 
 
 @router.post("", status_code=201, response_model=TagDto)
@@ -111,7 +117,7 @@ async def create_tag(
     response: Response,
     session: SessionDep,
     request_body: TagCreateRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     allowed: bool = Depends(Policy({Role.ADMIN}).check_access),
 ):
     await _ensure_unique_on_create(session, request_body.name, request_body.icon_key)
@@ -125,6 +131,7 @@ async def create_tag(
     session.add(tag)
     await session.commit()
     await session.refresh(tag)
+    await tag_catalogue.refresh()
 
     response.headers["Location"] = f"/tags/{tag.id}"
 
@@ -136,7 +143,7 @@ async def update_tag(
     tag_id: int,
     session: SessionDep,
     request_body: TagUpdateRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     allowed: bool = Depends(Policy({Role.ADMIN}).check_access),
 ):
     tag = (await session.exec(select(Tag).where(Tag.id == tag_id))).first()
@@ -154,6 +161,9 @@ async def update_tag(
     session.add(tag)
     await session.commit()
     await session.refresh(tag)
+    await tag_catalogue.refresh()
+    # detail pages embed the tag
+    await response_cache.invalidate(f"tag:{tag_id}")
     return map_tag_to_dto(tag)
 
 
@@ -162,7 +172,7 @@ async def patch_tag(
     tag_id: int,
     session: SessionDep,
     request_body: TagPatchRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     allowed: bool = Depends(Policy({Role.ADMIN}).check_access),
 ):
     tag = (await session.exec(select(Tag).where(Tag.id == tag_id))).first()
@@ -185,6 +195,9 @@ async def patch_tag(
     session.add(tag)
     await session.commit()
     await session.refresh(tag)
+    await tag_catalogue.refresh()
+    # detail pages embed the tag
+    await response_cache.invalidate(f"tag:{tag_id}")
     return map_tag_to_dto(tag)
 
 
@@ -192,7 +205,7 @@ async def patch_tag(
 async def delete_tag(
     tag_id: int,
     session: SessionDep,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     allowed: bool = Depends(Policy({Role.ADMIN}).check_access),
 ):
     tag = (await session.exec(select(Tag).where(Tag.id == tag_id))).first()
@@ -201,4 +214,6 @@ async def delete_tag(
 
     await session.delete(tag)
     await session.commit()
+    await tag_catalogue.refresh()
+    await response_cache.invalidate(f"tag:{tag_id}")
     return None
@@ -0,0 +1,69 @@
+import atexit
+import os
+import shutil
+import tempfile
+from uuid import uuid4
+
+# the app reads its settings when it is imported: point it at a throwaway
+# sqlite database, and run from a scratch directory because it creates its
+# static/ and tmp/ folders relative to the working directory
+_WORK_DIR = tempfile.mkdtemp(prefix="booking-tests-")
+os.chdir(_WORK_DIR)
+atexit.register(shutil.rmtree, _WORK_DIR, ignore_errors=True)
+os.environ.update(
+    DATABASE_URL=f"sqlite+aiosqlite:///{_WORK_DIR}/test.sqlite",
+    JWT_SECRET="test-secret-0123456789-0123456789-0123456789",
+    JWT_ALG="HS256",
+    ACCESS_TTL_MIN="60",
+    REFRESH_TTL_DAYS="14",
+    REFRESH_COOKIE_NAME="refresh_token",
+    REFRESH_COOKIE_PATH="/auth",
+    COOKIE_SECURE="false",
+    COOKIE_SAMESITE="lax",
+    REFRESH_HASH_PEPPER="test-pepper",
+    SESSION_STORE="db",
+    # geocoding jobs of created apartments fail fast instead of going online
+    NOMINATIM_SEARCH_URL="http://127.0.0.1:9/search",
+)
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.database_connection import DatabaseConnection  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def client():
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+async def database():
+    # own engine per test, the app's engine belongs to the TestClient's loop
+    database = DatabaseConnection(os.environ["DATABASE_URL"])
+    await database.create_tables()
+    yield database
+    await database.dispose()
+
+
+def register(client: TestClient, role: str = "USER") -> dict:
+    """Registers a new user, returns the Authorization header for it."""
+    r = client.post(
+        "/auth/register",
+        json={
+            "name": "test",
+            "email": f"{role.lower()}-{uuid4().hex[:12]}@example.com",
+            "password": "pw",
+            "role": role,
+        },
+    )
+    assert r.status_code == 201, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+
+import pytest
+
+from app.database_connection import DatabaseConnection
+from app.db import db
+from conftest import register
+
+
+def create_apartment(client, host, title: str) -> int:
+    r = client.post(
+        "/apartments",
+        headers=host,
+        json={
+            "title": title,
+            "description": "",
+            "address": "Street 1",
+            "city": "Beograd",
+            "country": "Srbija",
+            "price_per_night": 50,
+            "max_guests": 2,
+        },
+    )
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+
+@pytest.fixture
+def replica(client, tmp_path, monkeypatch):
+    """
+    A second sqlite file as the app's only read replica, set up like
+    DATABASE_REPLICA_URLS would. It is a snapshot of the primary taken now,
+    so it plays a replica that hasn't replayed the writes made after it.
+    """
+    primary_path = os.environ["DATABASE_URL"].split("///", 1)[1]
+    replica_path = tmp_path / "replica.sqlite"
+    with sqlite3.connect(primary_path) as source, sqlite3.connect(
+        replica_path
+    ) as target:
+        source.backup(target)
+
+    replica_url = f"sqlite+aiosqlite:///{replica_path}"
+    monkeypatch.setenv("DATABASE_REPLICA_URLS", replica_url)
+    connection = DatabaseConnection(
+        os.environ["DATABASE_URL"],
+        replica_urls=os.environ["DATABASE_REPLICA_URLS"].split(","),
+    )
+    for name in (
+        "replica_engines",
+        "replica_stats",
+        "_replica_session_factories",
+        "_next_replica",
+    ):
+        monkeypatch.setattr(db, name, getattr(connection, name))
+
+    yield
+    client.cookies.delete(DatabaseConnection.STICKY_COOKIE_NAME)
+    # the engines were used on the TestClient's event loop
+    client.portal.call(connection.dispose)
+
+
+def test_gets_read_the_replica_until_the_client_writes(client, replica):
+    host = register(client, "HOST")
+    client.cookies.delete(DatabaseConnection.STICKY_COOKIE_NAME)
+
+    # written to the primary only, the replica hasn't seen it
+    apartment_id = create_apartment(client, host, "Only on the primary")
+    assert DatabaseConnection.STICKY_COOKIE_NAME in client.cookies
+
+    # a GET without the sticky cookie is served by the replica
+    client.cookies.delete(DatabaseConnection.STICKY_COOKIE_NAME)
+    assert client.get(f"/apartments/{apartment_id}").status_code == 404
+
+    # right after a write the same client reads from the primary
+    apartment_id = create_apartment(client, host, "Read your writes")
+    r = client.get(f"/apartments/{apartment_id}")
+    assert r.status_code == 200
+    assert r.json()["title"] == "Read your writes"
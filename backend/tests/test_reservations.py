@@ -0,0 +1,198 @@
+import asyncio
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+
+from app.enums.role_enum import Role
+from app.models.apartment import Apartment
+from app.models.user import User
+from app.services.reservations import (
+    ReservationConflictError,
+    ReservationService,
+    reservation_service,
+)
+from conftest import register
+
+
+@pytest.fixture
+def host(client):
+    return register(client, "HOST")
+
+
+@pytest.fixture
+def guest(client):
+    return register(client, "USER")
+
+
+@pytest.fixture
+def apartment_id(client, host):
+    r = client.post(
+        "/apartments",
+        headers=host,
+        json={
+            "title": "Test flat",
+            "description": "",
+            "address": "Street 1",
+            "city": "Beograd",
+            "country": "Srbija",
+            "price_per_night": 50,
+            "max_guests": 4,
+        },
+    )
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+
+def stay(nights_from_now: int, nights: int) -> tuple[date, date]:
+    check_in = date.today() + timedelta(days=nights_from_now)
+    return check_in, check_in + timedelta(days=nights)
+
+
+def book(client, guest, apartment_id, check_in, check_out):
+    return client.post(
+        "/reservations",
+        headers=guest,
+        json={
+            "apartment_id": apartment_id,
+            "check_in": check_in.isoformat(),
+            "check_out": check_out.isoformat(),
+            "guests_count": 2,
+        },
+    )
+
+
+def booked_days(client, apartment_id, check_in, check_out) -> int:
+    r = client.get(
+        "/apartments/availability",
+        params={
+            "apartment_ids": apartment_id,
+            "start": check_in.isoformat(),
+            "end": check_out.isoformat(),
+        },
+    )
+    assert r.status_code == 200, r.text
+    return r.json()["apartments"][0]["booked_days"]
+
+
+def test_overlapping_booking_is_rejected(client, guest, apartment_id):
+    check_in, check_out = stay(40, 3)
+    assert book(client, guest, apartment_id, check_in, check_out).status_code == 201
+
+    overlapping = book(
+        client, guest, apartment_id, check_in + timedelta(days=2), check_out
+    )
+    assert overlapping.status_code == 409
+
+    # check_out is exclusive, the next stay may start that day
+    adjacent = book(
+        client, guest, apartment_id, check_out, check_out + timedelta(days=2)
+    )
+    assert adjacent.status_code == 201
+
+
+def test_confirm_and_cancel_update_availability(client, host, guest, apartment_id):
+    check_in, check_out = stay(45, 3)
+    r = book(client, guest, apartment_id, check_in, check_out)
+    assert r.status_code == 201
+    reservation_id = r.json()["id"]
+    assert booked_days(client, apartment_id, check_in, check_out) == 0
+
+    r = client.post(f"/reservations/{reservation_id}/confirm", headers=host)
+    assert r.status_code == 200
+    assert r.json()["status"] == "confirmed"
+    assert booked_days(client, apartment_id, check_in, check_out) == 3
+
+    r = client.post(f"/reservations/{reservation_id}/cancel", headers=guest)
+    assert r.status_code == 200
+    assert r.json()["status"] == "cancelled"
+    assert booked_days(client, apartment_id, check_in, check_out) == 0
+
+    assert book(client, guest, apartment_id, check_in, check_out).status_code == 201
+
+
+def test_expired_pending_reservation_frees_its_dates(
+    client, host, guest, apartment_id, monkeypatch
+):
+    # every new pending reservation is already past its confirm deadline
+    monkeypatch.setattr(reservation_service, "pending_ttl_hours", -1)
+    check_in, check_out = stay(50, 2)
+
+    first = book(client, guest, apartment_id, check_in, check_out)
+    assert first.status_code == 201
+    assert book(client, guest, apartment_id, check_in, check_out).status_code == 201
+
+    r = client.post(f"/reservations/{first.json()['id']}/confirm", headers=host)
+    assert r.status_code == 400
+
+
+def test_apartment_with_reservations_cant_be_deleted(
+    client, host, guest, apartment_id
+):
+    check_in, check_out = stay(55, 2)
+    r = book(client, guest, apartment_id, check_in, check_out)
+    assert r.status_code == 201
+    reservation_id = r.json()["id"]
+    r = client.post(f"/reservations/{reservation_id}/confirm", headers=host)
+    assert r.status_code == 200
+
+    assert client.delete(f"/apartments/{apartment_id}", headers=host).status_code == 409
+    assert client.get(f"/apartments/{apartment_id}").status_code == 200
+
+    # cancelled stays don't keep the apartment, they are deleted with it
+    r = client.post(f"/reservations/{reservation_id}/cancel", headers=guest)
+    assert r.status_code == 200
+    assert client.delete(f"/apartments/{apartment_id}", headers=host).status_code == 204
+    assert client.get(f"/apartments/{apartment_id}").status_code == 404
+
+
+@pytest.mark.anyio
+async def test_concurrent_bookings_book_once(database):
+    async with database.session_factory() as session:
+        suffix = uuid4().hex[:12]
+        host = User(
+            role=Role.HOST, name="h", email=f"h-{suffix}@example.com", password="-"
+        )
+        guest = User(
+            role=Role.USER, name="g", email=f"g-{suffix}@example.com", password="-"
+        )
+        session.add_all([host, guest])
+        await session.flush()
+        apartment = Apartment(
+            user_id=host.id,
+            title="Contended flat",
+            description="",
+            address="-",
+            city="-",
+            country="-",
+            price_per_night=Decimal("50.00"),
+            max_guests=4,
+            status="active",
+        )
+        session.add(apartment)
+        await session.commit()
+
+    service = ReservationService()
+    check_in, check_out = stay(60, 3)
+
+    async def attempt(i: int) -> str:
+        # every other one overlaps only the last night
+        start = check_in if i % 2 == 0 else check_out - timedelta(days=1)
+        async with database.session_factory() as session:
+            try:
+                await service.create(
+                    session,
+                    apartment,
+                    guest.id,
+                    start,
+                    start + timedelta(days=3),
+                    guests_count=2,
+                )
+                return "booked"
+            except ReservationConflictError:
+                return "conflict"
+
+    results = Counter(await asyncio.gather(*(attempt(i) for i in range(20))))
+    assert results == {"booked": 1, "conflict": 19}
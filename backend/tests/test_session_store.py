@@ -0,0 +1,121 @@
+import asyncio
+from datetime import timedelta
+from uuid import uuid4
+
+import pytest
+
+from app.auth.session_store import (
+    DatabaseSessionStore,
+    MemorySessionStore,
+    NewSession,
+)
+from app.enums.role_enum import Role
+from app.models.user import User
+
+GRACE = timedelta(seconds=10)
+
+
+@pytest.fixture(params=["db", "memory"])
+async def make_store(request, database):
+    """(store factory, user id) for each store implementation."""
+    if request.param == "memory":
+        return MemorySessionStore, 1
+
+    async with database.session_factory() as session:
+        user = User(
+            role=Role.USER,
+            name="s",
+            email=f"s-{uuid4().hex[:12]}@example.com",
+            password="-",
+        )
+        session.add(user)
+        await session.commit()
+        user_id = user.id
+
+    def factory(**kwargs):
+        return DatabaseSessionStore(database.session_factory, **kwargs)
+
+    return factory, user_id
+
+
+def new_session() -> NewSession:
+    return NewSession(token_hash=uuid4().hex, ttl=timedelta(days=1))
+
+
+@pytest.mark.anyio
+async def test_rotate_issues_a_successor(make_store):
+    factory, user_id = make_store
+    store = factory(grace=GRACE)
+    first = new_session()
+    await store.create(user_id, first)
+
+    second = new_session()
+    result = await store.rotate(first.token_hash, second)
+    assert (result.status, result.user_id) == ("rotated", user_id)
+    assert (await store.rotate(second.token_hash, new_session())).status == "rotated"
+    assert (await store.rotate(uuid4().hex, new_session())).status == "invalid"
+
+
+@pytest.mark.anyio
+async def test_replay_after_grace_revokes_the_family(make_store):
+    factory, user_id = make_store
+    store = factory(grace=timedelta(0))
+    first, second, other = new_session(), new_session(), new_session()
+    await store.create(user_id, first)
+    await store.create(user_id, other)
+    await store.rotate(first.token_hash, second)
+    await asyncio.sleep(0.01)
+
+    result = await store.rotate(first.token_hash, new_session())
+    assert (result.status, result.user_id) == ("reused", user_id)
+    assert (await store.rotate(second.token_hash, new_session())).status == "revoked"
+    # other logins of the same user are a different family
+    assert (await store.rotate(other.token_hash, new_session())).status == "rotated"
+
+
+@pytest.mark.anyio
+async def test_replay_within_grace_gets_one_successor(make_store):
+    factory, user_id = make_store
+    store = factory(grace=GRACE)
+    first, second, parallel = new_session(), new_session(), new_session()
+    await store.create(user_id, first)
+    await store.rotate(first.token_hash, second)
+
+    assert (await store.rotate(first.token_hash, parallel)).status == "rotated"
+    assert (await store.rotate(first.token_hash, new_session())).status == "reused"
+    assert (await store.rotate(second.token_hash, new_session())).status == "revoked"
+    assert (await store.rotate(parallel.token_hash, new_session())).status == "revoked"
+
+
+@pytest.mark.anyio
+async def test_active_sessions_are_capped_per_user(make_store):
+    factory, user_id = make_store
+    store = factory(max_active=2, grace=GRACE)
+    oldest, middle, newest = new_session(), new_session(), new_session()
+    for new in (oldest, middle, newest):
+        await store.create(user_id, new)
+        await asyncio.sleep(0.01)
+
+    assert (await store.rotate(oldest.token_hash, new_session())).status == "revoked"
+
+    # the grace successor counts against the cap too
+    successor = new_session()
+    assert (await store.rotate(newest.token_hash, successor)).status == "rotated"
+    await asyncio.sleep(0.01)
+    assert (await store.rotate(newest.token_hash, new_session())).status == "rotated"
+    assert (await store.rotate(middle.token_hash, new_session())).status == "revoked"
+    assert (await store.rotate(successor.token_hash, new_session())).status == (
+        "rotated"
+    )
+
+
+@pytest.mark.anyio
+async def test_revoked_session_cant_rotate(make_store):
+    factory, user_id = make_store
+    store = factory(grace=GRACE)
+    first = new_session()
+    await store.create(user_id, first)
+    await store.revoke(first.token_hash)
+
+    result = await store.rotate(first.token_hash, new_session())
+    assert (result.status, result.user_id) == ("revoked", user_id)
@@ -14,6 +14,7 @@ export type ApartmentPhotoDto = {
 export type ApartmentTagDto = {
   id?: number;
   name?: string;
+  icon_key?: string;
 };
 
 export type ApartmentDto = {
@@ -38,8 +39,9 @@ export type ApartmentDto = {
 export type BasePagedResponse<T> = {
   page_number: number;
   page_size: number;
-  total: number;
+  total: number | null;
   items: T[];
+  next_cursor?: string | null;
 };
 
 export type ApartmentSearchParams = {
@@ -215,7 +217,8 @@ export async function getApartments(args?: ApartmentSearchParams) {
 }
 
 export async function getApartmentById(id: number) {
-  const json = await apiRequest<unknown>(`/apartments/${id}`, {
+  // tags are shown by name only, the inline SVG icons are not needed here
+  const json = await apiRequest<unknown>(`/apartments/${id}?include_svg=false`, {
     method: "GET",
   });
 